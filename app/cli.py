@@ -0,0 +1,258 @@
+"""
+最良打順推定のコマンドラインツール
+
+Streamlit を使わずに、チーム・リーグ・全12球団の最良打順を複数年度まとめて推定し、
+結果を JSON と CSV に書き出す。
+
+使い方:
+    python -m app.cli --years 2024 --teams h                        # 1チーム
+    python -m app.cli --years 2022-2024 --league セントラル・リーグ  # リーグ全体を3年分
+    python -m app.cli --years 2024 --method genetic --trials 5000 --seed 0 --workers 8 --output-dir results
+    python -m app.cli --years 2024 --teams h --trials 100000 --log-evaluations  # 全評価を列ごとのファイルに記録
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.cache import DEFAULT_CACHE_PATH, EvaluationCache
+from app.services.exhaustive_search import exhaustive_batting_order_search
+from app.services.genetic_search import genetic_batting_order_search
+from app.services.instrumentation import instrumented
+from app.services.local_search import local_search_batting_order
+from app.services.markov import expected_runs_per_game
+from app.services.parallel import default_workers, map_chunks
+from app.services.roster_search import roster_batting_order_search
+from app.services.simulation import GAMES_PER_SEASON, GAME_LOG_KEYS, estimate_best_batting_order
+from app.services.successive_halving import successive_halving_search
+from app.utils.team_data import (
+    LEAGUES, TEAM_ABBREVIATIONS, initial_lineup, lineup_frame, load_default_lineups, load_team_players,
+)
+
+# 探索方法の名前 (コマンドラインで指定する値)
+METHODS = ["random", "genetic", "exhaustive", "halving", "local", "roster"]
+# チーム略称 -> チーム名
+TEAM_NAMES = {abbr: name for name, abbr in TEAM_ABBREVIATIONS.items()}
+
+class _SilentProgressBar:
+    """進捗を表示しないプログレスバー (並列実行中のログが混ざらないようにする)"""
+
+    def progress(self, value, text=None):
+        pass
+
+def parse_years(values):
+    """["2022-2024", "2025"] のような年度の指定を年度のリストにする"""
+    years = []
+    for value in values:
+        start, _, stop = str(value).partition("-")
+        years.extend(range(int(start), int(stop or start) + 1))
+    return sorted(set(years))
+
+def select_teams(teams=None, league=None):
+    """
+    対象のチーム略称を決める (チームもリーグも指定しなければ全12球団)
+
+    Raises:
+        ValueError: 不明なチーム・リーグを指定した場合
+    """
+    if teams:
+        unknown = [team for team in teams if team not in TEAM_NAMES and team not in TEAM_ABBREVIATIONS]
+        if unknown:
+            raise ValueError(f"Unknown team: {', '.join(unknown)}")
+        return [TEAM_ABBREVIATIONS.get(team, team) for team in teams]
+    if league:
+        if league not in LEAGUES:
+            raise ValueError(f"Unknown league: {league}")
+        return [TEAM_ABBREVIATIONS[name] for name in LEAGUES[league]]
+    return list(TEAM_ABBREVIATIONS.values())
+
+def _league_of(team_abbr):
+    return next(league for league, names in LEAGUES.items() if TEAM_NAMES[team_abbr] in names)
+
+def run_search(lineup_df, method, trials, scorer="simulation", seed=None, n_workers=1, cache=None, players_df=None,
+               evaluation_log=None):
+    """
+    探索方法に応じて最良打順を推定する (試行回数は各探索の予算に換算する)
+
+    "roster" はチームの全選手 (players_df) から9人と打順を選び、lineup_df を初期打線とする。
+    evaluation_log はランダム探索で評価した全ての打順を記録するディレクトリ。
+    """
+    progress_bar = _SilentProgressBar()
+    if method == "random":
+        return estimate_best_batting_order(lineup_df, trials, progress_bar, scorer=scorer, n_workers=n_workers,
+                                           seed=seed, cache=cache, evaluation_log=evaluation_log)
+    if method == "genetic":
+        return genetic_batting_order_search(lineup_df, progress_bar, max_evaluations=trials, scorer=scorer, seed=seed)
+    if method == "exhaustive":
+        return exhaustive_batting_order_search(lineup_df, progress_bar, seed=seed)
+    if method == "halving":
+        return successive_halving_search(lineup_df, trials, progress_bar, seed=seed, cache=cache)
+    if method == "local":
+        return local_search_batting_order(lineup_df, progress_bar, max_games=trials * GAMES_PER_SEASON, seed=seed)
+    if method == "roster":
+        return roster_batting_order_search(players_df, progress_bar, initial_players=lineup_df['Player'].tolist(),
+                                           seed=seed)
+    raise ValueError(f"Unknown method: {method}")
+
+def _order_record(order_info):
+    """結果の打順情報を JSON に書き出せる形にする"""
+    record = {
+        "players": order_info['order_df']['Player'].tolist(),
+        "avg_runs": float(order_info['avg_runs']),
+        "expected_runs": expected_runs_per_game(order_info['order_df']),
+    }
+    if order_info.get('stats') is not None:
+        record["stats"] = [dict(zip(GAME_LOG_KEYS, map(int, row))) for row in order_info['stats']]
+    return record
+
+def optimize_team(year, team_abbr, method, trials, scorer="simulation", seed=None, n_workers=1,
+                  cache_path=None, processed_dir="./data/processed", instrument=False, evaluation_log=None):
+    """
+    1チーム・1年度の最良打順を推定する (プロセスプールのワーカーから呼び出す)
+
+    初期打順はデフォルトスタメン (足りなければ seed に応じて補う)。
+    最良打順と初期打順の厳密な期待得点 (マルコフ連鎖) も求める。
+
+    Returns:
+        dict: JSON に書き出せる推定結果
+    """
+    started = time.perf_counter()
+    players_df = load_team_players(year, team_abbr, processed_dir)
+    default_lineups_df = load_default_lineups(year, processed_dir)
+    names = initial_lineup(players_df, default_lineups_df, year, team_abbr, rng=random.Random(seed))
+    lineup_df = lineup_frame(players_df, names)
+
+    cache = EvaluationCache(cache_path) if cache_path else None
+    search = instrumented(run_search) if instrument else run_search
+    try:
+        result = search(lineup_df, method, trials, scorer=scorer, seed=seed, n_workers=n_workers, cache=cache,
+                        players_df=players_df, evaluation_log=evaluation_log)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    best = _order_record(result['best_order'])
+    default_runs = expected_runs_per_game(lineup_df)
+    record = {
+        "year": year,
+        "league": _league_of(team_abbr),
+        "team": TEAM_NAMES[team_abbr],
+        "team_abbr": team_abbr,
+        "method": method,
+        "scorer": scorer,
+        "trials": trials,
+        "seed": seed,
+        "initial_lineup": {"players": names, "expected_runs": default_runs},
+        "best_order": best,
+        "improvement": best["expected_runs"] - default_runs,
+        "elapsed": time.perf_counter() - started,
+    }
+    for key in ("worst_order", "initial_order"):
+        if key in result:
+            record[key] = _order_record(result[key])
+    for key in ("top_orders", "bottom_orders"):
+        if key in result:
+            record[key] = result[key]
+    if evaluation_log is not None:
+        record["evaluation_log"] = evaluation_log
+    if "metrics" in result:
+        record["metrics"] = result["metrics"].summary()
+    return record
+
+def summary_frame(records):
+    """推定結果の一覧表 (1行1チーム・1年度)"""
+    rows = []
+    for record in records:
+        row = {key: record[key] for key in ("year", "league", "team", "team_abbr", "method", "scorer", "trials", "seed")}
+        row.update({
+            "best_avg_runs": record["best_order"]["avg_runs"],
+            "best_expected_runs": record["best_order"]["expected_runs"],
+            "initial_expected_runs": record["initial_lineup"]["expected_runs"],
+            "improvement": record["improvement"],
+            "elapsed": record["elapsed"],
+        })
+        row.update({f"order_{i + 1}": player for i, player in enumerate(record["best_order"]["players"])})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def write_results(records, output_dir):
+    """チーム・年度ごとの JSON と、全体の summary.csv / summary.json を書き出す"""
+    os.makedirs(output_dir, exist_ok=True)
+    for record in records:
+        path = os.path.join(output_dir, f"{record['year']}_{record['team_abbr']}_{record['method']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+    summary = summary_frame(records)
+    summary.to_csv(os.path.join(output_dir, "summary.csv"), index=False)
+    summary.to_json(os.path.join(output_dir, "summary.json"), orient="records", force_ascii=False, indent=2)
+    return summary
+
+def build_tasks(years, teams, args, processed_dir):
+    """データのあるチーム・年度の組み合わせごとに optimize_team の引数を作る"""
+    combinations = [(year, team) for year in years for team in teams
+                    if os.path.exists(os.path.join(processed_dir, f"{year}_{team}.csv"))]
+    seeds = [None] * len(combinations)
+    if args.seed is not None:
+        # チーム・年度ごとに独立した、再現可能なシード
+        seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(args.seed).spawn(len(combinations))]
+    # チームの並列で使い切れないワーカーは、ランダム探索のシミュレーションの並列化に回す
+    search_workers = max(1, args.workers // max(len(combinations), 1))
+    cache_path = args.cache_path if args.cache else None
+
+    def evaluation_log(year, team):
+        if not args.log_evaluations or args.method != "random":
+            return None
+        return os.path.join(args.output_dir, f"{year}_{team}_{args.method}_evaluations")
+
+    return [(year, team, args.method, args.trials, args.scorer, seed, search_workers, cache_path, processed_dir,
+             args.instrument, evaluation_log(year, team))
+            for (year, team), seed in zip(combinations, seeds)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="最良打順を複数のチーム・年度についてまとめて推定する")
+    parser.add_argument("--years", nargs="+", default=["2024"], help="年度 (例: 2024, 2022-2024)")
+    parser.add_argument("--teams", nargs="+", help="チーム略称またはチーム名 (例: h s 阪神)")
+    parser.add_argument("--league", choices=list(LEAGUES), help="リーグ (チームを指定しない場合)")
+    parser.add_argument("--method", choices=METHODS, default="random", help="探索方法")
+    parser.add_argument("--trials", type=int, default=1000, help="試行回数 (ランダム探索換算の予算)")
+    parser.add_argument("--scorer", choices=["simulation", "markov"], default="simulation",
+                        help="ランダム探索・遺伝的アルゴリズムの評価方法")
+    parser.add_argument("--seed", type=int, help="乱数シード")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="並列に使うプロセス数")
+    parser.add_argument("--output-dir", default="results", help="結果を書き出すディレクトリ")
+    parser.add_argument("--processed-dir", default="./data/processed", help="処理済みデータのディレクトリ")
+    parser.add_argument("--cache", action="store_true", help="打順の評価結果のキャッシュを使う")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="評価結果のキャッシュのファイル")
+    parser.add_argument("--instrument", action="store_true", help="処理段階ごとの時間とカウンタを結果に含める")
+    parser.add_argument("--log-evaluations", action="store_true",
+                        help="ランダム探索で評価した全ての打順を出力先の {年度}_{チーム}_random_evaluations/ に記録する")
+    args = parser.parse_args(argv)
+
+    try:
+        teams = select_teams(args.teams, args.league)
+    except ValueError as e:
+        parser.error(str(e))
+    years = parse_years(args.years)
+    tasks = build_tasks(years, teams, args, args.processed_dir)
+    if not tasks:
+        print("対象のデータが見つかりません。", file=sys.stderr)
+        return 1
+
+    records = [None] * len(tasks)
+    for done, (task_id, record) in enumerate(map_chunks(optimize_team, tasks, n_workers=args.workers), start=1):
+        records[task_id] = record
+        print(f"[{done}/{len(tasks)}] {record['year']} {record['team']}: "
+              f"{record['best_order']['expected_runs']:.3f}点 (初期打順から {record['improvement']:+.3f}点, "
+              f"{record['elapsed']:.1f}秒)", file=sys.stderr)
+
+    summary = write_results(records, args.output_dir)
+    print(summary[["year", "team", "best_expected_runs", "improvement"]].to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
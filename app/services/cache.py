@@ -0,0 +1,177 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.services.lineup import RESULT_TYPES
+
+# シミュレーションのルールや乱数の使い方、保存する値を変えたら上げる (古い評価結果を使わないため)
+# 2: 標準誤差を求めるため、試合ごとの得点の2乗和も保存する
+ENGINE_VERSION = 2
+DEFAULT_CACHE_PATH = os.path.join("data", "cache", "evaluations.sqlite")
+# メモリとディスクに保持する打順の数の上限 (超えたら最後に使われたのが古いものから消す)
+MAX_MEMORY_ENTRIES = 100_000
+MAX_DISK_ENTRIES = 1_000_000
+# 他のプロセスが書き込み中のとき、SQLite のロックを待つ秒数
+SQLITE_TIMEOUT = 60.0
+# SQLite の IN 句に一度に渡すキーの数
+_QUERY_BATCH_SIZE = 500
+
+def player_fingerprints(players_df):
+    """選手ごとに、シミュレーションに使う値 (打席結果の確率・Out_ratio・Speed) のハッシュを求める"""
+    columns = [f'{r}_ratio' for r in RESULT_TYPES] + ['Out_ratio', 'Speed']
+    values = np.ascontiguousarray(players_df[columns].values.astype('float64'))
+    return [hashlib.sha1(row.tobytes()).hexdigest()[:16] for row in values]
+
+def order_keys(players_df, orders):
+    """
+    打順ごとのキャッシュのキーを作る
+
+    キーは ENGINE_VERSION と、打順に並べた選手のハッシュから作るため、
+    選手の選び方や players_df の行の並びが違っても同じ打順なら同じキーになる。
+    試合数はキーに含めず値として持ち、後から試合を追加 (積み増し) できるようにする。
+    """
+    fingerprints = player_fingerprints(players_df)
+    return [f"v{ENGINE_VERSION}:" + "-".join(fingerprints[i] for i in order) for order in np.atleast_2d(orders)]
+
+def group_by_games(needed_games):
+    """追加で必要な試合数ごとに打順の番号をまとめる (0試合の打順は除く)"""
+    return [(int(games), np.nonzero(needed_games == games)[0]) for games in np.unique(needed_games) if games > 0]
+
+class EvaluationCache:
+    """
+    打順の評価結果 (試合数・総得点・得点の2乗和・打順別成績) のキャッシュ
+
+    メモリ上の LRU と、ディスク上の SQLite の2段で保持する。
+    path が None ならメモリ上だけで保持する。
+    バックグラウンドのジョブから同時に使えるよう、読み書きはロックで1つずつ行う。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_memory_entries=MAX_MEMORY_ENTRIES, max_disk_entries=MAX_DISK_ENTRIES):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._connection = None
+        self._lock = threading.RLock()
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Streamlit は再実行のたびに別スレッドから呼び出すことがある。
+            # 複数のプロセス (CLIの並列実行) から書き込む場合は、ロックの解放を待つ
+            self._connection = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_TIMEOUT)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                "key TEXT PRIMARY KEY, games INTEGER, run_total REAL, log BLOB, last_used REAL, run_squares REAL)"
+            )
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(evaluations)")]
+            if "run_squares" not in columns:
+                # 以前の版で作ったファイル。古い行はキーの版が違うため読まれず、いずれ消える
+                self._connection.execute("ALTER TABLE evaluations ADD COLUMN run_squares REAL")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)")
+            self._connection.commit()
+            # ディスクの行数の上限の見積もり。書き込むたびに数え直すと全件を走査するため、
+            # 書き込んだキーの数を足していき、上限を超えたときだけ数え直す (置き換えた行も足すので実際以上になる)
+            self._disk_rows = len(self)
+
+    def __len__(self):
+        if self._connection is None:
+            return len(self._memory)
+        return self._connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def _remember(self, key, entry):
+        """メモリ上の LRU に入れ、上限を超えた分を古い順に消す"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load_from_disk(self, keys):
+        """ディスクからキーの評価結果を読み、最終使用時刻を更新する"""
+        found = {}
+        if self._connection is None or not keys:
+            return found
+        for start in range(0, len(keys), _QUERY_BATCH_SIZE):
+            batch = keys[start:start + _QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection.execute(
+                f"SELECT key, games, run_total, run_squares, log FROM evaluations WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, games, run_total, run_squares, log in rows:
+                found[key] = (games, run_total, run_squares,
+                              np.frombuffer(log, dtype=np.int64).reshape(9, -1).copy())
+        if found:
+            now = time.time()
+            self._connection.executemany("UPDATE evaluations SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+            self._connection.commit()
+        return found
+
+    def lookup(self, keys, log_shape):
+        """
+        キーごとの評価結果をまとめて取り出す (見つからない打順は0試合)
+
+        Args:
+            keys (list): order_keys で作ったキー
+            log_shape (tuple): 打順1つ分の成績の形 (例: (9, len(GAME_LOG_KEYS)))
+
+        Returns:
+            tuple: (総得点 shape=(打順数,), 試合ごとの得点の2乗和 shape=(打順数,), 試合数 shape=(打順数,),
+                    打順別成績の合計 shape=(打順数, *log_shape))
+        """
+        run_totals = np.zeros(len(keys))
+        run_squares = np.zeros(len(keys))
+        game_counts = np.zeros(len(keys), dtype=np.int64)
+        logs = np.zeros((len(keys), *log_shape), dtype=np.int64)
+        with self._lock:
+            missing = sorted({key for key in keys if key not in self._memory})
+            for key, entry in self._load_from_disk(missing).items():
+                self._remember(key, entry)
+            for i, key in enumerate(keys):
+                entry = self._memory.get(key)
+                if entry is not None:
+                    self._memory.move_to_end(key)
+                    game_counts[i], run_totals[i], run_squares[i], logs[i] = entry
+        return run_totals, run_squares, game_counts, logs
+
+    def add(self, keys, game_counts, run_totals, run_squares, logs):
+        """新たにシミュレーションした試合の結果 (試合数・総得点・得点の2乗和・打順別成績) を、既存の評価結果に積み増す"""
+        with self._lock:
+            merged = {}
+            for key, games, runs, squares, log in zip(keys, game_counts, run_totals, run_squares, logs):
+                if games <= 0:
+                    continue
+                if key not in merged:
+                    # 同じ打順がメモリから消えていてもディスクの値に積み増せるよう、先に読み込んでおく
+                    merged[key] = self._memory.get(key) or self._load_from_disk([key]).get(key) or (0, 0.0, 0.0, np.zeros_like(log))
+                previous_games, previous_runs, previous_squares, previous_log = merged[key]
+                merged[key] = (previous_games + int(games), previous_runs + float(runs),
+                               previous_squares + float(squares), previous_log + log)
+
+            for key, entry in merged.items():
+                self._remember(key, entry)
+            if self._connection is not None and merged:
+                now = time.time()
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO evaluations (key, games, run_total, run_squares, log, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(key, games, runs, squares, np.ascontiguousarray(log, dtype=np.int64).tobytes(), now)
+                     for key, (games, runs, squares, log) in merged.items()]
+                )
+                self._disk_rows += len(merged)
+                if self._disk_rows > self.max_disk_entries:
+                    rows = len(self)
+                    if rows > self.max_disk_entries:
+                        self._connection.execute(
+                            "DELETE FROM evaluations WHERE key IN (SELECT key FROM evaluations ORDER BY last_used LIMIT ?)",
+                            (rows - self.max_disk_entries,)
+                        )
+                        rows = self.max_disk_entries
+                    self._disk_rows = rows
+                self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,211 @@
+import math
+from itertools import permutations
+
+import numpy as np
+
+from app.services.markov import NUM_STATES, build_transition_matrices, evaluate_orders
+from app.services.simulation import build_order_info
+
+# 9! 通りの打順
+NUM_ORDERS = math.factorial(9)
+# 上界・下界の計算で、各イニングを何打席目まで厳密に追うか
+BOUND_DEPTH = 10
+# 厳密評価を一度に行う打順の数
+EVALUATION_BATCH_SIZE = 512
+
+def all_orders():
+    """9! 通りの打順を辞書順に並べた配列 shape=(9!, 9) を返す"""
+    return np.array(list(permutations(range(9))), dtype=np.int8)
+
+def order_ranks(orders):
+    """打順 (9人の順列) の辞書順の番号を求める"""
+    orders = np.atleast_2d(orders).astype(np.int64)
+    # 各位置について、それより後ろにある小さい番号の数 (Lehmer code)
+    smaller_after = (orders[:, None, :] < orders[:, :, None]) & np.triu(np.ones((9, 9), dtype=bool), k=1)
+    lehmer = smaller_after.sum(axis=2)
+    weights = np.array([math.factorial(8 - i) for i in range(9)])
+    return lehmer @ weights
+
+def _optimistic_inning_runs(transitions):
+    """
+    毎打席、状況に応じて9人から最適な打者を選べる場合の、各状態からのイニング残り期待得点。
+    実際のどの打順の期待得点もこれを超えないため、打ち切った打席以降の上界に使う。
+    (方策反復法で厳密に解く)
+    """
+    matrices, rewards = transitions["transition"], transitions["expected_runs"]
+    states = np.arange(NUM_STATES)
+    policy = rewards.argmax(axis=0)
+    while True:
+        values = np.linalg.solve(np.eye(NUM_STATES) - matrices[policy, states], rewards[policy, states])
+        q_values = rewards + matrices @ values
+        new_policy = q_values.argmax(axis=0)
+        if np.all(q_values[new_policy, states] <= q_values[policy, states] + 1e-12):
+            return values + 1e-9
+        policy = new_policy
+
+def _advance(distribution, transitions, player_ids, pa_index, runs, ended):
+    """打席を1つ進め、期待得点と3アウトになった打席 (次の先頭打者のずれ) を記録する"""
+    runs += (distribution * transitions["expected_runs"][player_ids]).sum(axis=1)
+    ended[:, (pa_index + 1) % 9] += (distribution * transitions["inning_end"][player_ids]).sum(axis=1)
+    new_distribution = np.empty_like(distribution)
+    for p in range(9):
+        rows = player_ids == p
+        new_distribution[rows] = distribution[rows] @ transitions["transition"][p]
+    return new_distribution
+
+def _truncated_inning_bounds(transitions, depth, progress=None):
+    """
+    9! 通りの打者の並びそれぞれについて、その並びで始まるイニングを depth 打席目まで計算する
+
+    先頭からの並びが共通する部分 (接頭辞) は共有して計算する。
+
+    Returns:
+        tuple: 辞書順に並んだ並びごとの
+            (depth 打席までの期待得点, 打席数によるイニング終了確率 shape=(9!, 9),
+             depth 打席後もイニングが続く確率, 残り得点の上界)
+    """
+    optimistic = _optimistic_inning_runs(transitions)
+    runs = np.empty(NUM_ORDERS)
+    ended = np.empty((NUM_ORDERS, 9))
+    alive = np.empty(NUM_ORDERS)
+    tail_bound = np.empty(NUM_ORDERS)
+    chunk = NUM_ORDERS // 9
+
+    for first in range(9):
+        prefixes = np.array([[first]])
+        distribution = np.zeros((1, NUM_STATES))
+        distribution[0, 0] = 1.0 # 0アウト走者なし
+        chunk_runs = np.zeros(1)
+        chunk_ended = np.zeros((1, 9))
+        distribution = _advance(distribution, transitions, prefixes[:, 0], 0, chunk_runs, chunk_ended)
+
+        # 接頭辞を1人ずつ伸ばす (子は残りの選手を番号順に並べるので辞書順が保たれる)
+        for length in range(1, 9):
+            used = np.zeros((len(prefixes), 9), dtype=bool)
+            np.put_along_axis(used, prefixes, True, axis=1)
+            remaining = np.nonzero(~used)[1].reshape(len(prefixes), 9 - length)
+            parents = np.repeat(np.arange(len(prefixes)), 9 - length)
+            prefixes = np.column_stack([prefixes[parents], remaining.ravel()])
+            chunk_runs, chunk_ended = chunk_runs[parents], chunk_ended[parents]
+            distribution = _advance(distribution[parents], transitions, prefixes[:, -1], length, chunk_runs, chunk_ended)
+
+        # 打者が一巡した後は並びが確定しているので、そのまま depth 打席目まで進める
+        for pa_index in range(9, depth):
+            distribution = _advance(distribution, transitions, prefixes[:, pa_index % 9], pa_index, chunk_runs, chunk_ended)
+
+        rows = slice(first * chunk, (first + 1) * chunk)
+        runs[rows] = chunk_runs
+        ended[rows] = chunk_ended
+        alive[rows] = distribution.sum(axis=1)
+        tail_bound[rows] = distribution @ optimistic
+        if progress is not None:
+            progress((first + 1) / 9)
+
+    return runs, ended, alive, tail_bound
+
+def _game_bounds(orders, inning_bounds, innings=9):
+    """
+    打順ごとの1試合の期待得点の上界と下界を求める
+
+    イニング終了が depth 打席以降になる確率の分だけ次の先頭打者が分からないため、
+    その分は残りイニングの最大値 (上界) / 最小値 (下界) で見積もる。
+    """
+    runs, ended, alive, tail_bound = inning_bounds
+    slots = np.arange(9)
+    # rotations[b, s]: s番打者から始まる打者の並びの番号
+    rotations = np.stack([order_ranks(orders[:, (s + slots) % 9]) for s in range(9)], axis=1)
+
+    runs_low = runs[rotations]
+    runs_high = runs_low + tail_bound[rotations]
+    unknown = alive[rotations]
+    # next_leadoff[b, s, t]: s番から始まるイニングが終わり、次の先頭がt番になる確率 (depth 打席以内)
+    next_leadoff = ended[rotations][:, slots[:, None], (slots[None, :] - slots[:, None]) % 9]
+
+    upper = np.zeros((len(orders), 9))
+    lower = np.zeros((len(orders), 9))
+    for _ in range(innings):
+        upper = runs_high + np.einsum('bst,bt->bs', next_leadoff, upper) + unknown * upper.max(axis=1, keepdims=True)
+        lower = runs_low + np.einsum('bst,bt->bs', next_leadoff, lower) + unknown * lower.min(axis=1, keepdims=True)
+    return upper[:, 0], lower[:, 0]
+
+def _search_extreme(transitions, orders, optimistic, pessimistic, top_k, sign=1.0, progress=None):
+    """
+    上界の大きい順に厳密評価し、上位 top_k の厳密値を確定させる (分枝限定法)
+
+    評価値は sign * 期待得点 で、optimistic はその上界、pessimistic は下界。
+    未評価の打順の上界が現在の top_k 番目の厳密値を下回った時点で残りを枝刈りする。
+    """
+    # 下界の top_k 番目より上界が小さい打順は最初から候補にならない
+    threshold = np.partition(pessimistic, -top_k)[-top_k]
+    candidates = np.nonzero(optimistic >= threshold)[0]
+    candidates = candidates[np.argsort(-optimistic[candidates])]
+
+    evaluated_ids, evaluated_scores = [], []
+    kth_best = -np.inf
+    for start in range(0, len(candidates), EVALUATION_BATCH_SIZE):
+        batch = candidates[start:start + EVALUATION_BATCH_SIZE]
+        if optimistic[batch[0]] < kth_best:
+            break
+        evaluated_ids.append(batch)
+        evaluated_scores.append(sign * evaluate_orders(transitions, orders[batch]))
+        scores = np.concatenate(evaluated_scores)
+        if len(scores) >= top_k:
+            kth_best = np.partition(scores, -top_k)[-top_k]
+        if progress is not None:
+            progress(min((start + len(batch)) / len(candidates), 1.0))
+
+    ids = np.concatenate(evaluated_ids)
+    scores = np.concatenate(evaluated_scores)
+    top = np.argsort(-scores)[:top_k]
+    return ids[top], scores[top], len(ids)
+
+def exhaustive_batting_order_search(selected_players_df, progress_bar, top_k=10, depth=BOUND_DEPTH, seed=None):
+    """
+    9! 通りの打順から、マルコフ連鎖の期待得点が最大・最小の打順を厳密に求める
+
+    全ての打順について、各イニングを depth 打席目まで計算した期待得点の上界・下界を
+    接頭辞を共有しながら求め、上界が暫定解に届かない打順を枝刈りしてから残りを厳密に評価する。
+
+    Args:
+        selected_players_df (pd.DataFrame): 選択された9人の選手データ
+        progress_bar: Streamlitのプログレスバーオブジェクト
+        top_k (int): 結果に含める上位打順の数
+        depth (int): 上界・下界の計算で各イニングを厳密に追う打席数 (9以上)
+        seed (int, optional): 打者別成績のシミュレーションに使う乱数シード
+
+    Returns:
+        dict: 最良打順、最悪打順、それぞれの平均得点と成績、上位打順 (top_orders) と
+              厳密評価した打順の数 (evaluated_orders)
+    """
+    depth = max(depth, 9)
+    transitions = build_transition_matrices(selected_players_df)
+    orders = all_orders()
+
+    def report(start, width):
+        return lambda fraction: progress_bar.progress(start + width * fraction)
+
+    inning_bounds = _truncated_inning_bounds(transitions, depth, progress=report(0.0, 0.5))
+    upper, lower = np.empty(NUM_ORDERS), np.empty(NUM_ORDERS)
+    chunk = NUM_ORDERS // 9
+    for start in range(0, NUM_ORDERS, chunk):
+        upper[start:start + chunk], lower[start:start + chunk] = _game_bounds(orders[start:start + chunk], inning_bounds)
+
+    best_ids, best_scores, best_evaluated = _search_extreme(
+        transitions, orders, upper, lower, top_k, progress=report(0.5, 0.4)
+    )
+    # 最悪打順は符号を反転して同じ手順で探す
+    worst_ids, worst_scores, worst_evaluated = _search_extreme(
+        transitions, orders, -lower, -upper, 1, sign=-1.0, progress=report(0.9, 0.1)
+    )
+
+    rng = np.random.default_rng(seed)
+    players = selected_players_df['Player'].tolist()
+    return {
+        "best_order": build_order_info(selected_players_df, orders[best_ids[0]], float(best_scores[0]), rng),
+        "worst_order": build_order_info(selected_players_df, orders[worst_ids[0]], float(-worst_scores[0]), rng),
+        "top_orders": [
+            {"order": [players[i] for i in orders[order_id]], "avg_runs": float(score)}
+            for order_id, score in zip(best_ids, best_scores)
+        ],
+        "evaluated_orders": best_evaluated + worst_evaluated,
+    }
@@ -0,0 +1,154 @@
+import time
+
+import numpy as np
+
+from app.services.markov import build_transition_matrices, evaluate_orders
+from app.services.simulation import GAMES_PER_SEASON, simulate_orders, build_order_info
+
+def order_crossover(parent1, parent2, rng):
+    """
+    順序交叉 (OX): parent1 の連続区間をそのまま受け継ぎ、
+    残りの位置は区間の後ろから parent2 の並び順で埋める
+    """
+    start, stop = np.sort(rng.choice(10, size=2, replace=False))
+    child = np.full(9, -1, dtype=parent1.dtype)
+    child[start:stop] = parent1[start:stop]
+    positions = [(stop + k) % 9 for k in range(9 - (stop - start))]
+    inherited = set(parent1[start:stop].tolist())
+    genes = [g for g in np.roll(parent2, -stop) if g not in inherited]
+    child[positions] = genes
+    return child
+
+def swap_mutation(order, rng):
+    """打順の2か所をランダムに入れ替える"""
+    mutated = order.copy()
+    i, j = rng.choice(9, size=2, replace=False)
+    mutated[i], mutated[j] = mutated[j], mutated[i]
+    return mutated
+
+def _tournament(scores, tournament_size, rng):
+    """トーナメント選択: ランダムに選んだ個体のうち最も評価の高い個体の番号を返す"""
+    entrants = rng.choice(len(scores), size=min(tournament_size, len(scores)), replace=False)
+    return entrants[np.argmax(scores[entrants])]
+
+def genetic_batting_order_search(selected_players_df, progress_bar, max_evaluations=1000, time_limit=None,
+                                 population_size=50, elite_size=8, tournament_size=3, mutation_rate=0.3,
+                                 scorer="simulation", seed=None):
+    """
+    遺伝的アルゴリズムで最良打順を探索する
+
+    順序交叉・入れ替え突然変異・エリート保存・トーナメント選択で打順を進化させる。
+    各世代の打順はまとめて一括評価する。
+
+    Args:
+        selected_players_df (pd.DataFrame): 選択された9人の選手データ
+        progress_bar: Streamlitのプログレスバーオブジェクト (世代ごとの最良得点を text で表示する)
+        max_evaluations (int): 打順を評価する回数の上限 (ランダム探索の試行回数に相当)
+        time_limit (float, optional): 探索を打ち切る秒数
+        population_size (int): 1世代の個体数
+        elite_size (int): そのまま次世代に残す上位個体の数
+        tournament_size (int): トーナメント選択で比較する個体数
+        mutation_rate (float): 子に入れ替え突然変異を起こす確率
+        scorer (str): "simulation" (143試合の平均得点) または "markov" (厳密な期待得点)
+        seed (int, optional): 乱数シード
+
+    Returns:
+        dict: 最良打順、最悪打順 (評価した中で最も悪い打順)、それぞれの平均得点と成績、
+              世代ごとの最良得点 (trace) と評価した打順の数 (evaluated_orders)
+    """
+    if scorer not in ("simulation", "markov"):
+        raise ValueError(f"Unknown scorer: {scorer}")
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    transitions = build_transition_matrices(selected_players_df) if scorer == "markov" else None
+
+    def evaluate(orders):
+        """打順ごとの (得点の合計, 試合数, 成績の合計) を返す"""
+        if scorer == "markov":
+            return evaluate_orders(transitions, orders), np.ones(len(orders)), None
+        result = simulate_orders(selected_players_df, orders, GAMES_PER_SEASON, rng=rng)
+        return result['total_runs'].sum(axis=1), np.full(len(orders), GAMES_PER_SEASON), result['game_log']
+
+    population_size = max(2, min(population_size, max_evaluations))
+    elite_size = min(elite_size, population_size - 1)
+    population = np.array([rng.permutation(9) for _ in range(population_size)])
+    run_totals, game_counts, logs = evaluate(population)
+    scores = run_totals / game_counts
+    evaluations = population_size
+    worst = {"order": population[scores.argmin()], "score": scores.min(), "log": None if logs is None else logs[scores.argmin()]}
+    trace = [float(scores.max())]
+
+    def report():
+        progress_bar.progress(
+            min(evaluations / max_evaluations, 1.0),
+            text=f"第{len(trace)}世代: 最良 {trace[-1]:.3f}点 ({evaluations}/{max_evaluations}打順)"
+        )
+
+    report()
+    while evaluations < max_evaluations:
+        if time_limit is not None and time.perf_counter() - started >= time_limit:
+            break
+
+        # --- 次世代の生成 ---
+        elite = np.argsort(-scores)[:elite_size]
+        # シミュレーションでは上位個体も毎世代1シーズン追加で評価し、偶然の好成績を均す
+        reevaluate = scorer == "simulation"
+        num_children = population_size - elite_size
+        num_children = min(num_children, max_evaluations - evaluations - (elite_size if reevaluate else 0))
+        if num_children <= 0:
+            break
+        children = []
+        for _ in range(num_children):
+            parent1 = population[_tournament(scores, tournament_size, rng)]
+            parent2 = population[_tournament(scores, tournament_size, rng)]
+            child = order_crossover(parent1, parent2, rng)
+            if rng.random() < mutation_rate:
+                child = swap_mutation(child, rng)
+            children.append(child)
+        children = np.array(children)
+
+        # --- 世代をまとめて評価 ---
+        batch = np.concatenate([population[elite], children]) if reevaluate else children
+        batch_runs, batch_games, batch_logs = evaluate(batch)
+        evaluations += len(batch)
+        if reevaluate:
+            batch_runs[:elite_size] += run_totals[elite]
+            batch_games[:elite_size] += game_counts[elite]
+            batch_logs[:elite_size] += logs[elite]
+        else:
+            batch_runs = np.concatenate([run_totals[elite], batch_runs])
+            batch_games = np.concatenate([game_counts[elite], batch_games])
+        population = np.concatenate([population[elite], children])
+        run_totals, game_counts, logs = batch_runs, batch_games, batch_logs
+        scores = run_totals / game_counts
+
+        child_scores = scores[elite_size:]
+        if child_scores.min() < worst["score"]:
+            i = elite_size + child_scores.argmin()
+            worst = {"order": population[i], "score": scores[i], "log": None if logs is None else logs[i] * GAMES_PER_SEASON // game_counts[i]}
+        trace.append(float(scores.max()))
+        report()
+
+    # 最良打順は複数シーズン評価された個体 (エリート) から選ぶ
+    candidates = np.nonzero(game_counts > game_counts.min())[0]
+    if len(candidates) == 0:
+        candidates = np.arange(len(population))
+    i = candidates[scores[candidates].argmax()]
+    best = {"order": population[i], "score": scores[i], "log": None if logs is None else logs[i] * GAMES_PER_SEASON // game_counts[i]}
+
+    def order_info(entry):
+        if entry["log"] is None:
+            return build_order_info(selected_players_df, entry["order"], float(entry["score"]), rng)
+        return {
+            "order_df": selected_players_df.iloc[entry["order"]].reset_index(drop=True),
+            "avg_runs": float(entry["score"]),
+            "total_runs": int(round(entry["score"] * GAMES_PER_SEASON)),
+            "stats": entry["log"]
+        }
+
+    return {
+        "best_order": order_info(best),
+        "worst_order": order_info(worst),
+        "trace": trace,
+        "evaluated_orders": evaluations,
+    }
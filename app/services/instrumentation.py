@@ -0,0 +1,133 @@
+import cProfile
+import functools
+import io
+import pstats
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+
+# 計測する処理段階の表示名
+STAGE_LABELS = {
+    "compile": "打順データの変換 (pandas)",
+    "rng": "乱数生成・打席結果の抽選",
+    "advancement": "進塁・得点の処理 (遷移表)",
+    "logging": "成績ログの記録",
+}
+# カウンタの表示名
+COUNTER_LABELS = {
+    "plate_appearances": "打席数",
+    "bunt_attempts": "犠打の試行",
+    "double_plays": "併殺",
+    "rng_draws": "乱数の生成数",
+    "innings": "イニング数",
+}
+# プロファイル結果に表示する関数の数
+PROFILE_LIMIT = 30
+
+class Metrics:
+    """処理段階ごとの経過時間とカウンタ"""
+
+    def __init__(self):
+        self.timers = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.profile = None  # collect(profile=True) で取得したプロファイル結果 (テキスト)
+
+    def add_time(self, stage, seconds):
+        self.timers[stage] += seconds
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def summary(self):
+        """計測結果を辞書にまとめる (CLIのJSON出力や画面表示に使う)"""
+        total = sum(self.timers.values())
+        return {
+            "timers": {stage: {"seconds": seconds, "share": seconds / total if total > 0 else 0.0}
+                       for stage, seconds in self.timers.items()},
+            "counters": dict(self.counters),
+            "profile": self.profile,
+        }
+
+    def timer_frame(self):
+        """処理段階ごとの経過時間と割合の表"""
+        total = sum(self.timers.values())
+        return pd.DataFrame(
+            [(STAGE_LABELS.get(stage, stage), seconds, seconds / total if total > 0 else 0.0)
+             for stage, seconds in sorted(self.timers.items(), key=lambda item: -item[1])],
+            columns=["処理", "秒", "割合"]
+        )
+
+    def counter_frame(self):
+        """カウンタの表"""
+        return pd.DataFrame(
+            [(COUNTER_LABELS.get(name, name), value) for name, value in self.counters.items()],
+            columns=["項目", "回数"]
+        )
+
+    def format(self):
+        """計測結果をテキストで表す"""
+        lines = ["処理段階ごとの時間:"]
+        lines += [f"  {row['処理']}: {row['秒']:.3f}秒 ({row['割合']:.1%})" for _, row in self.timer_frame().iterrows()]
+        lines.append("カウンタ:")
+        lines += [f"  {row['項目']}: {row['回数']:,}" for _, row in self.counter_frame().iterrows()]
+        if self.profile:
+            lines += ["プロファイル:", self.profile]
+        return "\n".join(lines)
+
+class _State(threading.local):
+    # 計測中の Metrics (None なら計測しない)。バックグラウンドのジョブごとに分けるためスレッドごとに持つ
+    metrics = None
+
+_state = _State()
+
+def current():
+    """計測中なら Metrics を、そうでなければ None を返す (シミュレーションの各処理から呼び出す)"""
+    return _state.metrics
+
+@contextmanager
+def collect(profile=False):
+    """
+    with ブロック内のシミュレーションの処理段階ごとの時間とカウンタを計測する
+
+    計測していないときのシミュレーションの追加コストは、打席ごとの None の判定だけになる。
+    プロセスプールのワーカー (n_workers > 1) 内の処理は計測されないため、n_workers=1 で使う。
+
+    Args:
+        profile (bool): True なら cProfile でブロック全体のプロファイルも取得する
+
+    Yields:
+        Metrics: 計測結果 (ブロックを抜けた後に参照する)
+    """
+    previous = _state.metrics
+    metrics = Metrics()
+    _state.metrics = metrics
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_LIMIT)
+            metrics.profile = stream.getvalue()
+        _state.metrics = previous
+
+def instrumented(fn, profile=False):
+    """
+    fn を計測しながら実行する関数を返す
+
+    fn の戻り値が辞書なら、計測結果を "metrics" キーに加える。
+    引数の情報は fn のものを引き継ぐ (JobManager が cancel_token の有無を判定できるように)。
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with collect(profile=profile) as metrics:
+            result = fn(*args, **kwargs)
+        if isinstance(result, dict):
+            result["metrics"] = metrics
+        return result
+    return wrapper
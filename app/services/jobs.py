@@ -0,0 +1,146 @@
+import inspect
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.parallel import CancellationToken
+
+# 同時に実行するジョブの数 (超えた分は順番待ちになる)
+MAX_CONCURRENT_JOBS = 2
+# 保持しておく終了済みジョブの数 (超えたら古いものから消す)
+MAX_FINISHED_JOBS = 50
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+FINISHED_STATUSES = (DONE, CANCELLED, FAILED)
+
+class JobCancelled(Exception):
+    """取り消されたジョブを進捗の報告時に止めるための例外"""
+
+class JobProgress:
+    """
+    ジョブの進捗を受け取る、Streamlitのプログレスバーと同じ使い方のオブジェクト
+
+    cancel_token を受け取らない関数のジョブでは、取り消し後の progress() で JobCancelled を送出して処理を止める。
+    """
+
+    def __init__(self, cancel_token, raise_on_cancel):
+        self.cancel_token = cancel_token
+        self.raise_on_cancel = raise_on_cancel
+        self.value = 0.0
+        self.text = None
+
+    def progress(self, value, text=None):
+        if self.raise_on_cancel and self.cancel_token.cancelled:
+            raise JobCancelled()
+        self.value = float(value)
+        if text is not None:
+            self.text = text
+
+class Job:
+    """バックグラウンドで実行する探索1つ分の状態"""
+
+    def __init__(self, description, accepts_cancel_token):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = QUEUED
+        self.cancel_token = CancellationToken()
+        self.progress = JobProgress(self.cancel_token, raise_on_cancel=not accepts_cancel_token)
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+class JobManager:
+    """
+    探索をバックグラウンドのスレッドで実行するジョブ管理
+
+    Streamlitの再実行 (ウィジェットの変更) とは独立して動くため、
+    画面側はジョブIDを session_state に保存しておき、再実行のたびに状態を問い合わせる。
+    シミュレーション自体の並列化は各探索関数の n_workers (プロセスプール) に任せる。
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, max_finished_jobs=MAX_FINISHED_JOBS):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, description="", **kwargs):
+        """
+        探索関数をジョブとして登録する
+
+        fn は fn(*args, progress_bar=..., **kwargs) の形で呼び出す。
+        fn が cancel_token を引数に持つ場合はジョブの CancellationToken も渡す。
+
+        Returns:
+            str: ジョブID
+        """
+        accepts_cancel_token = "cancel_token" in inspect.signature(fn).parameters
+        job = Job(description, accepts_cancel_token)
+        if accepts_cancel_token:
+            kwargs = {**kwargs, "cancel_token": job.cancel_token}
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn, args, {**kwargs, "progress_bar": job.progress})
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_token.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        try:
+            job.result = fn(*args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = e
+            self._finish(job, FAILED)
+        else:
+            # cancel_token で途中終了した関数は、それまでの結果を返している
+            self._finish(job, CANCELLED if job.cancel_token.cancelled else DONE)
+
+    def _finish(self, job, status):
+        job.finished_at = time.time()
+        job.status = status
+
+    def _prune(self):
+        """終了済みのジョブが多すぎれば、古いものから消す"""
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for job in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        """ジョブIDからジョブを取り出す (見つからなければ None)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """ジョブを取り消す。順番待ちならそのまま実行せず、実行中なら次の区切りで止める"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return
+        job.cancel_token.cancel()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+
+    def result(self, job_id, timeout=None):
+        """ジョブの終了を待って結果を返す (見つからないジョブIDなら KeyError)"""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if not job.future.cancelled():
+            job.future.result(timeout=timeout)
+        return job.result
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel_token.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,215 @@
+import heapq
+import json
+import os
+from contextlib import ExitStack
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# 結果に残す上位・下位の打順の数
+DEFAULT_TOP_K = 10
+# 評価ログの列 (列名 -> (型, 1行あたりの要素数))
+EVALUATION_LOG_COLUMNS = {
+    "trial": ("<i8", 1),
+    "order": ("u1", 9),
+    "avg_runs": ("<f8", 1),
+    "std_error": ("<f8", 1),
+    "games": ("<i8", 1),
+}
+META_FILENAME = "meta.json"
+
+class LeaderboardEntry(NamedTuple):
+    """順位表の1打順分の評価結果"""
+    trial: int          # 試行番号 (評価した順の番号)
+    order: bytes        # 打順 (選手番号の9バイト)
+    avg_runs: float     # 1試合あたりの平均得点
+    std_error: float    # 平均得点の標準誤差 (求められなければ nan)
+    games: int          # 評価に使った試合数 (マルコフ連鎖なら0)
+    log: object         # 打者別成績の合計 (最良・最悪打順の成績の表示に使う。なければ None)
+
+    def permutation(self):
+        """打順を選手番号の配列にする"""
+        return np.frombuffer(self.order, dtype=np.uint8).astype(np.int64)
+
+def _order_codes(orders):
+    """打順 shape=(打順数, 9) を、比較に使う整数 (9進数の9桁) にする"""
+    return np.asarray(orders, dtype=np.int64) @ (9 ** np.arange(9, dtype=np.int64))
+
+class Leaderboard:
+    """
+    評価した打順のうち、平均得点の上位 top_k 件と下位 top_k 件だけを保持する順位表
+
+    打順は選手番号の9バイトで持ち、評価した打順の数によらず使うメモリは一定になる。
+    平均得点が同じなら、上位・下位のどちらでも試行番号の小さい (先に評価した) 打順を優先する。
+    保持している打順がもう一度評価されたら (再評価やキャッシュからの再取得)、2件目を加えずに新しい評価で置き換える。
+    置き換えで順位から外れて空いた枠は、それ以降に評価した打順で埋める (外れた打順の評価は残していないため)。
+
+    Args:
+        top_k (int): 保持する上位・下位の打順の数
+    """
+
+    def __init__(self, top_k=DEFAULT_TOP_K):
+        self.top_k = top_k
+        self.count = 0
+        # 上位は (平均得点, -試行番号) 、下位は (-平均得点, -試行番号) をキーにした最小ヒープ。
+        # 先頭が保持している中で最も順位の低い打順になる
+        self._top = []
+        self._bottom = []
+
+    @staticmethod
+    def _discard(heap, order):
+        """ヒープから同じ打順の評価を除く"""
+        for i, (_, entry) in enumerate(heap):
+            if entry.order == order:
+                heap[i] = heap[-1]
+                heap.pop()
+                heapq.heapify(heap)
+                return
+
+    def _offer(self, heap, key, entry):
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, (key, entry))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, entry))
+
+    def push(self, trial, order, avg_runs, std_error=np.nan, games=0, log=None):
+        """評価した打順を1つ加える"""
+        entry = LeaderboardEntry(int(trial), np.asarray(order, dtype=np.uint8).tobytes(), float(avg_runs),
+                                 float(std_error), int(games), log)
+        self.count += 1
+        for heap in (self._top, self._bottom):
+            self._discard(heap, entry.order)
+        self._offer(self._top, (entry.avg_runs, -entry.trial), entry)
+        self._offer(self._bottom, (-entry.avg_runs, -entry.trial), entry)
+
+    def push_many(self, trials, orders, avg_runs, std_errors=None, games=None, logs=None):
+        """
+        評価した打順をまとめて加える
+
+        上位・下位のどちらにも入らず、保持している打順とも重ならない打順は、1つずつ処理する前に配列の比較で除く。
+
+        Args:
+            trials (np.ndarray): 試行番号 shape=(打順数,)
+            orders (np.ndarray): 打順 shape=(打順数, 9)
+            avg_runs (np.ndarray): 平均得点
+            std_errors (np.ndarray, optional): 平均得点の標準誤差
+            games (np.ndarray, optional): 評価に使った試合数
+            logs (np.ndarray, optional): 打者別成績の合計 shape=(打順数, 9, len(GAME_LOG_KEYS))
+        """
+        avg_runs = np.asarray(avg_runs, dtype=np.float64)
+        candidates = np.ones(len(avg_runs), dtype=bool)
+        if len(self._top) == self.top_k and len(self._bottom) == self.top_k:
+            # 境界と同点の打順は試行番号で決まるため候補に残す
+            candidates = (avg_runs >= self._top[0][0][0]) | (avg_runs <= -self._bottom[0][0][0])
+            # 保持している打順の再評価は、順位が変わるため置き換える
+            held = [entry.permutation() for _, entry in self._top + self._bottom]
+            candidates |= np.isin(_order_codes(orders), _order_codes(np.array(held)))
+        for i in np.nonzero(candidates)[0]:
+            self.push(trials[i], orders[i], avg_runs[i],
+                      np.nan if std_errors is None else std_errors[i],
+                      0 if games is None else games[i],
+                      None if logs is None else logs[i])
+        self.count += len(avg_runs) - int(candidates.sum())
+
+    def top(self):
+        """上位の打順 (平均得点の高い順)"""
+        return [entry for _, entry in sorted(self._top, key=lambda item: item[0], reverse=True)]
+
+    def bottom(self):
+        """下位の打順 (平均得点の低い順)"""
+        return [entry for _, entry in sorted(self._bottom, key=lambda item: item[0], reverse=True)]
+
+    def best(self):
+        return max(self._top, key=lambda item: item[0])[1] if self._top else None
+
+    def worst(self):
+        return max(self._bottom, key=lambda item: item[0])[1] if self._bottom else None
+
+    def ranked_orders(self, players, bottom=False):
+        """
+        結果表示用の順位表 (exhaustive_search の top_orders と同じ形式に標準誤差と試合数を加えたもの)
+
+        Args:
+            players (list): 選手名 (打順の選手番号に対応する並び)
+            bottom (bool): True なら下位の打順
+
+        Returns:
+            list: {"order": 選手名のリスト, "avg_runs", "std_error", "games"} の辞書のリスト
+        """
+        return [
+            {"order": [players[i] for i in entry.permutation()], "avg_runs": entry.avg_runs,
+             "std_error": entry.std_error, "games": entry.games}
+            for entry in (self.bottom() if bottom else self.top())
+        ]
+
+class EvaluationLog:
+    """
+    評価した全ての打順を、列ごとのファイルに追記していく記録 (後から分析するためのもの)
+
+    ディレクトリに列ごとのバイナリファイル ({列名}.bin) と、列の型・選手名を書いた meta.json を置く。
+    評価した分をその都度追記するため全評価をメモリに持たず、途中で止まってもそれまでの記録が残る。
+    read_evaluation_log で DataFrame として読み込む。
+
+    Args:
+        path (str): 記録を書き出すディレクトリ (既存の記録は上書きする)
+        players (list): 選手名 (打順の選手番号に対応する並び)
+        **attributes: meta.json に書く探索の条件 (評価方法・シードなど)
+    """
+
+    def __init__(self, path, players, **attributes):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            "players": list(players),
+            "columns": {name: [dtype, width] for name, (dtype, width) in EVALUATION_LOG_COLUMNS.items()},
+            "attributes": attributes,
+        }
+        with open(os.path.join(path, META_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        # 途中の列のファイルを開けなかったときは、開いた分を閉じてから例外を伝える
+        with ExitStack() as stack:
+            self._files = {name: stack.enter_context(open(os.path.join(path, f"{name}.bin"), "wb"))
+                           for name in EVALUATION_LOG_COLUMNS}
+            stack.pop_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, trials, orders, avg_runs, std_errors, games):
+        """評価した打順をまとめて追記する (引数は Leaderboard.push_many と同じ)"""
+        values = {"trial": trials, "order": orders, "avg_runs": avg_runs, "std_error": std_errors, "games": games}
+        for name, (dtype, _) in EVALUATION_LOG_COLUMNS.items():
+            self._files[name].write(np.ascontiguousarray(values[name], dtype=dtype).tobytes())
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+def read_evaluation_log(path):
+    """
+    EvaluationLog で書き出した記録を読み込む
+
+    書き込み途中で止まった場合は、全ての列がそろっている行までを読む。
+
+    Returns:
+        pd.DataFrame: trial, order_1..order_9 (選手名), avg_runs, std_error, games の列を持つ表 (試行番号順)
+    """
+    with open(os.path.join(path, META_FILENAME), encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = {}
+    for name, (dtype, width) in meta["columns"].items():
+        values = np.fromfile(os.path.join(path, f"{name}.bin"), dtype=dtype)
+        columns[name] = values[:len(values) // width * width].reshape(-1, width)
+    rows = min(len(values) for values in columns.values())
+
+    players = np.array(meta["players"], dtype=object)
+    df = pd.DataFrame({"trial": columns["trial"][:rows, 0]})
+    for i in range(9):
+        df[f"order_{i + 1}"] = players[columns["order"][:rows, i]]
+    for name in ("avg_runs", "std_error", "games"):
+        df[name] = columns[name][:rows, 0]
+    return df.sort_values("trial", ignore_index=True)
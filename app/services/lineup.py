@@ -0,0 +1,58 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from app.services.transitions import speed_class
+
+# 打席結果の種類 (確率カラムは f'{r}_ratio')
+RESULT_TYPES = ['1B', '2B', '3B', 'HR', 'BB+HBP', 'SO', 'Ground_Out', 'Fly_Out']
+
+class CompiledBatter(NamedTuple):
+    """シミュレーション用に変換済みの打者1人分のデータ"""
+    cumulative: np.ndarray   # RESULT_TYPES 順の累積確率 (最後は1)
+    speed: int               # Speedスコア
+    runner_class: int        # 走者区分 (transitions.py の 0: なし, 1: 通常, 2: 俊足)
+    bunt_probability: float  # 犠打を試みる確率
+
+class CompiledLineup(NamedTuple):
+    """
+    シミュレーション用に変換済みの打順
+
+    打席ごとに pandas から値を取り出さずに済むよう、打順データを一度だけ配列に変換しておく。
+    """
+    cumulative: np.ndarray        # shape=(9, len(RESULT_TYPES)) の累積確率
+    speed: np.ndarray             # shape=(9,) のSpeedスコア
+    runner_class: np.ndarray      # shape=(9,) の走者区分
+    bunt_probability: np.ndarray  # shape=(9,) の犠打を試みる確率
+    batters: tuple                # 打順ごとの CompiledBatter
+    players: list                 # 選手名
+
+def compile_lineup(batting_order):
+    """
+    打順データを CompiledLineup に変換する (変換済みならそのまま返す)
+
+    累積確率は np.random.choice と同じ手順 (正規化 → 累積和 → 最後の値で割る) で求めるため、
+    同じ乱数列からは DataFrame のまま抽選した場合と同じ結果になる。
+
+    Args:
+        batting_order (pd.DataFrame | CompiledLineup): 打順データ (1行1選手)
+
+    Returns:
+        CompiledLineup: 変換済みの打順
+    """
+    if isinstance(batting_order, CompiledLineup):
+        return batting_order
+    probabilities = batting_order[[f'{r}_ratio' for r in RESULT_TYPES]].values.astype('float64')
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    cumulative = np.cumsum(probabilities, axis=1)
+    cumulative /= cumulative[:, -1:]
+    cumulative = np.ascontiguousarray(cumulative)
+    speed = batting_order['Speed'].values
+    runner_class = speed_class(speed.astype(int))
+    bunt_probability = batting_order['Out_ratio'].values.astype('float64') * 0.1
+    batters = tuple(
+        CompiledBatter(cumulative[i], speed[i], int(runner_class[i]), float(bunt_probability[i]))
+        for i in range(len(cumulative))
+    )
+    players = batting_order['Player'].tolist() if 'Player' in batting_order else []
+    return CompiledLineup(cumulative, speed, runner_class, bunt_probability, batters, players)
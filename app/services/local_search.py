@@ -0,0 +1,162 @@
+import numpy as np
+
+from app.services.simulation import GAMES_PER_SEASON, simulate_orders, generate_common_draws
+
+# 1ステップで比べる近傍の打順の数
+NEIGHBOURS_PER_STEP = 16
+# 比較に使う試合数の初期値と上限 (有意な改善が見つからないと倍にしていく)
+INITIAL_STEP_GAMES = GAMES_PER_SEASON
+MAX_STEP_GAMES = 16 * GAMES_PER_SEASON
+# 改善を採用する z 値 (再比較での対応のある差の平均 / 標準誤差)
+SIGNIFICANCE_Z = 2.0
+
+def swap_neighbours(order):
+    """2人の打順を入れ替えた打順 (36通り) を返す"""
+    neighbours = []
+    for i in range(9):
+        for j in range(i + 1, 9):
+            neighbour = order.copy()
+            neighbour[i], neighbour[j] = neighbour[j], neighbour[i]
+            neighbours.append(neighbour)
+    return neighbours
+
+def insertion_neighbours(order):
+    """1人を抜き出して別の打順に入れた打順を返す (隣との入れ替えと重複するものは除く)"""
+    neighbours = []
+    for i in range(9):
+        rest = np.delete(order, i)
+        for j in range(9):
+            if abs(i - j) > 1:
+                neighbours.append(np.insert(rest, j, order[i]))
+    return neighbours
+
+def neighbourhood(order):
+    """2人の入れ替えと挿入による近傍の打順 shape=(近傍数, 9) を返す"""
+    return np.array(swap_neighbours(order) + insertion_neighbours(order))
+
+def paired_improvement(total_runs):
+    """
+    先頭の打順に対する各打順の1試合あたりの得点差と、その z 値を求める
+
+    全ての打順を同じ共通乱数の試合で評価しているので、試合ごとの差 (対応のある差) で比べる。
+
+    Args:
+        total_runs (np.ndarray): shape=(打順数, 試合数) の試合ごとの得点。先頭が現在の打順
+
+    Returns:
+        tuple: (得点差の平均 shape=(打順数-1,), z 値 shape=(打順数-1,))
+              全ての試合で差が同じなら z 値は np.sign(平均) * inf (差が0なら0)
+    """
+    differences = total_runs[1:] - total_runs[0]
+    mean = differences.mean(axis=1)
+    standard_error = differences.std(axis=1, ddof=1) / np.sqrt(differences.shape[1])
+    # 差のばらつきが0なら、差が0でない限り確実な差とみなして z 値を ±inf にする
+    certain = np.where(mean > 0, np.inf, np.where(mean < 0, -np.inf, 0.0))
+    z = np.where(standard_error > 0, mean / np.where(standard_error > 0, standard_error, 1.0), certain)
+    return mean, z
+
+def _compare(selected_players_df, current, candidates, games, rng):
+    """現在の打順と候補を同じ共通乱数の games 試合で評価し、候補ごとの得点差と z 値を返す"""
+    common_draws = generate_common_draws(games, len(selected_players_df), rng)
+    total_runs = simulate_orders(selected_players_df, np.vstack([current, candidates]), games,
+                                 rng=rng, common_draws=common_draws)['total_runs']
+    return paired_improvement(total_runs) + (total_runs.size,)
+
+def local_search_batting_order(selected_players_df, progress_bar, max_games=None, initial_order=None,
+                               neighbours_per_step=NEIGHBOURS_PER_STEP, temperature=0.0, cooling=0.9,
+                               significance_z=SIGNIFICANCE_Z, seed=None):
+    """
+    現在の打順から、入れ替え・挿入の近傍を探索して打順を改善する (山登り法 / 焼きなまし法)
+
+    各ステップで近傍の打順をまとめて、現在の打順と同じ共通乱数の試合でシミュレーションし、
+    得点差が最も大きい近傍を新しい乱数の試合でもう一度現在の打順と比べる
+    (多数の近傍から選んだことによる偶然の好成績を除くため)。
+    再比較でも差が有意 (z 値が significance_z 以上) なら移動する。
+    有意でなければ温度に応じた確率で移動し (焼きなまし)、近傍全体で改善がなければ比較する試合数を倍にする。
+
+    Args:
+        selected_players_df (pd.DataFrame): 選択された9人の選手データ (行の並びを初期打順とする)
+        progress_bar: Streamlitのプログレスバーオブジェクト (現在の改善幅を text で表示する)
+        max_games (int, optional): シミュレーションする総試合数の上限 (省略時は100シーズン分)
+        initial_order (np.ndarray, optional): 初期打順 (省略時は selected_players_df の並び)
+        neighbours_per_step (int): 1ステップで比べる近傍の数
+        temperature (float): 焼きなましの初期温度 (1試合あたりの得点差の単位。0なら山登り法のみ)
+        cooling (float): 1ステップごとに温度に掛ける係数
+        significance_z (float): 改善を採用する z 値
+        seed (int, optional): 乱数シード
+
+    Returns:
+        dict: 最良打順と初期打順 (initial_order)、それぞれの平均得点と成績、
+              ステップごとの初期打順からの推定改善幅 (trace) と評価した打順の数 (evaluated_orders)
+    """
+    rng = np.random.default_rng(seed)
+    if max_games is None:
+        max_games = 100 * GAMES_PER_SEASON
+    start = np.arange(9) if initial_order is None else np.asarray(initial_order)
+    current, current_gain = start.copy(), 0.0
+    best, best_gain = start.copy(), 0.0
+    step_games = INITIAL_STEP_GAMES
+    simulated = evaluated = failures = 0
+    trace = [0.0]
+
+    while True:
+        neighbours = neighbourhood(current)
+        picked = neighbours[rng.choice(len(neighbours), size=min(neighbours_per_step, len(neighbours)), replace=False)]
+        # 予算が1ステップ分 (近傍の一括評価と再比較) に満たなければ終了
+        if simulated + (len(picked) + 3) * step_games > max_games:
+            break
+
+        # 現在の打順と近傍を同じ乱数の試合で一括評価し、最も良さそうな近傍を選ぶ
+        mean, _, games = _compare(selected_players_df, current, picked, step_games, rng)
+        candidate = picked[int(np.argmax(mean))]
+        # 選んだ近傍を新しい乱数の試合で再比較する
+        confirmed_mean, confirmed_z, confirm_games = _compare(selected_players_df, current, candidate[None], step_games, rng)
+        simulated += games + confirm_games
+        evaluated += len(picked)
+
+        if confirmed_z[0] >= significance_z:
+            # 有意な改善: 山登り
+            current, current_gain = candidate, current_gain + confirmed_mean[0]
+            failures = 0
+        else:
+            if temperature > 0 and rng.random() < np.exp(min(confirmed_mean[0], 0.0) / temperature):
+                # 焼きなまし: 有意でない移動も温度に応じて受け入れる
+                current, current_gain = candidate, current_gain + confirmed_mean[0]
+            failures += 1
+            # 近傍全体を調べても改善がなければ、比較する試合数を倍にして細かい差を見分ける
+            if failures * len(picked) >= len(neighbours):
+                # 最大の試合数でも改善がなければ局所最適とみなす
+                if step_games == MAX_STEP_GAMES:
+                    break
+                step_games, failures = min(step_games * 2, MAX_STEP_GAMES), 0
+        temperature *= cooling
+
+        if current_gain > best_gain:
+            best, best_gain = current.copy(), current_gain
+        trace.append(float(best_gain))
+        progress_bar.progress(
+            min(simulated / max_games, 1.0),
+            text=f"ステップ{len(trace) - 1}: 初期打順から +{best_gain:.3f}点 ({step_games}試合で比較)"
+        )
+
+    # 最良打順と初期打順を同じ乱数の1シーズンで比べて表示用の成績を作る
+    common_draws = generate_common_draws(GAMES_PER_SEASON, len(selected_players_df), rng)
+    final = simulate_orders(selected_players_df, np.vstack([best, start]), GAMES_PER_SEASON,
+                            rng=rng, common_draws=common_draws)
+
+    def order_info(i, order):
+        total_runs = int(final['total_runs'][i].sum())
+        return {
+            "order_df": selected_players_df.iloc[order].reset_index(drop=True),
+            "avg_runs": total_runs / GAMES_PER_SEASON,
+            "total_runs": total_runs,
+            "stats": final['game_log'][i]
+        }
+
+    progress_bar.progress(1.0, text=f"完了: 初期打順から +{best_gain:.3f}点 (推定)")
+    return {
+        "best_order": order_info(0, best),
+        "initial_order": order_info(1, start),
+        "trace": trace,
+        "evaluated_orders": evaluated,
+    }
@@ -0,0 +1,272 @@
+import numpy as np
+
+from app.services.lineup import RESULT_TYPES
+from app.services.transitions import (
+    NUM_BASE_STATES, NUM_STATES, INNING_OVER, NUM_EVENTS, EVENT_SACRIFICE_SUCCESS, EVENT_BUNT_FAIL,
+    TRANSITION_TABLE, decode_state, encode_state, speed_class,
+)
+
+# 1打席で入る得点の最大値 (満塁本塁打)
+MAX_RUNS_PER_PLAY = 4
+# 得点分布で区別する1イニング・1試合の得点の上限 (これ以上はまとめて最後の要素に入れる)
+MAX_INNING_RUNS = 15
+MAX_GAME_RUNS = 40
+
+def _event_probabilities(probabilities, bunt_probabilities):
+    """
+    選手・状態ごとのイベントの確率を求める。犠打はアウトが2つ未満で1塁か2塁に走者がいる場合のみ試みる。
+
+    Returns:
+        np.ndarray: shape=(選手数, 81, イベント数)
+    """
+    outs, r1, r2, _ = decode_state(np.arange(NUM_STATES))
+    bunt_situation = (outs < 2) & ((r1 > 0) | (r2 > 0))
+    bunt = np.where(bunt_situation, np.clip(bunt_probabilities, 0.0, 1.0)[:, None], 0.0)
+    events = np.zeros((len(probabilities), NUM_STATES, NUM_EVENTS))
+    events[:, :, :len(RESULT_TYPES)] = probabilities[:, None, :] * (1.0 - bunt)[:, :, None]
+    events[:, :, EVENT_SACRIFICE_SUCCESS] = bunt * 0.8
+    events[:, :, EVENT_BUNT_FAIL] = bunt * 0.2
+    return events
+
+def build_transition_matrices(players_df):
+    """
+    選手ごとの1打席の状態遷移行列を、transitions.py の遷移表から作成する
+
+    Args:
+        players_df (pd.DataFrame): 選手データ (1行1選手)
+
+    Returns:
+        dict:
+            runs_transition: shape=(選手数, MAX_RUNS_PER_PLAY+1, 81, 81)。
+                             [p, k, i, j] は選手pの打席で状態iからjへ進み、k点入る確率
+            transition: 得点で周辺化した遷移確率 shape=(選手数, 81, 81)
+            expected_runs: 各状態での1打席の期待得点 shape=(選手数, 81)
+            inning_end: 各状態で3アウト目になる確率 shape=(選手数, 81)
+    """
+    probabilities = players_df[[f'{r}_ratio' for r in RESULT_TYPES]].values.astype('float64')
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    bunt_probabilities = players_df['Out_ratio'].values.astype('float64') * 0.1
+    batter_classes = speed_class(players_df['Speed'].values.astype(int))
+    num_players = len(players_df)
+
+    # weights[p, s, e, k]: 選手pの打席で状態sからイベントeが起こり、その結果kになる確率
+    table = TRANSITION_TABLE
+    weights = _event_probabilities(probabilities, bunt_probabilities)[..., None] * table.probability[:, :, batter_classes].transpose(2, 0, 1, 3)
+    next_state = table.next_state[:, :, batter_classes].transpose(2, 0, 1, 3)
+    runs = table.runs[:, :, batter_classes].transpose(2, 0, 1, 3)
+    players = np.broadcast_to(np.arange(num_players)[:, None, None, None], weights.shape)
+    states = np.broadcast_to(np.arange(NUM_STATES)[None, :, None, None], weights.shape)
+
+    # 3アウトへの遷移は一旦 INNING_OVER 列に集めてから inning_end として取り出す
+    runs_transition = np.zeros((num_players, MAX_RUNS_PER_PLAY + 1, NUM_STATES, NUM_STATES + 1))
+    np.add.at(runs_transition, (players, runs, states, next_state), weights)
+    inning_end = runs_transition[:, :, :, INNING_OVER].sum(axis=1)
+    runs_transition = np.ascontiguousarray(runs_transition[:, :, :, :INNING_OVER])
+
+    run_values = np.arange(MAX_RUNS_PER_PLAY + 1)
+    return {
+        "runs_transition": runs_transition,
+        "transition": runs_transition.sum(axis=1),
+        "expected_runs": np.einsum('k,pkij->pi', run_values, runs_transition),
+        "inning_end": inning_end,
+    }
+
+def _step(distribution, matrices, player_ids):
+    """各行の状態分布を、その行の打者の遷移行列で1打席進める"""
+    if len(player_ids) <= 64:
+        return np.einsum('ri,rij->rj', distribution, matrices[player_ids])
+    new_distribution = np.empty_like(distribution)
+    for p in np.unique(player_ids):
+        rows = player_ids == p
+        new_distribution[rows] = distribution[rows] @ matrices[p]
+    return new_distribution
+
+def inning_outcomes(transitions, orders, tol=1e-12):
+    """
+    各打順・各先頭打者について、1イニングの期待得点と次イニングの先頭打者の分布を求める
+
+    先頭打者 s から始まるイニングでは k 人目の打者が (s + k) % 9 番に決まるため、
+    状態分布を1打席ずつ進めて、残りの確率が tol を下回るまで足し合わせる。
+
+    Args:
+        transitions (dict): build_transition_matrices の戻り値
+        orders (np.ndarray): shape=(打順数, 9) の選手番号 (players_df の行番号)
+        tol (float): 打ち切る残り確率
+
+    Returns:
+        tuple: (期待得点 shape=(打順数, 9), 次の先頭打者の分布 shape=(打順数, 9, 9))
+    """
+    orders = np.atleast_2d(orders)
+    num_orders = len(orders)
+    leadoff = np.tile(np.arange(9), num_orders)
+    order_rows = np.repeat(np.arange(num_orders), 9)
+
+    distribution = np.zeros((num_orders * 9, NUM_STATES))
+    distribution[:, 0] = 1.0 # 0アウト走者なし
+    runs = np.zeros(num_orders * 9)
+    next_leadoff = np.zeros((num_orders * 9, 9))
+
+    k = 0
+    while distribution.sum(axis=1).max() > tol:
+        slot = (leadoff + k) % 9
+        player_ids = orders[order_rows, slot]
+        runs += (distribution * transitions["expected_runs"][player_ids]).sum(axis=1)
+        next_leadoff[np.arange(len(slot)), (slot + 1) % 9] += (distribution * transitions["inning_end"][player_ids]).sum(axis=1)
+        distribution = _step(distribution, transitions["transition"], player_ids)
+        k += 1
+
+    return runs.reshape(num_orders, 9), next_leadoff.reshape(num_orders, 9, 9)
+
+def evaluate_orders(transitions, orders, innings=9):
+    """
+    打順ごとの1試合（innings イニング）の期待得点を厳密に計算する
+
+    Args:
+        transitions (dict): build_transition_matrices の戻り値
+        orders (np.ndarray): shape=(打順数, 9) の選手番号
+        innings (int): イニング数
+
+    Returns:
+        np.ndarray: 打順ごとの1試合あたり期待得点
+    """
+    inning_runs, next_leadoff = inning_outcomes(transitions, orders)
+    leadoff_distribution = np.zeros(inning_runs.shape)
+    leadoff_distribution[:, 0] = 1.0 # 1回の先頭は1番打者
+    total = np.zeros(len(inning_runs))
+    for _ in range(innings):
+        total += (leadoff_distribution * inning_runs).sum(axis=1)
+        leadoff_distribution = np.einsum('bs,bst->bt', leadoff_distribution, next_leadoff)
+    return total
+
+def expected_runs_per_game(batting_order):
+    """
+    打順の1試合（9イニング）あたりの期待得点を、乱数を使わずに厳密に計算する
+
+    Args:
+        batting_order (pd.DataFrame): 打順データ (0-8のインデックスを持つ)
+
+    Returns:
+        float: 1試合あたりの期待得点
+    """
+    transitions = build_transition_matrices(batting_order)
+    return float(evaluate_orders(transitions, np.arange(9))[0])
+
+def _add_runs(target, distribution, runs):
+    """得点の軸 (axis=1) を runs だけずらして加える (上限を超えた分は最後の要素にまとめる)"""
+    max_runs = target.shape[1] - 1
+    if runs == 0:
+        target += distribution
+        return
+    target[:, runs:] += distribution[:, :max_runs + 1 - runs]
+    target[:, max_runs] += distribution[:, max_runs + 1 - runs:].sum(axis=1)
+
+def inning_run_distributions(transitions, orders, max_runs=MAX_INNING_RUNS, tol=1e-12):
+    """
+    各打順・各先頭打者について、1イニングの得点と次イニングの先頭打者の同時分布を求める
+
+    inning_outcomes と同じく1打席ずつ状態分布を進めるが、(得点, 状態) の分布を持つことで
+    期待値だけでなく得点の分布を厳密に求める。
+
+    Args:
+        transitions (dict): build_transition_matrices の戻り値
+        orders (np.ndarray): shape=(打順数, 9) の選手番号
+        max_runs (int): 区別する得点の上限 (max_runs 点以上はまとめる)
+        tol (float): 打ち切る残り確率
+
+    Returns:
+        np.ndarray: shape=(打順数, 9, max_runs+1, 9)。
+                    [b, s, r, t] は打順bで s 番から始まるイニングで r 点入り、次の先頭が t 番になる確率
+    """
+    orders = np.atleast_2d(orders)
+    num_orders = len(orders)
+    num_rows = num_orders * 9
+    leadoff = np.tile(np.arange(9), num_orders)
+    order_rows = np.repeat(np.arange(num_orders), 9)
+    rows = np.arange(num_rows)
+
+    # distribution[row, r, i]: r 点入って状態 i にいる確率
+    distribution = np.zeros((num_rows, max_runs + 1, NUM_STATES))
+    distribution[:, 0, 0] = 1.0 # 0アウト走者なし、0点
+    outcome = np.zeros((num_rows, max_runs + 1, 9))
+
+    k = 0
+    while distribution.sum(axis=(1, 2)).max() > tol:
+        slot = (leadoff + k) % 9
+        player_ids = orders[order_rows, slot]
+        # 3アウトで終わる打席では得点は入らない (遷移表で3アウトへの遷移の得点は0)
+        outcome[rows, :, (slot + 1) % 9] += np.einsum('rmi,ri->rm', distribution, transitions["inning_end"][player_ids])
+        new_distribution = np.zeros_like(distribution)
+        for runs in range(MAX_RUNS_PER_PLAY + 1):
+            _add_runs(new_distribution, distribution @ transitions["runs_transition"][player_ids, runs], runs)
+        distribution = new_distribution
+        k += 1
+
+    return outcome.reshape(num_orders, 9, max_runs + 1, 9)
+
+def game_run_distributions(transitions, orders, innings=9, max_runs=MAX_GAME_RUNS):
+    """
+    打順ごとの1試合（innings イニング）の得点分布を厳密に計算する
+
+    イニングごとの (得点, 次の先頭打者) の同時分布を、先頭打者を引き継ぎながら innings 回畳み込む。
+
+    Args:
+        transitions (dict): build_transition_matrices の戻り値
+        orders (np.ndarray): shape=(打順数, 9) の選手番号
+        innings (int): イニング数
+        max_runs (int): 区別する得点の上限 (max_runs 点以上はまとめる)
+
+    Returns:
+        np.ndarray: shape=(打順数, max_runs+1)。[b, n] は打順bで1試合に n 点入る確率
+    """
+    inning = inning_run_distributions(transitions, orders)
+    num_orders = len(inning)
+    # game[b, t, n]: ここまでに n 点入り、次のイニングの先頭が t 番である確率
+    game = np.zeros((num_orders, 9, max_runs + 1))
+    game[:, 0, 0] = 1.0 # 1回の先頭は1番打者
+    for _ in range(innings):
+        new_game = np.zeros_like(game)
+        for runs in range(inning.shape[2]):
+            # [b, n, t] に並べてから得点の軸をずらす
+            moved = np.einsum('bsn,bst->bnt', game, inning[:, :, runs, :])
+            shifted = np.zeros((num_orders, max_runs + 1, 9))
+            _add_runs(shifted, moved, runs)
+            new_game += shifted.transpose(0, 2, 1)
+        game = new_game
+    return game.sum(axis=1)
+
+def summarize_run_distribution(distribution):
+    """
+    得点分布の要約
+
+    Args:
+        distribution (np.ndarray): 1試合の得点分布 shape=(max_runs+1,)
+
+    Returns:
+        dict: mean (期待得点), variance (分散), std (標準偏差), p_shutout (無得点の確率), p_5_or_more (5点以上の確率)
+    """
+    runs = np.arange(len(distribution))
+    mean = float(runs @ distribution)
+    variance = float(((runs - mean) ** 2) @ distribution)
+    return {
+        "mean": mean,
+        "variance": variance,
+        "std": variance ** 0.5,
+        "p_shutout": float(distribution[0]),
+        "p_5_or_more": float(distribution[5:].sum()),
+    }
+
+def run_distribution(batting_order, innings=9, max_runs=MAX_GAME_RUNS):
+    """
+    打順の1試合の得点分布を、乱数を使わずに厳密に計算する
+
+    Args:
+        batting_order (pd.DataFrame): 打順データ (0-8のインデックスを持つ)
+        innings (int): イニング数
+        max_runs (int): 区別する得点の上限 (max_runs 点以上は最後の要素にまとめる)
+
+    Returns:
+        dict: distribution (得点 0..max_runs の確率) と summarize_run_distribution の各値
+    """
+    transitions = build_transition_matrices(batting_order)
+    distribution = game_run_distributions(transitions, np.arange(9), innings=innings, max_runs=max_runs)[0]
+    return {"distribution": distribution, **summarize_run_distribution(distribution)}
@@ -0,0 +1,170 @@
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+# ワーカープロセスの起動方法。ジョブや画面のスレッドから fork すると、他のスレッドが持っていたロック
+# (キャッシュの SQLite・logging・numpy など) を持ったまま複製されて止まることがあるため fork は使わない
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# forkserver で先に読み込んでおくモジュール (ワーカーごとに numpy などを import し直さずに済む)
+PRELOAD_MODULES = ["app.services.simulation"]
+# ワーカー1つあたりに先に渡しておくタスクの数 (タスクは必要になった分だけ作る)
+PENDING_TASKS_PER_WORKER = 2
+
+def default_workers():
+    """利用可能なCPUコア数を返す"""
+    return os.cpu_count() or 1
+
+def spawn_seeds(seed, count):
+    """
+    チャンクごとに独立した乱数ストリームの種を作る
+
+    同じ seed からは常に同じ種の列ができるため、ワーカー数や完了順に関係なく結果が再現できる。
+    """
+    return np.random.SeedSequence(seed).spawn(count)
+
+def split_into_chunks(num_items, chunk_size):
+    """0..num_items を chunk_size ごとの (start, stop) に分割する"""
+    return [(start, min(start + chunk_size, num_items)) for start in range(0, num_items, chunk_size)]
+
+class CancellationToken:
+    """
+    長い探索を途中で止めるためのトークン
+
+    別のスレッド (画面のボタンのコールバックなど) から cancel() を呼ぶと、
+    探索側は次のタスクの区切りで処理を打ち切る。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+# 共有メモリ内の各配列の先頭を揃える境界 (バイト)
+_SHARED_ALIGNMENT = 64
+# ワーカープロセスで接続済みの共有メモリ (名前 -> (SharedMemory, 配列の辞書))
+_attached = {}
+
+class SharedArraysHandle(NamedTuple):
+    """ワーカーに渡す共有メモリの情報 (配列そのものは含まないため、受け渡しは数百バイトで済む)"""
+    name: str
+    layout: tuple  # (配列名, dtype, shape, 先頭のオフセット) のタプル
+
+class SharedArrays:
+    """
+    複数の numpy 配列を1つの共有メモリにまとめる
+
+    親プロセスで作成して handle をタスクの引数に渡すと、ワーカーは attach_shared_arrays で
+    コピーせずに読み取り専用の配列として参照できる。使い終わったら親プロセスで close() する。
+    """
+
+    def __init__(self, arrays):
+        layout, offset = [], 0
+        for key, array in arrays.items():
+            array = np.asarray(array)
+            layout.append((key, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // _SHARED_ALIGNMENT) * _SHARED_ALIGNMENT
+        self._memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (key, dtype, shape, start), array in zip(layout, arrays.values()):
+            np.ndarray(shape, dtype=dtype, buffer=self._memory.buf, offset=start)[...] = array
+        self.handle = SharedArraysHandle(self._memory.name, tuple(layout))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """共有メモリを解放する (接続中のワーカーの参照は、ワーカーが終わるまで有効)"""
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+def attach_shared_arrays(tables):
+    """
+    SharedArraysHandle から読み取り専用の配列の辞書を得る (配列の辞書ならそのまま返す)
+
+    ワーカープロセスでは共有メモリへの接続を名前ごとに1回だけ行い、同じ探索の後続のタスクで使い回す。
+    """
+    if not isinstance(tables, SharedArraysHandle):
+        return tables
+    if tables.name not in _attached:
+        memory = shared_memory.SharedMemory(name=tables.name)
+        arrays = {}
+        for key, dtype, shape, start in tables.layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=start)
+            array.flags.writeable = False
+            arrays[key] = array
+        _attached[tables.name] = (memory, arrays)
+    return _attached[tables.name][1]
+
+def _process_context():
+    """ワーカープロセスを起動する multiprocessing のコンテキスト (fork を使わない)"""
+    context = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == "forkserver":
+        context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+def map_chunks(fn, tasks, n_workers=1, cancel_token=None):
+    """
+    タスクをプロセスプールで並列に実行し、完了した順に (タスク番号, 結果) を返すジェネレータ
+
+    tasks がジェネレータなら、ワーカーに渡す直前に1つずつ取り出す (全タスクを先に作らない)。
+    cancel_token が取り消されるか、呼び出し側がジェネレータを閉じると、
+    まだ始まっていないタスクは実行せずに終了する (実行中のタスクの完了は待つ)。
+    ワーカーは fork ではなく START_METHOD で起動するため、スレッドから呼び出しても安全に使える。
+    fn と引数はワーカーで import・unpickle できるものに限る。
+
+    Args:
+        fn: 各タスクで呼び出す関数 (プロセス間で受け渡せるようモジュールのトップレベルに定義する)
+        tasks (iterable): fn に渡す引数のタプル (タスク番号は取り出した順の番号)
+        n_workers (int): ワーカープロセス数。1以下ならこのプロセス内で順に実行する
+        cancel_token (CancellationToken, optional): 途中で止めるためのトークン
+
+    Yields:
+        tuple: (タスク番号, fn の戻り値)
+    """
+    def cancelled():
+        return cancel_token is not None and cancel_token.cancelled
+
+    tasks = enumerate(tasks)
+    head = list(itertools.islice(tasks, 2)) if n_workers > 1 else []
+    if len(head) <= 1:
+        for i, args in itertools.chain(head, tasks):
+            if cancelled():
+                return
+            yield i, fn(*args)
+        return
+
+    tasks = itertools.chain(head, tasks)
+    executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=_process_context())
+    futures = {}
+
+    def submit(count):
+        for i, args in itertools.islice(tasks, count):
+            futures[executor.submit(fn, *args)] = i
+
+    try:
+        submit(n_workers * PENDING_TASKS_PER_WORKER)
+        while futures and not cancelled():
+            # 取り消しに気付けるよう、一定時間ごとに待機を切り上げる
+            finished, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = futures.pop(future)
+                if not cancelled():
+                    submit(1)
+                yield i, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
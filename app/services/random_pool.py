@@ -0,0 +1,92 @@
+import functools
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# 一度に生成する一様乱数の数
+DEFAULT_BLOCK_SIZE = 4096
+
+class RandomPool:
+    """
+    一様乱数をまとめて生成し、1つずつ取り出す乱数源
+
+    1打席ごとに NumPy の乱数を呼び出すと、1回あたりの呼び出しのコストが乱数の生成より大きくなる。
+    block_size 個の一様乱数をまとめて生成して Python の float のリストに変換しておき、random() で順に返す。
+    同じ seed からは block_size に関係なく同じ乱数列になる。
+
+    Args:
+        seed (int | np.random.SeedSequence | np.random.Generator, optional): 乱数シード (None なら毎回異なる)
+        block_size (int): 一度に生成する一様乱数の数
+    """
+
+    def __init__(self, seed=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.generator = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.block_size = block_size
+        # ブロックを使い切ると次のブロックを生成する、終わりのない一様乱数の列
+        blocks = iter(lambda: self.generator.random(self.block_size).tolist(), None)
+        self._draws = itertools.chain.from_iterable(blocks)
+        # [0, 1) の一様乱数を1つ返す (Python の関数を挟まずに next を呼ぶ)
+        self.random = functools.partial(next, self._draws)
+
+    def spawn(self, n):
+        """
+        独立した n 個の部分ストリームを作る (並列のタスクや試合ごとに分けて再現できるようにする)
+
+        Returns:
+            list: RandomPool のリスト
+        """
+        return [RandomPool(generator, self.block_size) for generator in self.generator.spawn(n)]
+
+def resolve(rng=None):
+    """
+    シミュレーションに渡された rng を RandomPool にする
+
+    Args:
+        rng (RandomPool | int | np.random.SeedSequence | np.random.Generator, optional):
+            None ならこのスレッドの乱数源 (current) を使う
+
+    Returns:
+        RandomPool: 乱数源
+    """
+    if rng is None:
+        return current()
+    if isinstance(rng, RandomPool):
+        return rng
+    return RandomPool(rng)
+
+class _State(threading.local):
+    # rng を指定しないシミュレーションが使う乱数源。バックグラウンドのジョブごとに分けるためスレッドごとに持つ
+    pool = None
+
+_state = _State()
+
+def current():
+    """このスレッドの乱数源 (最初に呼ばれたときに作る)"""
+    pool = _state.pool
+    if pool is None:
+        pool = _state.pool = RandomPool()
+    return pool
+
+def seed(seed=None):
+    """このスレッドの乱数源を seed で作り直す (np.random.seed の代わりに、以降の試合を再現できるようにする)"""
+    _state.pool = RandomPool(seed)
+
+@contextmanager
+def using(rng):
+    """with ブロック内で rng を指定しないシミュレーションに rng を使わせる"""
+    previous = _state.pool
+    _state.pool = resolve(rng)
+    try:
+        yield _state.pool
+    finally:
+        _state.pool = previous
+
+def _reset_after_fork():
+    # fork したワーカーが親と同じ乱数列を使わないよう、作り直させる
+    _state.pool = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
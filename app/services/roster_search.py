@@ -0,0 +1,144 @@
+import numpy as np
+
+from app.services.exhaustive_search import exhaustive_batting_order_search
+from app.services.local_search import neighbourhood
+from app.services.markov import build_transition_matrices, evaluate_orders
+from app.services.simulation import build_order_info
+
+# 打線の候補に残す選手の数 (その選手だけで打線を組んだときの期待得点の上位)
+DEFAULT_POOL_SIZE = 15
+# 山登りを始め直す回数 (初期打線からの1回を含む)
+DEFAULT_RESTARTS = 4
+# 結果に表示する上位の打線の数
+TOP_LINEUPS = 5
+# 打順の全探索をする場合に、山登りに割り当てる進捗の割合 (残りを全探索に使う)
+HILL_CLIMB_PROGRESS = 0.9
+
+class _ProgressRange:
+    """内側の処理の進捗 (0〜1) を、プログレスバーの start〜stop の範囲に割り当てる"""
+
+    def __init__(self, progress_bar, start, stop, text=None):
+        self.progress_bar = progress_bar
+        self.start, self.stop = start, stop
+        self.text = text
+
+    def progress(self, value, text=None):
+        self.progress_bar.progress(self.start + (self.stop - self.start) * value, text=text or self.text)
+
+def clone_scores(transitions, num_players):
+    """各選手だけで9人の打線を組んだときの1試合あたり期待得点 (候補の絞り込みに使う)"""
+    return evaluate_orders(transitions, np.repeat(np.arange(num_players)[:, None], 9, axis=1))
+
+def roster_neighbourhood(lineup, bench):
+    """
+    打順の入れ替え・挿入に加え、打線の1人を控えの選手と入れ替えた打線を返す
+
+    Args:
+        lineup (np.ndarray): 9人の選手番号 (打順の並び)
+        bench (np.ndarray): 控えの選手番号
+
+    Returns:
+        np.ndarray: shape=(近傍数, 9) の選手番号
+    """
+    replaced = np.repeat(lineup[None], 9 * len(bench), axis=0)
+    replaced[np.arange(len(replaced)), np.repeat(np.arange(9), len(bench))] = np.tile(bench, 9)
+    return np.vstack([neighbourhood(lineup), replaced])
+
+def roster_batting_order_search(players_df, progress_bar, initial_players=None, pool_size=DEFAULT_POOL_SIZE,
+                                restarts=DEFAULT_RESTARTS, exact_order=True, seed=None):
+    """
+    チームの全選手から、スタメンの9人と打順を同時に選ぶ
+
+    C(選手数, 9) x 9! 通りの打線は評価しきれないため、
+    1. 1人だけで打線を組んだときの期待得点 (マルコフ連鎖) で候補の選手を pool_size 人に絞り、
+    2. 打順の入れ替え・挿入と控えとの入れ替えの近傍を厳密な期待得点で一括評価する山登りを、
+       初期打線とランダムな打線から restarts 回行い、
+    3. 最良の9人の打順を全探索 (分枝限定法) で確定する。
+
+    Args:
+        players_df (pd.DataFrame): チームの全選手データ (9人以上)
+        progress_bar: Streamlitのプログレスバーオブジェクト (現在の最良得点を text で表示する)
+        initial_players (list, optional): 初期打線の9人の選手名 (省略時は候補の上位9人)
+        pool_size (int): 候補に残す選手の数 (初期打線の選手は必ず残す)
+        restarts (int): 山登りの回数
+        exact_order (bool): True なら最良の9人の打順を全探索で確定する
+        seed (int, optional): 乱数シード
+
+    Returns:
+        dict: 最良打線と初期打線 (initial_order)、それぞれの期待得点と成績、
+              上位の打線 (top_orders)、ステップごとの初期打線からの改善幅 (trace)、
+              評価した打線の数 (evaluated_orders)、候補の選手名 (pool)
+
+    Raises:
+        ValueError: 選手が9人未満の場合
+    """
+    if len(players_df) < 9:
+        raise ValueError(f"At least 9 players are required (got {len(players_df)})")
+    rng = np.random.default_rng(seed)
+    players_df = players_df.reset_index(drop=True)
+    players = players_df['Player'].tolist()
+    transitions = build_transition_matrices(players_df)
+
+    # --- 候補の選手の絞り込み ---
+    ranking = np.argsort(-clone_scores(transitions, len(players_df)), kind='stable')
+    if initial_players is not None:
+        start = np.array([players.index(name) for name in initial_players])
+    else:
+        start = ranking[:9]
+    pool = np.union1d(ranking[:max(pool_size, 9)], start)
+
+    start_score = float(evaluate_orders(transitions, start)[0])
+    best, best_score = start, start_score
+    local_optima = {}
+    evaluated = 1
+    trace = [0.0]
+
+    # --- 山登り (1回目は初期打線から、以降は候補からランダムに選んだ打線から) ---
+    climb_progress = _ProgressRange(progress_bar, 0.0, HILL_CLIMB_PROGRESS if exact_order else 1.0)
+    for restart in range(restarts):
+        lineup = start if restart == 0 else rng.permutation(rng.choice(pool, size=9, replace=False))
+        score = float(evaluate_orders(transitions, lineup)[0])
+        while True:
+            candidates = roster_neighbourhood(lineup, np.setdiff1d(pool, lineup))
+            scores = evaluate_orders(transitions, candidates)
+            evaluated += len(candidates)
+            i = int(np.argmax(scores))
+            if scores[i] <= score + 1e-12:
+                break
+            lineup, score = candidates[i], float(scores[i])
+            if score > best_score:
+                best, best_score = lineup, score
+            trace.append(best_score - start_score)
+            climb_progress.progress(
+                restart / restarts,
+                text=f"山登り{restart + 1}/{restarts}: 最良 {best_score:.3f}点 ({evaluated}打線を評価)"
+            )
+        local_optima[tuple(lineup.tolist())] = score
+        climb_progress.progress((restart + 1) / restarts, text=f"山登り{restart + 1}/{restarts}: 最良 {best_score:.3f}点 ({evaluated}打線を評価)")
+
+    # --- 最良の9人の打順を全探索で確定する ---
+    if exact_order:
+        # 全探索の進捗は、山登りの後の残りの範囲に続けて表示する
+        exhaustive_progress = _ProgressRange(progress_bar, HILL_CLIMB_PROGRESS, 1.0,
+                                             text=f"打順の全探索: 最良 {best_score:.3f}点の9人")
+        result = exhaustive_batting_order_search(players_df.iloc[best].reset_index(drop=True), exhaustive_progress,
+                                                 seed=int(rng.integers(2**32)))
+        evaluated += result['evaluated_orders']
+        best_order = result['best_order']
+        best = np.array([players.index(name) for name in best_order['order_df']['Player']])
+        best_score = best_order['avg_runs']
+        local_optima[tuple(best.tolist())] = best_score
+        trace.append(best_score - start_score)
+    else:
+        best_order = build_order_info(players_df, best, best_score, rng)
+
+    top = sorted(local_optima.items(), key=lambda item: -item[1])[:TOP_LINEUPS]
+    progress_bar.progress(1.0, text=f"完了: 初期打線から +{best_score - start_score:.3f}点")
+    return {
+        "best_order": best_order,
+        "initial_order": build_order_info(players_df, start, start_score, rng),
+        "top_orders": [{"order": [players[i] for i in lineup], "avg_runs": float(score)} for lineup, score in top],
+        "trace": trace,
+        "evaluated_orders": evaluated,
+        "pool": [players[i] for i in pool],
+    }
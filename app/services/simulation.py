@@ -1,41 +1,61 @@
+import itertools
+import time
+
 import numpy as np
 import pandas as pd
 
-def simulate_at_bat(player_stats):
+from app.services import instrumentation, random_pool
+from app.services.cache import group_by_games, order_keys
+from app.services.leaderboard import DEFAULT_TOP_K, EvaluationLog, Leaderboard
+from app.services.lineup import RESULT_TYPES, CompiledBatter, CompiledLineup, compile_lineup
+from app.services.markov import build_transition_matrices, evaluate_orders
+from app.services.parallel import SharedArrays, attach_shared_arrays, map_chunks, split_into_chunks
+from app.services.transitions import (
+    EVENT_NAMES, EVENT_FLY_OUT, EVENT_SACRIFICE_SUCCESS, EVENT_BUNT_FAIL, INNING_OVER, NUM_BASE_STATES,
+    apply_event, apply_events, decode_state,
+)
+
+# 打者別成績ログのキー
+GAME_LOG_KEYS = ['1B', '2B', '3B', 'HR', 'BB+HBP', 'SO', 'Ground_Out', 'Fly_Out', 'Sacrifice_Attempts', 'Sacrifice_Success', 'Out', 'RBI']
+# 成績ログのキー -> 成績配列の列番号
+LOG_COLUMNS = {key: k for k, key in enumerate(GAME_LOG_KEYS)}
+# 1シーズンの試合数 (NPBレギュラーシーズン相当)
+GAMES_PER_SEASON = 143
+# マルコフ連鎖で一度に評価する打順の数
+MARKOV_BATCH_SIZE = 256
+# シミュレーションで1つのタスクにまとめる打順の数
+DEFAULT_CHUNK_SIZE = 16
+# 探索の途中経過を返す最短の間隔 (秒)
+SNAPSHOT_INTERVAL = 0.5
+
+def simulate_at_bat(player_stats, rng=None):
     """
     1打席の結果をシミュレートする
 
     Args:
-        player_stats (pd.Series): 選手の成績データ
+        player_stats (pd.Series | CompiledBatter): 選手の成績データ
+        rng (RandomPool, optional): 乱数源 (省略時はスレッドごとの乱数源)
 
     Returns:
         str: 打席結果 (e.g., '1B', 'SO', 'Ground_Out')
     """
-    # 新しいアウトのカテゴリを含める
-    result_types = ['1B', '2B', '3B', 'HR', 'BB+HBP', 'SO', 'Ground_Out', 'Fly_Out']
-    probabilities = player_stats[[f'{r}_ratio' for r in result_types]].values.astype('float64')
+    draw = (rng or random_pool.current()).random()
+    if isinstance(player_stats, CompiledBatter):
+        # np.random.choice と同じく、一様乱数1つを累積確率で振り分ける
+        return RESULT_TYPES[player_stats.cumulative.searchsorted(draw, side='right')]
+
+    probabilities = player_stats[[f'{r}_ratio' for r in RESULT_TYPES]].values.astype('float64')
     
     # 確率の合計が1になるように正規化（浮動小数点誤差を考慮）
     probabilities /= probabilities.sum()
 
-    result = np.random.choice(result_types, p=probabilities)
-    return result
+    # compile_lineup と同じ手順で累積確率を求め、変換済みの打順と同じ結果にする
+    cumulative = np.cumsum(probabilities)
+    cumulative /= cumulative[-1]
+    return RESULT_TYPES[cumulative.searchsorted(draw, side='right')]
 
-def _should_advance_extra_base_single(runner_speed, current_outs):
-    """
-    ランナーが追加の塁に進むべきかを判定するヘルパー関数。
-    """
-    if runner_speed == 0: # No runner
-        return False
-    prob = 0.3
-    if runner_speed > 5: # Speed score
-        prob += 0.3
-    if current_outs == 2:
-        prob += 0.2
-    return np.random.rand() < prob
-
-def should_attempt_bunt(player_stats, outs, runners_on_base):
-    """犠打を試みるべきか判断する"""
+def should_attempt_bunt(player_stats, outs, runners_on_base, rng=None):
+    """犠打を試みるべきか判断する (犠打の場面でだけ乱数を1つ使う)"""
     # 0アウトまたは1アウトで、得点圏にランナーがいる、または1塁にランナーがいる
     is_bunt_situation = outs < 2 and (runners_on_base[1] > 0 or runners_on_base[0] > 0)
     if not is_bunt_situation:
@@ -43,213 +63,61 @@ def should_attempt_bunt(player_stats, outs, runners_on_base):
     
     # アウトになりやすい選手ほどバントを試行しやすくする
     # Out_ratioが高いほど、試行確率が上がる線形的な確率
-    bunt_probability = player_stats['Out_ratio'] * 0.1 # 係数は調整可能
-    return np.random.rand() < bunt_probability
+    if isinstance(player_stats, CompiledBatter):
+        bunt_probability = player_stats.bunt_probability
+    else:
+        bunt_probability = player_stats['Out_ratio'] * 0.1 # 係数は調整可能
+    return (rng or random_pool.current()).random() < bunt_probability
 
-def simulate_bunt():
+def simulate_bunt(rng=None):
     """犠打の成否をシミュレートする"""
     # 成功率は固定値 (例: 80%)
-    return 'Sacrifice_Success' if np.random.rand() < 0.8 else 'Bunt_Fail'
-
-def _advance_runners_on_groundout(runners_speed):
-    """ゴロアウトでの進塁を処理する"""
-    runs_scored = 0
-    new_runners = np.zeros(3, dtype=int)
+    return 'Sacrifice_Success' if (rng or random_pool.current()).random() < 0.8 else 'Bunt_Fail'
 
-    # 3塁ランナーは生還
-    if runners_speed[2] > 0:
-        runs_scored += 1
-    # 2塁ランナーは3塁へ
-    if runners_speed[1] > 0:
-        new_runners[2] = runners_speed[1]
-    # 1塁ランナーは2塁へ
-    if runners_speed[0] > 0:
-        new_runners[1] = runners_speed[0]
-
-    return runs_scored, new_runners
-
-
-def _advance_runners_numpy(runners_speed, hit_type, batter_speed, outs):
-    """
-    NumPyベースでランナーの進塁を処理するヘルパー関数。
-    runners_speed: np.array([speed_1b, speed_2b, speed_3b]) (0 if no runner)
-    hit_type: '1B', '2B', '3B', '3B', 'HR', 'BB+HBP'
-    batter_speed: 打者のSpeedスコア
-    outs: 現在のアウトカウント
-    """
-    runs_scored = 0
-    # Create a temporary array to hold the state of bases (0: Home, 1: 1st, 2: 2nd, 3: 3rd)
-    # Value is speed of runner, 0 if empty
-    bases = np.zeros(4, dtype=int)
-    if runners_speed[0] > 0: bases[1] = runners_speed[0] # 1st base
-    if runners_speed[1] > 0: bases[2] = runners_speed[1] # 2nd base
-    if runners_speed[2] > 0: bases[3] = runners_speed[2] # 3rd base
-
-    if hit_type == 'Sacrifice_Success':
-        # 3塁ランナーが生還 (スクイズの場合だが、ここでは単純化)
-        if bases[3] > 0:
-            runs_scored += 1
-            bases[3] = 0
-        # 2塁ランナーは3塁へ
-        if bases[2] > 0:
-            bases[3] = bases[2]
-            bases[2] = 0
-        # 1塁ランナーは2塁へ
-        if bases[1] > 0:
-            bases[2] = bases[1]
-            bases[1] = 0
-
-    elif hit_type == 'BB+HBP':
-        # Forced advancements
-        if bases[1] > 0: # Runner on 1st
-            if bases[2] > 0: # Runner on 2nd
-                if bases[3] > 0: # Runner on 3rd (bases loaded)
-                    runs_scored += 1 # 3rd scores
-                    bases[3] = bases[2] # 2nd to 3rd
-                    bases[2] = bases[1] # 1st to 2nd
-                    bases[1] = batter_speed # Batter to 1st
-                else: # 1st and 2nd occupied
-                    bases[3] = bases[2] # 2nd to 3rd
-                    bases[2] = bases[1] # 1st to 2nd
-                    bases[1] = batter_speed # Batter to 1st
-            else: # Only 1st occupied
-                bases[2] = bases[1] # 1st to 2nd
-                bases[1] = batter_speed # Batter to 1st
-        else: # Bases empty or only 2nd/3rd occupied
-            bases[1] = batter_speed # Batter to 1st
-
-    elif hit_type == '1B':
-        # 3rd base runner
-        if bases[3] > 0:
-            runs_scored += 1
-            bases[3] = 0
-        # 2nd base runner
-        if bases[2] > 0:
-            if _should_advance_extra_base_single(bases[2], outs):
-                runs_scored += 1
-            else:
-                bases[3] = bases[2]
-            bases[2] = 0
-        # 1st base runner
-        if bases[1] > 0:
-            # Check if 2nd base is now occupied by previous runner
-            can_try_for_third = (bases[2] == 0) # If 2nd base is empty after 2nd base runner moved
-            if can_try_for_third and _should_advance_extra_base_single(bases[1], outs):
-                bases[3] = bases[1]
-            else:
-                bases[2] = bases[1]
-            bases[1] = 0
-        # Batter to 1st
-        bases[1] = batter_speed
-
-    elif hit_type == '2B':
-        # 3rd, 2nd base runners score
-        if bases[3] > 0: runs_scored += 1
-        if bases[2] > 0: runs_scored += 1
-        bases[3] = 0
-        bases[2] = 0
-        # 1st base runner
-        if bases[1] > 0:
-            if _should_advance_extra_base_single(bases[1], outs):
-                runs_scored += 1
-            else:
-                bases[3] = bases[1]
-            bases[1] = 0
-        # Batter to 2nd
-        bases[2] = batter_speed
-
-    elif hit_type == '3B':
-        # All runners score
-        for i in range(1, 4):
-            if bases[i] > 0:
-                runs_scored += 1
-                bases[i] = 0
-        # Batter to 3rd
-        bases[3] = batter_speed
-
-    elif hit_type == 'HR':
-        # All runners score + batter scores
-        for i in range(1, 4):
-            if bases[i] > 0:
-                runs_scored += 1
-                bases[i] = 0
-        runs_scored += 1 # Batter scores
-
-    new_runners_speed = np.array([bases[1], bases[2], bases[3]])
-    return runs_scored, new_runners_speed
-
-def simulate_inning(batting_order, current_batter_abs_index, game_log, enable_log=True):
+def simulate_inning(batting_order, current_batter_abs_index, game_log, enable_log=True, rng=None):
     """
     1イニングのシミュレーションを行う
+
+    batting_order には DataFrame か compile_lineup で変換済みの打順を渡す。
+    rng には RandomPool かシード (省略時はスレッドごとの乱数源) を渡す。
     """
-    outs = 0
-    runners_speed = np.zeros(3, dtype=int)  # 1塁, 2塁, 3塁のランナーのSpeedスコア
+    metrics = instrumentation.current()
+    lineup = _compile(batting_order, metrics)
+    rng = random_pool.resolve(rng)
+    state = 0 # 0アウト走者なし (transitions.py の状態番号)
     runs = 0
     batter_abs_index = current_batter_abs_index
     inning_events = {} if enable_log else None
 
-    while outs < 3:
+    while state != INNING_OVER:
+        if metrics is not None:
+            started = time.perf_counter()
         batter_pos = batter_abs_index % 9
-        player_stats = batting_order.iloc[batter_pos]
-        rbi = 0
-        result = ''
+        player_stats = lineup.batters[batter_pos]
+        outs, *runners_on_base = decode_state(state)
 
         # --- 犠打の試行 ---
-        if should_attempt_bunt(player_stats, outs, runners_speed):
-            result = simulate_bunt()
-            game_log[batter_pos]['Sacrifice_Attempts'] += 1 # 試行を記録
+        attempt_bunt = should_attempt_bunt(player_stats, outs, runners_on_base, rng)
+        if attempt_bunt:
+            result = simulate_bunt(rng)
+            game_log[batter_pos, LOG_COLUMNS['Sacrifice_Attempts']] += 1 # 試行を記録
         else:
             # --- 通常の打席 ---
-            result = simulate_at_bat(player_stats)
-
-        # --- 結果処理 ---
-        if result == 'Sacrifice_Success':
-            outs += 1
-            runs_this_play, new_runners_speed = _advance_runners_numpy(
-                runners_speed, result, 0, outs # 打者はアウトなのでSpeedは0
-            )
-            runs += runs_this_play
-            rbi += runs_this_play
-            runners_speed = new_runners_speed
-            game_log[batter_pos]['Sacrifice_Success'] += 1
-
-        elif result == 'Bunt_Fail':
-            outs += 1
-            # 併殺なども考えられるが、単純に打者アウト、進塁なしとする
-            game_log[batter_pos]['Out'] += 1 # 通常のアウトとして記録
-
-        elif result in ['SO', 'Fly_Out']:
-            outs += 1
-            game_log[batter_pos][result] += 1
-            # フライアウトでのタッチアップはここで実装可能（今回は省略）
-
-        elif result == 'Ground_Out':
-            outs += 1
-            game_log[batter_pos][result] += 1
-            # 併殺打の簡易判定: 1アウト未満、1塁にランナー、で50%の確率
-            is_double_play = outs < 2 and runners_speed[0] > 0 and np.random.rand() < 0.5
-            if is_double_play:
-                outs += 1
-                # 1塁ランナーもアウト。他のランナーは進塁。
-                runners_speed[0] = 0 
-                runs_this_play, new_runners_speed = _advance_runners_on_groundout(runners_speed)
-                runs += runs_this_play
-                rbi += runs_this_play
-                runners_speed = new_runners_speed
-            elif outs < 3: # 3アウト目でないなら進塁
-                runs_this_play, new_runners_speed = _advance_runners_on_groundout(runners_speed)
-                runs += runs_this_play
-                rbi += runs_this_play
-                runners_speed = new_runners_speed
-
-        else: # ヒット or 四死球
-            game_log[batter_pos][result] += 1
-            runs_this_play, new_runners_speed = _advance_runners_numpy(
-                runners_speed, result, player_stats['Speed'], outs
-            )
-            runs += runs_this_play
-            rbi += runs_this_play
-            runners_speed = new_runners_speed
+            result = simulate_at_bat(player_stats, rng)
+
+        # --- 結果処理 (進塁・併殺・得点は遷移表で決まる) ---
+        if metrics is not None:
+            drawn = time.perf_counter()
+        state, rbi = apply_event(state, EVENT_CODES[result], player_stats.runner_class, rng.random())
+        runs += rbi
+        if metrics is not None:
+            advanced = time.perf_counter()
+            # 打席結果と進塁の乱数に加え、犠打の場面では試行判定の乱数を使う
+            bunt_situation = outs < 2 and (runners_on_base[0] > 0 or runners_on_base[1] > 0)
+            _count_plate_appearances(metrics, 1, int(attempt_bunt), int(decode_state(state)[0] - outs == 2),
+                                     2 + int(bunt_situation))
+        # 犠打失敗は通常のアウトとして記録
+        game_log[batter_pos, LOG_COLUMNS['Out' if result == 'Bunt_Fail' else result]] += 1
 
         # --- ログ記録 ---
         if enable_log:
@@ -261,40 +129,544 @@ def simulate_inning(batting_order, current_batter_abs_index, game_log, enable_lo
             else:
                 inning_events[batter_pos] += f", {log_event}"
         if rbi > 0:
-            game_log[batter_pos]['RBI'] += rbi
+            game_log[batter_pos, LOG_COLUMNS['RBI']] += rbi
 
         batter_abs_index += 1
+        if metrics is not None:
+            _add_stage_times(metrics, rng=drawn - started, advancement=advanced - drawn, logging=time.perf_counter() - advanced)
 
+    if metrics is not None:
+        metrics.count("innings")
     return runs, batter_abs_index, inning_events
 
-def simulate_game(batting_order, enable_inning_log=True):
+def _compile(batting_order, metrics):
+    """compile_lineup を呼び出す (計測中なら変換の時間を記録する)"""
+    if metrics is None:
+        return compile_lineup(batting_order)
+    started = time.perf_counter()
+    lineup = compile_lineup(batting_order)
+    metrics.add_time("compile", time.perf_counter() - started)
+    return lineup
+
+def _count_plate_appearances(metrics, plate_appearances, bunt_attempts, double_plays, rng_draws):
+    metrics.count("plate_appearances", plate_appearances)
+    metrics.count("bunt_attempts", bunt_attempts)
+    metrics.count("double_plays", double_plays)
+    metrics.count("rng_draws", rng_draws)
+
+def _add_stage_times(metrics, **stage_seconds):
+    for stage, seconds in stage_seconds.items():
+        metrics.add_time(stage, seconds)
+
+def new_game_log():
+    """打順別成績を記録する配列 shape=(9, len(GAME_LOG_KEYS)) を作る"""
+    return np.zeros((9, len(GAME_LOG_KEYS)), dtype=np.int64)
+
+def simulate_game(batting_order, enable_inning_log=True, season_log=None, rng=None):
     """
     1試合（9イニング）のシミュレーションを行う
 
     Args:
-        batting_order (pd.DataFrame): 打順データ (0-8のインデックスを持つ)
+        batting_order (pd.DataFrame | CompiledLineup): 打順データ (0-8のインデックスを持つ)
         enable_inning_log (bool): Trueの場合、イニングごとの詳細ログを生成する
+        season_log (np.ndarray, optional): new_game_log で作った配列。指定するとこの試合の成績を加算する
+        rng (RandomPool | int, optional): 乱数源またはシード (省略時はスレッドごとの乱数源)
 
     Returns:
-        dict: 試合結果
+        dict: 試合結果 (game_log は shape=(9, len(GAME_LOG_KEYS)) の成績配列)
     """
+    lineup = _compile(batting_order, instrumentation.current())
+    rng = random_pool.resolve(rng)
     total_runs = 0
     batter_abs_index = 0
-    game_log_keys = ['1B', '2B', '3B', 'HR', 'BB+HBP', 'SO', 'Ground_Out', 'Fly_Out', 'Sacrifice_Attempts', 'Sacrifice_Success', 'Out', 'RBI']
-    game_log = {i: {key: 0 for key in game_log_keys} for i in range(9)}
+    game_log = new_game_log()
     inning_by_inning_log = {i: [''] * 9 for i in range(9)} if enable_inning_log else None
 
     for inning in range(9):
-        runs, next_batter_abs_index, inning_events = simulate_inning(batting_order, batter_abs_index, game_log, enable_log=enable_inning_log)
+        runs, next_batter_abs_index, inning_events = simulate_inning(lineup, batter_abs_index, game_log, enable_log=enable_inning_log,
+                                                                 rng=rng)
         total_runs += runs
         batter_abs_index = next_batter_abs_index
         if enable_inning_log:
             for batter_pos, event in inning_events.items():
                 inning_by_inning_log[batter_pos][inning] = event
 
+    if season_log is not None:
+        season_log += game_log
     return {"total_runs": total_runs, "game_log": game_log, "inning_log": inning_by_inning_log}
 
-def estimate_best_batting_order(selected_players_df, num_trials, progress_bar):
+# --- 複数試合の一括シミュレーション ---
+
+# 打席結果 -> transitions.py のイベントコード
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_NAMES)}
+
+# 1打席あたりに消費する一様乱数の数
+# (犠打の試行判定, 打席結果/犠打の成否, 遷移表での進塁・併殺の判定)
+DRAWS_PER_PLATE_APPEARANCE = 3
+# 共通乱数を用意しておく、1試合あたりの選手ごとの打席数 (超えた打席は通常の乱数を使う)
+COMMON_PLATE_APPEARANCES = 12
+
+def _lineup_arrays(players_df):
+    """選手データから一括シミュレーション用の配列 (累積確率・犠打の試行確率・走者区分) を作る"""
+    lineup = _compile(players_df, instrumentation.current())
+    return lineup.cumulative, lineup.bunt_probability, lineup.runner_class
+
+def generate_common_draws(num_games, num_players=9, rng=None):
+    """
+    共通乱数 (Common Random Numbers) を生成する
+
+    [試合, 選手, その試合での何打席目か] ごとに1打席分の一様乱数を用意しておき、
+    どの打順で評価しても同じ選手の同じ打席には同じ乱数を使う。
+    打順間の得点差のばらつきが小さくなり、少ない試合数で打順の優劣を比べられる。
+
+    Args:
+        num_games (int): 試合数
+        num_players (int): 選手数 (players_df の行数)
+        rng (np.random.Generator, optional): 乱数生成器
+
+    Returns:
+        np.ndarray: shape=(num_games, num_players, COMMON_PLATE_APPEARANCES, DRAWS_PER_PLATE_APPEARANCE)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    return rng.random((num_games, num_players, COMMON_PLATE_APPEARANCES, DRAWS_PER_PLATE_APPEARANCE))
+
+def _lookup_common_draws(common_draws, game_ids, player, plate_appearance, rng):
+    """共通乱数から各試合の打席の乱数を取り出す (用意した打席数を超えた分は rng で補う)"""
+    draws = np.empty((len(player), DRAWS_PER_PLATE_APPEARANCE))
+    within = plate_appearance < common_draws.shape[2]
+    draws[within] = common_draws[game_ids[within], player[within], plate_appearance[within]]
+    draws[~within] = rng.random((int((~within).sum()), DRAWS_PER_PLATE_APPEARANCE))
+    return draws
+
+def _simulate_lockstep(cumulative, bunt_probability, runner_class, lineups, groups, num_groups, rng,
+                       common_draws=None, game_ids=None):
+    """
+    複数試合を1打席ずつ同時に進める一括シミュレーションの本体
+
+    Args:
+        cumulative, bunt_probability, runner_class: _lineup_arrays の戻り値
+        lineups (np.ndarray): shape=(試合数, 9)。各試合の打順 (選手の行番号)
+        groups (np.ndarray): 各試合の成績を集計するグループ番号
+        num_groups (int): グループ数
+        rng (np.random.Generator): 乱数生成器
+        common_draws (np.ndarray, optional): generate_common_draws で生成した共通乱数
+        game_ids (np.ndarray, optional): 各試合が使う共通乱数の試合番号
+
+    Returns:
+        tuple: (試合ごとの得点, グループ別・打順別の成績 shape=(num_groups, 9, len(GAME_LOG_KEYS)))
+    """
+    num_games = len(lineups)
+    states = np.zeros(num_games, dtype=np.int64) # transitions.py の状態番号 (0アウト走者なしから開始)
+    batter_abs_index = np.zeros(num_games, dtype=np.int64)
+    innings = np.zeros(num_games, dtype=np.int64)
+    total_runs = np.zeros(num_games, dtype=np.int64)
+    season_log = np.zeros((num_groups, 9, len(GAME_LOG_KEYS)), dtype=np.int64)
+    sacrifice_attempts = GAME_LOG_KEYS.index('Sacrifice_Attempts')
+    rbi = GAME_LOG_KEYS.index('RBI')
+    # イベントコード -> 成績ログの列 (バント失敗は通常のアウトとして記録)
+    event_log_column = np.array(list(range(8)) + [GAME_LOG_KEYS.index('Sacrifice_Success'), GAME_LOG_KEYS.index('Out')])
+
+    metrics = instrumentation.current()
+    active = np.arange(num_games)
+    while active.size > 0:
+        if metrics is not None:
+            started = time.perf_counter()
+        batter_pos = batter_abs_index[active] % 9
+        player = lineups[active, batter_pos]
+        group = groups[active]
+        current_state = states[active]
+        if common_draws is None:
+            draws = rng.random((active.size, DRAWS_PER_PLATE_APPEARANCE))
+        else:
+            # 打順が一巡するごとに各選手の打席数が1つ増える
+            draws = _lookup_common_draws(common_draws, game_ids[active], player, batter_abs_index[active] // 9, rng)
+
+        # --- 犠打の試行 ---
+        outs, runner_1b, runner_2b, _ = decode_state(current_state)
+        is_bunt_situation = (outs < 2) & ((runner_1b > 0) | (runner_2b > 0))
+        attempt_bunt = is_bunt_situation & (draws[:, 0] < bunt_probability[player])
+
+        # --- 通常の打席 (np.random.choice と同じく累積確率で決定) ---
+        event = np.minimum((draws[:, 1:2] >= cumulative[player]).sum(axis=1), EVENT_FLY_OUT)
+        event[attempt_bunt] = np.where(draws[attempt_bunt, 1] < 0.8, EVENT_SACRIFICE_SUCCESS, EVENT_BUNT_FAIL)
+
+        # --- 結果処理 (進塁・併殺・得点は遷移表で決まる) ---
+        if metrics is not None:
+            drawn = time.perf_counter()
+        new_state, runs = apply_events(current_state, event, runner_class[player], draws[:, 2])
+        if metrics is not None:
+            advanced = time.perf_counter()
+            _count_plate_appearances(metrics, active.size, attempt_bunt.sum(),
+                                     (new_state // NUM_BASE_STATES - outs == 2).sum(), draws.size)
+
+        # --- ログ記録 ---
+        np.add.at(season_log, (group, batter_pos, event_log_column[event]), 1)
+        np.add.at(season_log, (group[attempt_bunt], batter_pos[attempt_bunt], sacrifice_attempts), 1)
+        np.add.at(season_log, (group, batter_pos, rbi), runs)
+
+        total_runs[active] += runs
+        batter_abs_index[active] += 1
+
+        # 3アウトでイニング終了 (走者・アウトカウントをリセット)
+        inning_over = new_state == INNING_OVER
+        new_state[inning_over] = 0
+        states[active] = new_state
+        innings[active] += inning_over
+
+        active = active[innings[active] < 9]
+        if metrics is not None:
+            _add_stage_times(metrics, rng=drawn - started, advancement=advanced - drawn, logging=time.perf_counter() - advanced)
+            metrics.count("innings", inning_over.sum())
+
+    return total_runs, season_log
+
+def game_log_frame(log):
+    """成績配列を、配列をコピーせずに参照する DataFrame (行: 打順, 列: GAME_LOG_KEYS) にする"""
+    return pd.DataFrame(log, columns=GAME_LOG_KEYS, copy=False)
+
+def simulate_games(batting_order, num_games, rng=None):
+    """
+    複数試合（各9イニング）をまとめてシミュレーションする
+
+    各試合のアウトカウント・走者・打者・イニング・得点をNumPy配列で持ち、
+    全試合を1打席ずつ同時に進める。ルール（犠打・併殺・走力による追加進塁・
+    ゴロでの進塁）は simulate_game と同じ。
+
+    Args:
+        batting_order (pd.DataFrame | CompiledLineup): 打順データ (0-8のインデックスを持つ)
+        num_games (int): 試合数
+        rng (np.random.Generator, optional): 乱数生成器。省略時は新たに生成する
+
+    Returns:
+        dict: total_runs (試合ごとの得点, shape=(num_games,)) と
+              game_log (全試合を合計した打者別成績, simulate_gameと同じ形式の配列)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    lineups = np.tile(np.arange(9), (num_games, 1))
+    total_runs, season_log = _simulate_lockstep(
+        *_lineup_arrays(batting_order), lineups, np.zeros(num_games, dtype=np.int64), 1, rng
+    )
+    return {"total_runs": total_runs, "game_log": season_log[0]}
+
+def simulate_orders(players_df, orders, num_games, rng=None, common_draws=None):
+    """
+    複数の打順をそれぞれ num_games 試合ずつ、まとめて一括シミュレーションする
+
+    Args:
+        players_df (pd.DataFrame | CompiledLineup): 選手データ
+        orders (np.ndarray): shape=(打順数, 9) の打順 (players_df の行番号)
+        num_games (int): 打順ごとの試合数
+        rng (np.random.Generator, optional): 乱数生成器。省略時は新たに生成する
+        common_draws (np.ndarray, optional): generate_common_draws の戻り値。
+            指定すると全ての打順の i 試合目で同じ共通乱数を使う
+
+    Returns:
+        dict: total_runs (shape=(打順数, num_games) の試合ごとの得点) と
+              game_log (shape=(打順数, 9, len(GAME_LOG_KEYS)) の打順別成績の合計)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    return _simulate_order_arrays(*_lineup_arrays(players_df), orders, num_games, rng, common_draws)
+
+def _simulate_order_arrays(cumulative, bunt_probability, runner_class, orders, num_games, rng, common_draws=None):
+    """simulate_orders の本体 (変換済みの選手の配列を受け取る)"""
+    orders = np.atleast_2d(orders)
+    lineups = np.repeat(orders, num_games, axis=0)
+    groups = np.repeat(np.arange(len(orders)), num_games)
+    game_ids = None
+    if common_draws is not None:
+        if len(common_draws) < num_games:
+            raise ValueError(f"common_draws has {len(common_draws)} games, but {num_games} games were requested")
+        game_ids = np.tile(np.arange(num_games), len(orders))
+    total_runs, season_log = _simulate_lockstep(
+        cumulative, bunt_probability, runner_class, lineups, groups, len(orders), rng, common_draws, game_ids
+    )
+    return {"total_runs": total_runs.reshape(len(orders), num_games), "game_log": season_log}
+
+def build_order_info(selected_players_df, order, avg_runs, rng):
+    """
+    評価済みの打順から結果表示用の情報を作成する。
+    打者別成績は1シーズン分をシミュレーションして求める。
+    """
+    batting_order = selected_players_df.iloc[order].reset_index(drop=True)
+    result = simulate_games(batting_order, GAMES_PER_SEASON, rng=rng)
+    return {
+        "order_df": batting_order,
+        "avg_runs": avg_runs,
+        "total_runs": avg_runs * GAMES_PER_SEASON,
+        "stats": result['game_log']
+    }
+
+def random_orders(rng, num_orders):
+    """
+    ランダムな打順を num_orders 個作る
+
+    Returns:
+        np.ndarray: shape=(num_orders, 9) の打順 (選手番号は9人なので1打順9バイトで持つ)
+    """
+    return rng.permuted(np.tile(np.arange(9, dtype=np.uint8), (num_orders, 1)), axis=1)
+
+def _markov_snapshots(selected_players_df, num_trials, rng, cancel_token, throttle, leaderboard, evaluation_log):
+    """ランダムな打順をマルコフ連鎖の厳密な期待得点で評価し、途中経過を返すジェネレータ"""
+    transitions = build_transition_matrices(selected_players_df)
+    players = selected_players_df['Player'].tolist()
+
+    def order_info(entry, with_stats):
+        if with_stats:
+            return build_order_info(selected_players_df, entry.permutation(), entry.avg_runs, rng)
+        # 途中経過では打者別成績のシミュレーションを省く
+        return {
+            "order_df": selected_players_df.iloc[entry.permutation()].reset_index(drop=True),
+            "avg_runs": entry.avg_runs,
+            "total_runs": entry.avg_runs * GAMES_PER_SEASON,
+            "stats": None
+        }
+
+    for start in range(0, num_trials, MARKOV_BATCH_SIZE):
+        if cancel_token is not None and cancel_token.cancelled:
+            break
+        stop = min(start + MARKOV_BATCH_SIZE, num_trials)
+        orders = random_orders(rng, stop - start)
+        # 厳密な期待得点なので標準誤差は0、試合数は0とする
+        scores = evaluate_orders(transitions, orders)
+        _record_evaluations(leaderboard, evaluation_log, np.arange(start, stop), orders, scores,
+                            np.zeros(stop - start), np.zeros(stop - start, dtype=np.int64))
+        if throttle.due():
+            yield throttle.snapshot(leaderboard, lambda entry: order_info(entry, False), players, num_trials,
+                                    leaderboard.count, False)
+    yield throttle.snapshot(leaderboard, lambda entry: order_info(entry, True), players, num_trials,
+                            leaderboard.count, True)
+
+def _record_evaluations(leaderboard, evaluation_log, trials, orders, avg_runs, std_errors, games, logs=None):
+    """評価した打順を順位表と評価ログ (指定されていれば) に加える"""
+    leaderboard.push_many(trials, orders, avg_runs, std_errors, games, logs)
+    if evaluation_log is not None:
+        evaluation_log.append(trials, orders, avg_runs, std_errors, games)
+
+def _standard_errors(run_totals, run_squares, games):
+    """
+    打順ごとの games 試合の総得点と得点の2乗和から、平均得点の標準誤差を求める (2試合未満なら nan)
+
+    キャッシュから積み増した試合も総得点と2乗和を持つため、全ての試合のばらつきから求められる。
+    """
+    games = np.asarray(games, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = np.maximum(run_squares - run_totals ** 2 / games, 0.0) / (games - 1)
+        return np.where(games >= 2, np.sqrt(variance / games), np.nan)
+
+def lineup_tables(players_df, common_draws=None):
+    """
+    ワーカーに渡す選手の配列 (累積確率・犠打の試行確率・走者区分と共通乱数) をまとめる
+
+    並列実行ではこれを SharedArrays で共有メモリに置き、タスクには打順の番号だけを渡す。
+    """
+    cumulative, bunt_probability, runner_class = _lineup_arrays(players_df)
+    tables = {"cumulative": cumulative, "bunt_probability": bunt_probability, "runner_class": runner_class}
+    if common_draws is not None:
+        tables["common_draws"] = common_draws
+    return tables
+
+def evaluate_order_chunk(tables, orders, num_games, seed):
+    """
+    打順のまとまり (チャンク) を num_games 試合ずつシミュレーションする。
+    プロセスプールのワーカーから呼び出され、チャンクごとに独立した乱数ストリームを使う。
+
+    Args:
+        tables (dict | SharedArraysHandle): lineup_tables の戻り値、または共有メモリに置いたもの
+        orders (np.ndarray): shape=(打順数, 9) の打順
+        num_games (int): 打順ごとの試合数
+        seed (np.random.SeedSequence): このチャンク専用の乱数の種
+
+    Returns:
+        dict: total_runs (打順ごとの総得点)、run_squares (試合ごとの得点の2乗和) と
+              game_log (打順ごとの打順別成績の合計)
+    """
+    tables = attach_shared_arrays(tables)
+    result = _simulate_order_arrays(
+        tables["cumulative"], tables["bunt_probability"], tables["runner_class"], orders, num_games,
+        np.random.default_rng(seed), tables.get("common_draws")
+    )
+    return {
+        "total_runs": result['total_runs'].sum(axis=1),
+        # 平均得点の標準誤差を求めるための、試合ごとの得点の2乗和
+        "run_squares": (result['total_runs'].astype(np.float64) ** 2).sum(axis=1),
+        "game_log": result['game_log'],
+    }
+
+class _SnapshotThrottle:
+    """途中経過 (スナップショット) を一定の間隔でだけ作るための補助クラス"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = self.last = time.perf_counter()
+
+    def due(self):
+        """前回のスナップショットから interval 秒以上経っていれば True"""
+        return time.perf_counter() - self.last >= self.interval
+
+    def snapshot(self, leaderboard, order_info, players, num_trials, simulated_orders, final):
+        """
+        順位表から途中経過を作る
+
+        Args:
+            leaderboard (Leaderboard): 評価済みの打順の順位表
+            order_info: 順位表の1件 (LeaderboardEntry) から打順情報を作る関数
+            players (list): 選手名
+        """
+        now = time.perf_counter()
+        self.last = now
+        elapsed = now - self.started
+        best, worst = leaderboard.best(), leaderboard.worst()
+        evaluated = leaderboard.count
+        return {
+            "best_order": order_info(best) if best is not None else None,
+            "worst_order": order_info(worst) if worst is not None else None,
+            "top_orders": leaderboard.ranked_orders(players),
+            "bottom_orders": leaderboard.ranked_orders(players, bottom=True),
+            "evaluated": evaluated,
+            "num_trials": num_trials,
+            "elapsed": elapsed,
+            "throughput": simulated_orders / elapsed if elapsed > 0 else 0.0,
+            "done": final,
+            "cancelled": final and evaluated < num_trials,
+        }
+
+def stream_best_batting_order(selected_players_df, num_trials, scorer="simulation", n_workers=1,
+                              chunk_size=DEFAULT_CHUNK_SIZE, seed=None, common_random_numbers=False, cache=None,
+                              cancel_token=None, snapshot_interval=SNAPSHOT_INTERVAL, top_k=DEFAULT_TOP_K,
+                              evaluation_log=None):
+    """
+    ランダムな打順を評価しながら、その時点の最良・最悪打順を途中経過として返すジェネレータ
+
+    評価した打順は上位・下位 top_k 件の順位表 (Leaderboard) にだけ残し、打順は9バイトで持つため、
+    試行回数が多くても打順ごとの打者別成績などは保持しない。
+    途中経過は snapshot_interval 秒に1回まで作り、最後に必ず done=True の結果を返す。
+    cancel_token が取り消されると、それまでに評価した打順だけで最終結果を返す
+    (評価済みの結果はキャッシュにも書き込む)。
+    引数の意味は estimate_best_batting_order と同じ。
+
+    Yields:
+        dict: best_order, worst_order (評価済みの打順がなければ None)、
+              top_orders, bottom_orders (上位・下位の打順の順位表。平均得点・標準誤差・試合数を含む)、
+              evaluated (評価済みの打順数), num_trials, elapsed (経過秒数),
+              throughput (1秒あたりに評価した打順数), done (最終結果か), cancelled (途中で打ち切ったか)。
+              マルコフ連鎖で評価する場合、途中経過の stats は None
+    """
+    rng = np.random.default_rng(seed)
+    if scorer not in ("simulation", "markov"):
+        raise ValueError(f"Unknown scorer: {scorer}")
+    throttle = _SnapshotThrottle(snapshot_interval)
+    leaderboard = Leaderboard(top_k)
+    players = selected_players_df['Player'].tolist()
+
+    log = None
+    if evaluation_log is not None:
+        log = EvaluationLog(evaluation_log, players, scorer=scorer, num_trials=num_trials, seed=seed,
+                            common_random_numbers=common_random_numbers)
+    try:
+        if scorer == "markov":
+            yield from _markov_snapshots(selected_players_df, num_trials, rng, cancel_token, throttle, leaderboard, log)
+        else:
+            yield from _simulation_snapshots(selected_players_df, num_trials, rng, n_workers, chunk_size,
+                                             common_random_numbers, cache, cancel_token, throttle, leaderboard, log)
+    finally:
+        if log is not None:
+            log.close()
+
+def _simulation_snapshots(selected_players_df, num_trials, rng, n_workers, chunk_size, common_random_numbers, cache,
+                          cancel_token, throttle, leaderboard, evaluation_log):
+    """
+    ランダムな打順を143試合のシミュレーションで評価し、途中経過を返すジェネレータ
+
+    打順の生成とキャッシュの読み書きはチャンクごとに行い、試行回数によらず使うメモリを一定にする。
+    同じ探索の中で重複した打順は、先に評価し終えたチャンクの結果をキャッシュから使う。
+    """
+    players = selected_players_df['Player'].tolist()
+    log_shape = (len(selected_players_df), len(GAME_LOG_KEYS))
+    use_cache = cache is not None and not common_random_numbers
+    # チャンクごとの乱数の種はこの種から順に作る (ワーカー数や完了順に関係なく同じ種の列になる)
+    seed_sequence = np.random.SeedSequence(int(rng.integers(2**63)))
+    common_draws = None
+    if common_random_numbers:
+        common_draws = generate_common_draws(GAMES_PER_SEASON, len(selected_players_df), rng)
+    # 並列実行では選手の配列と共通乱数を共有メモリに置き、タスクには打順の番号だけを渡す
+    tables = lineup_tables(selected_players_df, common_draws)
+    shared = SharedArrays(tables) if n_workers > 1 and num_trials > chunk_size else None
+    task_tables = shared.handle if shared is not None else tables
+    # 実行中のタスクの打順とキャッシュ済みの結果 (タスク番号 -> タプル)。完了したら消す
+    pending = {}
+
+    def tasks():
+        """チャンクごとに打順を作り、キャッシュで1シーズンに足りない試合数ごとにタスクにする"""
+        # map_chunks のタスク番号は、このジェネレータが返した順の番号になる
+        task_ids = itertools.count()
+        for start, stop in split_into_chunks(num_trials, chunk_size):
+            trials = np.arange(start, stop)
+            orders = random_orders(rng, stop - start)
+            keys = None
+            if use_cache:
+                keys = order_keys(selected_players_df, orders)
+                run_totals, run_squares, game_counts, logs = cache.lookup(keys, log_shape)
+            else:
+                run_totals, run_squares = np.zeros(len(trials)), np.zeros(len(trials))
+                game_counts = np.zeros(len(trials), dtype=np.int64)
+                logs = np.zeros((len(trials), *log_shape), dtype=np.int64)
+            needed_games = np.maximum(GAMES_PER_SEASON - game_counts, 0)
+
+            # キャッシュだけで1シーズン分そろっている打順はシミュレーションせずに評価済みとする
+            cached = needed_games == 0
+            if cached.any():
+                _record_evaluations(leaderboard, evaluation_log, trials[cached], orders[cached],
+                                    run_totals[cached] / game_counts[cached],
+                                    _standard_errors(run_totals[cached], run_squares[cached], game_counts[cached]),
+                                    game_counts[cached], logs[cached])
+            for games, ids in group_by_games(needed_games):
+                pending[next(task_ids)] = (
+                    games, trials[ids], orders[ids], None if keys is None else [keys[i] for i in ids],
+                    run_totals[ids], run_squares[ids], game_counts[ids], logs[ids],
+                )
+                yield task_tables, orders[ids], games, seed_sequence.spawn(1)[0]
+
+    simulated_orders = 0
+
+    def order_info(entry):
+        return {
+            "order_df": selected_players_df.iloc[entry.permutation()].reset_index(drop=True),
+            "avg_runs": entry.avg_runs,
+            # 1シーズンあたりに換算した総得点 (表示用に整数に丸める)
+            "total_runs": int(round(entry.avg_runs * GAMES_PER_SEASON)),
+            # キャッシュで試合数が1シーズンを超えた打順は1シーズン分に換算する
+            "stats": entry.log * GAMES_PER_SEASON // entry.games,
+            "std_error": entry.std_error,
+        }
+
+    try:
+        for task_id, chunk_result in map_chunks(evaluate_order_chunk, tasks(), n_workers=n_workers,
+                                                cancel_token=cancel_token):
+            games, trials, orders, keys, run_totals, run_squares, game_counts, logs = pending.pop(task_id)
+            if keys is not None:
+                # 評価し終えたチャンクはすぐにキャッシュに書き込む (途中で打ち切ってもそれまでの結果が残る)
+                cache.add(keys, np.full(len(keys), games), chunk_result["total_runs"], chunk_result["run_squares"],
+                          chunk_result["game_log"])
+            run_totals = run_totals + chunk_result["total_runs"]
+            run_squares = run_squares + chunk_result["run_squares"]
+            game_counts = game_counts + games
+            simulated_orders += len(trials)
+            _record_evaluations(leaderboard, evaluation_log, trials, orders, run_totals / game_counts,
+                                _standard_errors(run_totals, run_squares, game_counts), game_counts,
+                                logs + chunk_result["game_log"])
+            if throttle.due():
+                yield throttle.snapshot(leaderboard, order_info, players, num_trials, simulated_orders, False)
+    finally:
+        if shared is not None:
+            shared.close()
+    yield throttle.snapshot(leaderboard, order_info, players, num_trials, simulated_orders, True)
+
+def estimate_best_batting_order(selected_players_df, num_trials, progress_bar, scorer="simulation",
+                                n_workers=1, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, common_random_numbers=False,
+                                cache=None, cancel_token=None, top_k=DEFAULT_TOP_K, evaluation_log=None):
     """
     最良打順を推定するために、複数回のシミュレーションを実行する
 
@@ -302,62 +674,37 @@ def estimate_best_batting_order(selected_players_df, num_trials, progress_bar):
         selected_players_df (pd.DataFrame): 選択された9人の選手データ
         num_trials (int): 試行回数
         progress_bar: Streamlitのプログレスバーオブジェクト
+        scorer (str): 打順の評価方法。
+            "simulation": 143試合のシミュレーションの平均得点
+            "markov": マルコフ連鎖による1試合あたりの厳密な期待得点
+                      (打者別成績は最良・最悪打順のみ1シーズン分シミュレーションする)
+        n_workers (int): シミュレーションに使うワーカープロセス数 (1なら並列化しない)
+        chunk_size (int): 1つのタスクでまとめて評価する打順の数
+        seed (int, optional): 乱数シード。指定するとワーカー数によらず同じ結果になる
+        common_random_numbers (bool): True なら全ての打順を同じ共通乱数の143試合で評価する
+        cache (EvaluationCache, optional): 打順の評価結果のキャッシュ。
+            以前に評価した打順は143試合に足りない分だけシミュレーションし、結果を積み増す。
+            共通乱数を使う場合は試合ごとの乱数が揃わなくなるため使わない
+        cancel_token (CancellationToken, optional): 途中で止めるためのトークン。
+            取り消すとそれまでに評価した打順から最良・最悪打順を選ぶ
+        top_k (int): 結果に含める上位・下位の打順の数
+        evaluation_log (str, optional): 評価した全ての打順を記録するディレクトリ (EvaluationLog)
 
     Returns:
-        dict: 最良打順、最悪打順、それぞれの平均得点と成績
+        dict: 最良打順、最悪打順、それぞれの平均得点と成績、
+              上位・下位の打順 (top_orders, bottom_orders。平均得点・標準誤差・試合数を含む)
     """
-    best_order_info = {"avg_runs": 0}
-    worst_order_info = {"avg_runs": float('inf')}
-
-    # Define the order of keys for consistent indexing
-    result_keys = ['1B', '2B', '3B', 'HR', 'BB+HBP', 'SO', 'Ground_Out', 'Fly_Out', 'Sacrifice_Attempts', 'Sacrifice_Success', 'Out', 'RBI']
-
-    for i in range(num_trials):
-        # 打順をシャッフル
-        batting_order = selected_players_df.sample(frac=1).reset_index(drop=True)
-
-        total_runs_for_trial = 0
-        # 1シーズン(143試合)の成績を合計するためのログをNumPy配列で初期化
-        season_game_log_array = np.zeros((9, len(result_keys)), dtype=int)
-
-        for _ in range(143):
-            # 高速化のためイニングログは無効にする
-            result = simulate_game(batting_order, enable_inning_log=False)
-            total_runs_for_trial += result['total_runs']
-
-            # Convert current game_log to NumPy array and add to season_game_log_array
-            current_game_log_array = np.zeros((9, len(result_keys)), dtype=int)
-            for p in range(9):
-                for k_idx, key in enumerate(result_keys):
-                    current_game_log_array[p, k_idx] = result['game_log'][p][key]
-            season_game_log_array += current_game_log_array
-        
-        avg_runs = total_runs_for_trial / 143
-
-        # Convert season_game_log_array back to dictionary for output
-        season_game_log_dict = {}
-        for p in range(9):
-            season_game_log_dict[p] = {key: season_game_log_array[p, k_idx] for k_idx, key in enumerate(result_keys)}
-
-        if avg_runs > best_order_info["avg_runs"]:
-            best_order_info = {
-                "order_df": batting_order,
-                "avg_runs": avg_runs,
-                "total_runs": total_runs_for_trial,
-                "stats": season_game_log_dict # Use the converted dictionary
-            }
-        
-        if avg_runs < worst_order_info["avg_runs"]:
-            worst_order_info = {
-                "order_df": batting_order,
-                "avg_runs": avg_runs,
-                "total_runs": total_runs_for_trial,
-                "stats": season_game_log_dict # Use the converted dictionary
-            }
-
-        progress_bar.progress((i + 1) / num_trials)
-
+    result = None
+    for snapshot in stream_best_batting_order(selected_players_df, num_trials, scorer=scorer, n_workers=n_workers,
+                                              chunk_size=chunk_size, seed=seed,
+                                              common_random_numbers=common_random_numbers, cache=cache,
+                                              cancel_token=cancel_token, top_k=top_k,
+                                              evaluation_log=evaluation_log):
+        progress_bar.progress(snapshot['evaluated'] / num_trials)
+        result = snapshot
     return {
-        "best_order": best_order_info,
-        "worst_order": worst_order_info
-    }
\ No newline at end of file
+        "best_order": result['best_order'],
+        "worst_order": result['worst_order'],
+        "top_orders": result['top_orders'],
+        "bottom_orders": result['bottom_orders'],
+    }
@@ -0,0 +1,159 @@
+import numpy as np
+
+from app.services.cache import group_by_games, order_keys
+from app.services.simulation import GAMES_PER_SEASON, GAME_LOG_KEYS, simulate_orders
+
+# 1段階目に各打順へ割り当てる試合数
+INITIAL_GAMES = 36
+# 最終段階まで勝ち残った打順を評価するシーズン数
+FINAL_SEASONS = 4
+# 各段階で残す打順の割合の逆数 (2なら上位半分を残す)
+REDUCTION_FACTOR = 2
+# 一度にシミュレーションする打順の数
+RACING_BATCH_SIZE = 256
+
+def game_schedule(initial_games=INITIAL_GAMES, reduction_factor=REDUCTION_FACTOR, final_games=GAMES_PER_SEASON):
+    """
+    各段階終了時点での打順あたりの累計試合数を返す
+
+    例: 36, 72, 144, 288, 572 (最終段階は必ず final_games になる)
+    """
+    schedule = []
+    games = initial_games
+    while games < final_games:
+        schedule.append(games)
+        games *= reduction_factor
+    schedule.append(final_games)
+    return schedule
+
+def survivors_per_round(num_candidates, num_rounds, reduction_factor=REDUCTION_FACTOR):
+    """各段階でシミュレーションする打順の数を返す (最低1つは残す)"""
+    counts = [num_candidates]
+    for _ in range(num_rounds - 1):
+        counts.append(max(1, counts[-1] // reduction_factor))
+    return counts
+
+def racing_cost(num_candidates, schedule, reduction_factor=REDUCTION_FACTOR):
+    """num_candidates 個の打順から始めたときにシミュレーションする総試合数"""
+    counts = survivors_per_round(num_candidates, len(schedule), reduction_factor)
+    previous = [0] + schedule[:-1]
+    return sum(n * (games - done) for n, games, done in zip(counts, schedule, previous))
+
+def initial_candidates(budget_games, schedule, reduction_factor=REDUCTION_FACTOR):
+    """総試合数が budget_games に収まる最大の初期打順数を求める"""
+    low, high = 1, max(1, budget_games // schedule[0])
+    while low < high:
+        middle = (low + high + 1) // 2
+        if racing_cost(middle, schedule, reduction_factor) <= budget_games:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def successive_halving_search(selected_players_df, num_trials, progress_bar, initial_games=INITIAL_GAMES,
+                              reduction_factor=REDUCTION_FACTOR, final_seasons=FINAL_SEASONS, seed=None, cache=None):
+    """
+    逐次半減法 (レース) で最良打順を探索する
+
+    多くの打順を少ない試合数でシミュレーションし、各段階で平均得点の下位を脱落させる。
+    勝ち残った打順には試合を追加し、最終段階の数打順は final_seasons シーズン分評価する。
+    (上位の打順どうしの差は1シーズンの得点のばらつきより小さいため、決勝は複数シーズンで比べる)
+    総試合数はランダム探索で num_trials 個の打順を143試合ずつ評価する場合と同じにする。
+    予算は打席数ではなく試合数で数える。同じ9人の打順どうしでは1試合あたりの打席数の差が小さいため、
+    試合数をそろえればシミュレーションする打席数もほぼ同じになる。
+
+    Args:
+        selected_players_df (pd.DataFrame): 選択された9人の選手データ
+        num_trials (int): ランダム探索に換算した試行回数 (総試合数 = num_trials * 143)
+        progress_bar: Streamlitのプログレスバーオブジェクト (段階ごとの残り打順数を text で表示する)
+        initial_games (int): 1段階目に各打順へ割り当てる試合数
+        reduction_factor (int): 各段階で上位 1/reduction_factor を残す
+        final_seasons (int): 最終段階の打順を評価するシーズン数
+        seed (int, optional): 乱数シード
+        cache (EvaluationCache, optional): 打順の評価結果のキャッシュ。
+            以前に評価した打順は各段階の累計試合数に足りない分だけシミュレーションする
+
+    Returns:
+        dict: 最良打順、最悪打順 (1段階目で最も悪い打順)、それぞれの平均得点と成績、
+              初期打順数 (evaluated_orders) とシミュレーションした総試合数 (simulated_games)
+    """
+    rng = np.random.default_rng(seed)
+    schedule = game_schedule(initial_games, reduction_factor, final_seasons * GAMES_PER_SEASON)
+    budget_games = num_trials * GAMES_PER_SEASON
+    # 最悪打順にも1シーズン分の試合を追加するため、その分を予算から除く
+    num_candidates = initial_candidates(max(budget_games - GAMES_PER_SEASON, schedule[0]), schedule, reduction_factor)
+    counts = survivors_per_round(num_candidates, len(schedule), reduction_factor)
+
+    orders = np.array([rng.permutation(9) for _ in range(num_candidates)])
+    log_shape = (len(selected_players_df), len(GAME_LOG_KEYS))
+    keys = None
+    if cache is not None:
+        keys = order_keys(selected_players_df, orders)
+        run_totals, run_squares, game_counts, logs = cache.lookup(keys, log_shape)
+    else:
+        run_totals = np.zeros(num_candidates)
+        run_squares = np.zeros(num_candidates)
+        game_counts = np.zeros(num_candidates, dtype=np.int64)
+        logs = np.zeros((num_candidates, *log_shape), dtype=np.int64)
+    # 今回シミュレーションした分 (キャッシュに積み増す)
+    new_runs = np.zeros(num_candidates)
+    new_squares = np.zeros(num_candidates)
+    new_games = np.zeros(num_candidates, dtype=np.int64)
+    new_logs = np.zeros_like(logs)
+    simulated = 0
+
+    def simulate(ids, target_games):
+        """ids の打順の累計試合数が target_games になるまで試合を追加する"""
+        nonlocal simulated
+        needed_games = np.maximum(target_games - game_counts[ids], 0)
+        for num_games, positions in group_by_games(needed_games):
+            for start in range(0, len(positions), RACING_BATCH_SIZE):
+                batch = ids[positions[start:start + RACING_BATCH_SIZE]]
+                result = simulate_orders(selected_players_df, orders[batch], num_games, rng=rng)
+                runs = result['total_runs'].sum(axis=1)
+                squares = (result['total_runs'].astype(np.float64) ** 2).sum(axis=1)
+                for totals, square_sums, counts, log in ((run_totals, run_squares, game_counts, logs),
+                                                         (new_runs, new_squares, new_games, new_logs)):
+                    totals[batch] += runs
+                    square_sums[batch] += squares
+                    counts[batch] += num_games
+                    log[batch] += result['game_log']
+                simulated += len(batch) * num_games
+
+    survivors = np.arange(num_candidates)
+    worst = None
+    for round_index, (count, games) in enumerate(zip(counts, schedule)):
+        # 平均得点の上位 count 個だけを次の段階に進める
+        if round_index > 0:
+            scores = run_totals[survivors] / game_counts[survivors]
+            survivors = survivors[np.argsort(-scores, kind='stable')[:count]]
+        simulate(survivors, games)
+        if round_index == 0:
+            worst = survivors[np.argmin(run_totals[survivors] / game_counts[survivors])]
+        progress_bar.progress(
+            min(simulated / budget_games, 1.0),
+            text=f"第{round_index + 1}段階: {len(survivors)}打順 × {games}試合"
+        )
+
+    scores = run_totals[survivors] / game_counts[survivors]
+    best = survivors[np.argmax(scores)]
+    simulate(np.array([worst]), GAMES_PER_SEASON)
+    if keys is not None:
+        cache.add(keys, new_games, new_runs, new_squares, new_logs)
+
+    def order_info(i):
+        avg_runs = run_totals[i] / game_counts[i]
+        return {
+            "order_df": selected_players_df.iloc[orders[i]].reset_index(drop=True),
+            "avg_runs": avg_runs,
+            "total_runs": int(round(avg_runs * GAMES_PER_SEASON)),
+            "stats": logs[i] * GAMES_PER_SEASON // game_counts[i]
+        }
+
+    progress_bar.progress(1.0, text=f"完了: {num_candidates}打順から選択")
+    return {
+        "best_order": order_info(best),
+        "worst_order": order_info(worst),
+        "evaluated_orders": num_candidates,
+        "simulated_games": simulated,
+    }
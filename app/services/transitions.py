@@ -0,0 +1,188 @@
+from typing import NamedTuple
+
+import numpy as np
+
+# --- 状態の定義 ---
+# 各塁の走者は 0: なし, 1: 通常 (0 < Speed <= 5), 2: 俊足 (Speed > 5) の3区分
+# 走者の状態番号 = 1塁 + 3 * 2塁 + 9 * 3塁 (0-26)
+# 状態番号 = アウト数 * 27 + 走者の状態番号 (0-80)。3アウトは INNING_OVER
+NUM_BASE_STATES = 27
+NUM_STATES = 3 * NUM_BASE_STATES
+INNING_OVER = NUM_STATES
+NUM_RUNNER_CLASSES = 3
+
+# --- イベントの定義 ---
+# 0-7は打席結果 (RESULT_TYPES と同じ並び)、8-9は犠打の成否
+EVENT_NAMES = ['1B', '2B', '3B', 'HR', 'BB+HBP', 'SO', 'Ground_Out', 'Fly_Out', 'Sacrifice_Success', 'Bunt_Fail']
+EVENT_SINGLE, EVENT_DOUBLE, EVENT_TRIPLE, EVENT_HOME_RUN, EVENT_WALK = 0, 1, 2, 3, 4
+EVENT_STRIKEOUT, EVENT_GROUND_OUT, EVENT_FLY_OUT = 5, 6, 7
+EVENT_SACRIFICE_SUCCESS, EVENT_BUNT_FAIL = 8, 9
+NUM_EVENTS = len(EVENT_NAMES)
+# 1つのイベントから起こりうる結果の最大数 (2塁・1塁ランナーがいる単打)
+MAX_OUTCOMES = 4
+
+def encode_state(outs, runner_1b, runner_2b, runner_3b):
+    """アウト数と各塁の走者区分から状態番号を求める"""
+    return outs * NUM_BASE_STATES + runner_1b + 3 * runner_2b + 9 * runner_3b
+
+def decode_state(state):
+    """状態番号を (アウト数, 1塁, 2塁, 3塁) に戻す"""
+    outs, bases = divmod(state, NUM_BASE_STATES)
+    return outs, bases % 3, bases // 3 % 3, bases // 9
+
+def speed_class(speed):
+    """Speedスコアを走者区分に変換する (0以下は走者なし扱い)。配列も受け付ける"""
+    speed = np.asarray(speed)
+    classes = np.where(speed <= 0, 0, np.where(speed > 5, 2, 1))
+    return int(classes) if classes.ndim == 0 else classes
+
+def extra_base_probability(runner, outs):
+    """単打で2塁ランナーが生還する / 1塁ランナーが3塁へ進む・二塁打で1塁ランナーが生還する確率"""
+    prob = 0.3
+    if runner == 2:
+        prob += 0.3
+    if outs == 2:
+        prob += 0.2
+    return prob
+
+def event_outcomes(event, batter, outs, r1, r2, r3):
+    """
+    イベント後に起こりうる走者の進塁・アウト・得点を列挙する
+
+    Args:
+        event (int): イベントコード
+        batter (int): 打者の走者区分
+        outs (int): イベント前のアウトカウント
+        r1, r2, r3 (int): 1塁, 2塁, 3塁の走者区分
+
+    Returns:
+        list: (確率, イベント後のアウト数, (1塁, 2塁, 3塁), 得点) のリスト。
+              イベント後のアウト数が3ならイニング終了 (得点なし)
+    """
+    runners = int(r1 > 0) + int(r2 > 0) + int(r3 > 0)
+
+    # 犠打成功: 3塁ランナーは生還、他のランナーは1つ進塁
+    if event == EVENT_SACRIFICE_SUCCESS:
+        outcomes = [(1.0, outs + 1, (0, r1, r2), int(r3 > 0))]
+
+    # 三振・フライアウト・犠打失敗: 進塁なし
+    elif event in (EVENT_STRIKEOUT, EVENT_FLY_OUT, EVENT_BUNT_FAIL):
+        outcomes = [(1.0, outs + 1, (r1, r2, r3), 0)]
+
+    # ゴロアウト: 0アウトで1塁にランナーがいれば50%で併殺。3アウト目でなければ進塁
+    elif event == EVENT_GROUND_OUT:
+        if outs == 0 and r1 > 0:
+            outcomes = [(0.5, 2, (0, 0, r2), int(r3 > 0)), (0.5, 1, (0, r1, r2), int(r3 > 0))]
+        else:
+            outcomes = [(1.0, outs + 1, (0, r1, r2), int(r3 > 0))]
+
+    # 四死球: 押し出しのみ
+    elif event == EVENT_WALK:
+        if r1 > 0 and r2 > 0:
+            outcomes = [(1.0, outs, (batter, r1, r2), int(r3 > 0))]
+        elif r1 > 0:
+            outcomes = [(1.0, outs, (batter, r1, r3), 0)]
+        else:
+            outcomes = [(1.0, outs, (batter, r2, r3), 0)]
+
+    # 単打: 2塁ランナー、1塁ランナーの順に追加進塁を判定
+    # (1塁ランナーが3塁へ進むと、3塁に残った2塁ランナーは上書きされる)
+    elif event == EVENT_SINGLE:
+        second_options = [(1.0, False)]
+        if r2 > 0:
+            p = extra_base_probability(r2, outs)
+            second_options = [(p, True), (1.0 - p, False)]
+        first_options = [(1.0, False)]
+        if r1 > 0:
+            p = extra_base_probability(r1, outs)
+            first_options = [(p, True), (1.0 - p, False)]
+        outcomes = []
+        for p_second, second_scores in second_options:
+            for p_first, first_to_third in first_options:
+                third = r2 if (r2 > 0 and not second_scores) else 0
+                second = 0
+                if r1 > 0:
+                    if first_to_third:
+                        third = r1
+                    else:
+                        second = r1
+                outcomes.append((p_second * p_first, outs, (batter, second, third), int(r3 > 0) + int(second_scores)))
+
+    # 二塁打: 2塁・3塁ランナーは生還。1塁ランナーは走力に応じて生還
+    elif event == EVENT_DOUBLE:
+        runs = int(r2 > 0) + int(r3 > 0)
+        if r1 > 0:
+            p = extra_base_probability(r1, outs)
+            outcomes = [(p, outs, (0, batter, 0), runs + 1), (1.0 - p, outs, (0, batter, r1), runs)]
+        else:
+            outcomes = [(1.0, outs, (0, batter, 0), runs)]
+
+    # 三塁打・本塁打: 全ランナー生還
+    elif event == EVENT_TRIPLE:
+        outcomes = [(1.0, outs, (0, 0, batter), runners)]
+    elif event == EVENT_HOME_RUN:
+        outcomes = [(1.0, outs, (0, 0, 0), runners + 1)]
+    else:
+        raise ValueError(f"Unknown event: {event}")
+
+    # 3アウト目のプレーでは進塁・得点は記録しない
+    return [(p, 3, (0, 0, 0), 0) if new_outs >= 3 else (p, new_outs, bases, runs)
+            for p, new_outs, bases, runs in outcomes]
+
+class TransitionTable(NamedTuple):
+    """
+    [状態, イベント, 打者の走者区分, 結果番号] ごとの遷移表
+
+    結果が MAX_OUTCOMES 個に満たない組み合わせは確率0の結果で埋めてある。
+    """
+    probability: np.ndarray  # 各結果の確率 shape=(81, 10, 3, MAX_OUTCOMES)
+    cumulative: np.ndarray   # 結果の累積確率 (一様乱数1つで結果を選ぶ)
+    next_state: np.ndarray   # 結果後の状態番号 (3アウトなら INNING_OVER)
+    runs: np.ndarray         # 結果による得点
+
+def build_transition_table():
+    """全ての (状態, イベント, 打者の走者区分) について遷移表を作る"""
+    shape = (NUM_STATES, NUM_EVENTS, NUM_RUNNER_CLASSES, MAX_OUTCOMES)
+    probability = np.zeros(shape)
+    next_state = np.zeros(shape, dtype=np.int64)
+    runs = np.zeros(shape, dtype=np.int64)
+    for state in range(NUM_STATES):
+        outs, r1, r2, r3 = decode_state(state)
+        for event in range(NUM_EVENTS):
+            for batter in range(NUM_RUNNER_CLASSES):
+                outcomes = event_outcomes(event, batter, outs, r1, r2, r3)
+                for k, (p, new_outs, bases, scored) in enumerate(outcomes):
+                    probability[state, event, batter, k] = p
+                    next_state[state, event, batter, k] = INNING_OVER if new_outs >= 3 else encode_state(new_outs, *bases)
+                    runs[state, event, batter, k] = scored
+                # 使わない枠は最後の結果で埋め、乱数が累積確率の端に当たっても有効な結果になるようにする
+                next_state[state, event, batter, len(outcomes):] = next_state[state, event, batter, len(outcomes) - 1]
+                runs[state, event, batter, len(outcomes):] = runs[state, event, batter, len(outcomes) - 1]
+    cumulative = np.cumsum(probability, axis=-1)
+    cumulative[..., -1] = 1.0
+    return TransitionTable(probability, cumulative, next_state, runs)
+
+# ルールから作った遷移表 (シミュレーションとマルコフ連鎖で共有する)
+TRANSITION_TABLE = build_transition_table()
+
+def apply_event(state, event, batter, draw, table=TRANSITION_TABLE):
+    """
+    1つのイベントを遷移表で処理する
+
+    Args:
+        state (int): イベント前の状態番号
+        event (int): イベントコード
+        batter (int): 打者の走者区分
+        draw (float): 結果を選ぶ一様乱数
+
+    Returns:
+        tuple: (イベント後の状態番号, 得点)
+    """
+    k = min(int(table.cumulative[state, event, batter].searchsorted(draw, side='right')), MAX_OUTCOMES - 1)
+    return int(table.next_state[state, event, batter, k]), int(table.runs[state, event, batter, k])
+
+def apply_events(states, events, batters, draws, table=TRANSITION_TABLE):
+    """apply_event の配列版。各要素のイベントを一括で処理する"""
+    cumulative = table.cumulative[states, events, batters]
+    k = np.minimum((draws[:, None] >= cumulative).sum(axis=1), MAX_OUTCOMES - 1)
+    return table.next_state[states, events, batters, k], table.runs[states, events, batters, k]
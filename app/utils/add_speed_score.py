@@ -2,6 +2,8 @@
 import pandas as pd
 import os
 
+from app.utils import process_player_stats
+
 def add_speed_score(year: str, team: str, raw_dir="./data/raw"):
     """
     選手データに走力ポイントを追加する
@@ -67,8 +69,8 @@ def merge_and_save_processed_data(year: str, team: str, raw_dir="./data/raw", pr
     # 必要なカラムのみに絞る
     df_speed_simple = df_speed[['Player', 'Speed']]
 
-    # processedデータとマージ
-    df_merged = pd.merge(df_processed, df_speed_simple, on='Player', how='left')
+    # processedデータとマージ (既にSpeedがあれば置き換える)
+    df_merged = pd.merge(df_processed.drop(columns='Speed', errors='ignore'), df_speed_simple, on='Player', how='left')
 
     # SpeedスコアがNaNの場合は0で埋める
     df_merged['Speed'] = df_merged['Speed'].fillna(0)
@@ -79,8 +81,13 @@ def merge_and_save_processed_data(year: str, team: str, raw_dir="./data/raw", pr
 
 
 def main(teams, year, raw_dir="./data/raw", processed_dir="./data/processed"):
-    for team_id in teams:
-        merge_and_save_processed_data(year, team_id, raw_dir=raw_dir, processed_dir=processed_dir)
+    """
+    走力スコアを含む加工済みデータを更新する
+
+    走力スコアは process_player_stats の加工で打撃の確率と一緒に計算するため、
+    rawデータが変わったチーム・年度だけを加工し直す (加工済みのファイルを読み直して上書きしない)。
+    """
+    return process_player_stats.main(teams, year, raw_dir=raw_dir, processed_dir=processed_dir)
 
 if __name__ == "__main__":
     TEAMS = ["g", "t", "c", "db", "s", "d", "f", "e", "m", "l", "b", "h"]
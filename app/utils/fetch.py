@@ -0,0 +1,248 @@
+"""
+Webページの取得 (選手成績・デフォルトスタメンのスクレイピング用)
+
+- ホストごとに接続を使い回す (スレッドごとの keep-alive 接続)
+- 複数のURLをスレッドで並列に取得する (同時接続数に上限あり)
+- 接続エラーや 429/5xx は待ち時間を倍にしながら再試行する
+- 取得したページをディスクにキャッシュし、ETag / Last-Modified による条件付きリクエストで再検証する
+"""
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_CACHE_DIR = "./data/cache/http"
+USER_AGENT = "BattingOrderOptimizer/0.1"
+# 再試行するHTTPステータス
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_REDIRECTS = 5
+
+class FetchError(Exception):
+    """ページを取得できなかった (再試行しても失敗した) 場合のエラー"""
+
+class HttpCache:
+    """
+    取得したページのディスクキャッシュ
+
+    URLごとに本文 ({hash}.body) と、再検証に使うヘッダ ({hash}.json) を保存する。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + suffix)
+
+    def get(self, url):
+        """
+        Returns:
+            tuple | None: (メタ情報の辞書, 本文) 。キャッシュがなければ None
+        """
+        try:
+            with open(self._path(url, ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._path(url, ".body"), "rb") as f:
+                body = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return meta, body
+
+    def put(self, url, body, headers):
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える
+        for suffix, data in ((".body", body), (".json", json.dumps(meta).encode("utf-8"))):
+            path = self._path(url, suffix)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def touch(self, url, meta):
+        """304 で再検証できたときに取得時刻を更新する"""
+        meta = dict(meta, fetched_at=time.time())
+        with open(self._path(url, ".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+class Fetcher:
+    """
+    接続の使い回し・並列取得・再試行・ディスクキャッシュを備えたページ取得
+
+    Args:
+        cache_dir (str | None): キャッシュのディレクトリ。None ならキャッシュしない
+        max_workers (int): fetch_many の同時接続数の上限
+        retries (int): 失敗したときの再試行回数
+        backoff (float): 最初の再試行までの待ち時間 (秒)。再試行ごとに倍にする
+        timeout (float): 1回のリクエストのタイムアウト (秒)
+        max_age (float | None): キャッシュを再検証せずに使う期間 (秒)。None なら毎回再検証する
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_workers=4, retries=3, backoff=0.5, timeout=30.0,
+                 max_age=None):
+        self.cache = HttpCache(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_age = max_age
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # fetch_many のスレッド (接続を使い回せるよう Fetcher を閉じるまで残す)
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """スレッドを止め、開いている接続を全て閉じる"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            connections, self._connections = self._connections, []
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for conn in connections:
+            conn.close()
+
+    def _connection(self, scheme, netloc):
+        """このスレッドでホストごとに使い回す接続"""
+        pool = getattr(self._local, "pool", None)
+        if pool is None:
+            pool = self._local.pool = {}
+        conn = pool.get((scheme, netloc))
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = conn_class(netloc, timeout=self.timeout)
+            pool[(scheme, netloc)] = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self, scheme, netloc):
+        conn = self._local.pool.pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+    def _request(self, url, headers):
+        """
+        GET リクエストを1回送る (リダイレクトは辿る)
+
+        Returns:
+            tuple: (ステータス, レスポンスヘッダ, 本文)
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                # 切れた keep-alive 接続は捨てて、次の試行で張り直す
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise
+            if response.will_close:
+                self._drop_connection(parts.scheme, parts.netloc)
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            return response.status, response.headers, body
+        raise FetchError(f"Too many redirects: {url}")
+
+    def fetch(self, url):
+        """
+        ページを取得する
+
+        キャッシュがあれば条件付きリクエストを送り、304 ならキャッシュの本文を返す。
+        再試行しても取得できず、キャッシュがある場合は古いキャッシュを返す。
+
+        Returns:
+            bytes: ページの本文
+
+        Raises:
+            FetchError: 取得できず、キャッシュもない場合
+        """
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None and self.max_age is not None and time.time() - cached[0]["fetched_at"] < self.max_age:
+            return cached[1]
+
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"}
+        if cached is not None:
+            meta = cached[0]
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                status, response_headers, body = self._request(url, headers)
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+                continue
+            if status == 304 and cached is not None:
+                self.cache.touch(url, cached[0])
+                return cached[1]
+            if status == 200:
+                if self.cache is not None:
+                    self.cache.put(url, body, response_headers)
+                return body
+            error = FetchError(f"HTTP {status}: {url}")
+            if status not in RETRY_STATUSES:
+                break
+
+        if cached is not None:
+            print(f"Warning: using cached copy of {url} ({error})")
+            return cached[1]
+        if isinstance(error, FetchError):
+            raise error
+        raise FetchError(f"{url}: {error}") from error
+
+    def fetch_many(self, urls, return_exceptions=False):
+        """
+        複数のページを並列に取得する (同時接続数は max_workers まで)
+
+        Args:
+            urls (list): URLのリスト
+            return_exceptions (bool): True なら取得できなかったURLの位置に FetchError を入れて返す
+
+        Returns:
+            list: urls と同じ順の本文 (bytes)
+        """
+        def fetch_one(url):
+            try:
+                return self.fetch(url)
+            except FetchError as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            executor = self._executor
+        return list(executor.map(fetch_one, urls))
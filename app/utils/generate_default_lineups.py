@@ -5,7 +5,8 @@ import sys
 # プロジェクトのルートディレクトリをPythonのパスに追加
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from app.utils.get_default_lineup import get_default_lineup
+from app.utils.fetch import Fetcher
+from app.utils.get_default_lineup import default_lineup_url, get_default_lineup
 
 # main.py と同様のチーム略称とリーグ情報
 TEAM_ABBREVIATIONS = {
@@ -26,31 +27,57 @@ TEAM_ABBREVIATIONS = {
 # get_default_lineup が期待するリーグ名
 LEAGUE_MAP = {"Central": "Central", "Pacific": "Pacific"}
 
-def generate_and_save_default_lineups(year: str, output_dir: str = "./data/processed"):
+def generate_and_save_default_lineups(year: str, output_dir: str = "./data/processed", fetcher=None):
     """
     全球団のデフォルトスタメンを抽出し、CSVファイルとして保存する。
 
     Args:
         year (str): データを取得する年度。
         output_dir (str): CSVファイルを保存するディレクトリ。
+        fetcher (Fetcher, optional): ページの取得に使う Fetcher (省略時はキャッシュ付きの既定の設定)
     """
-    all_lineups_data = []
+    generate_default_lineups([year], output_dir, fetcher)
 
-    print(f"Generating default lineups for {year}...")
+def generate_default_lineups(years, output_dir: str = "./data/processed", fetcher=None):
+    """
+    複数年度の全球団のデフォルトスタメンを抽出し、年度ごとのCSVファイルとして保存する。
+
+    全ての年度・球団の起用情報のページを先に並列で取得してから抽出する。
+
+    Args:
+        years (list): データを取得する年度のリスト。
+        output_dir (str): CSVファイルを保存するディレクトリ。
+        fetcher (Fetcher, optional): ページの取得に使う Fetcher (省略時はキャッシュ付きの既定の設定)
+    """
+    combinations = [(str(year), team_name, info) for year in years for team_name, info in TEAM_ABBREVIATIONS.items()]
+    print(f"Generating default lineups for {', '.join(str(year) for year in years)}...")
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or Fetcher()
+    try:
+        urls = [default_lineup_url(year, LEAGUE_MAP[info["league"]], info["abbr"]) for year, _, info in combinations]
+        pages = fetcher.fetch_many(urls, return_exceptions=True)
+    finally:
+        if own_fetcher:
+            fetcher.close()
 
-    for team_name, info in TEAM_ABBREVIATIONS.items():
+    lineups_by_year = {str(year): [] for year in years}
+    for (year, team_name, info), html in zip(combinations, pages):
         team_abbr = info["abbr"]
         league_type = info["league"]
-        
-        print(f"  Processing {team_name} ({league_type})...")
+
+        print(f"  Processing {year} {team_name} ({league_type})...")
+        if isinstance(html, Exception):
+            print(f"    Warning: Could not fetch lineup page for {team_name} ({league_type}): {html}")
+            continue
 
         # get_default_lineupのleague引数は "Pacific" or "Central" を期待
-        lineup = get_default_lineup(year=year, league=LEAGUE_MAP[league_type], team_abbr=team_abbr)
+        lineup = get_default_lineup(year=year, league=LEAGUE_MAP[league_type], team_abbr=team_abbr, html=html)
 
         if lineup:
             print(f"    Successfully retrieved lineup for {team_name}.")
             for position, player in lineup.items():
-                all_lineups_data.append({
+                lineups_by_year[year].append({
                     "Year": year,
                     "League": league_type,
                     "Team": team_name,
@@ -61,21 +88,21 @@ def generate_and_save_default_lineups(year: str, output_dir: str = "./data/proce
         else:
             print(f"    Warning: Could not retrieve lineup for {team_name} ({league_type}).")
 
-    if all_lineups_data:
-        df_all_lineups = pd.DataFrame(all_lineups_data)
-        
-        # カラムの順序を定義
-        column_order = ["Year", "League", "Team", "Team_Abbr", "Position", "Player"]
-        df_all_lineups = df_all_lineups[column_order]
+    for year, all_lineups_data in lineups_by_year.items():
+        if all_lineups_data:
+            df_all_lineups = pd.DataFrame(all_lineups_data)
 
-        output_file = os.path.join(output_dir, f"default_lineups_{year}.csv")
-        os.makedirs(output_dir, exist_ok=True)
-        df_all_lineups.to_csv(output_file, index=False)
-        print(f"Successfully saved default lineups to {output_file}")
-    else:
-        print("No lineup data generated.")
+            # カラムの順序を定義
+            column_order = ["Year", "League", "Team", "Team_Abbr", "Position", "Player"]
+            df_all_lineups = df_all_lineups[column_order]
+
+            output_file = os.path.join(output_dir, f"default_lineups_{year}.csv")
+            os.makedirs(output_dir, exist_ok=True)
+            df_all_lineups.to_csv(output_file, index=False)
+            print(f"Successfully saved default lineups to {output_file}")
+        else:
+            print(f"No lineup data generated for {year}.")
 
 if __name__ == "__main__":
-    # 2022年から2025年までのデータを生成
-    for year in range(2022, 2026):
-        generate_and_save_default_lineups(year=str(year))
+    # 2022年から2025年までのデータを生成 (全年度のページをまとめて並列に取得する)
+    generate_default_lineups([str(year) for year in range(2022, 2026)])
@@ -1,7 +1,14 @@
+import io
+
 import pandas as pd
 import numpy as np
 
-def get_default_lineup(year: str, league: str, team_abbr: str):
+from app.utils.fetch import Fetcher
+
+def default_lineup_url(year: str, league: str, team_abbr: str):
+    return f'https://nf3.sakura.ne.jp/{year}/{league}/{team_abbr}/t/kiyou.htm'
+
+def get_default_lineup(year: str, league: str, team_abbr: str, fetcher=None, html=None):
     """
     指定された年度、リーグ、チームのデフォルトスタメン（各ポジション最多先発出場選手）を抽出する。
 
@@ -9,15 +16,23 @@ def get_default_lineup(year: str, league: str, team_abbr: str):
         year (str): 年度 (例: "2024")
         league (str): リーグ ("Pacific" または "Central")
         team_abbr (str): チーム略称 (例: "M" for Marines)
+        fetcher (Fetcher, optional): ページの取得に使う Fetcher (省略時はキャッシュ付きの既定の設定)
+        html (bytes, optional): 取得済みの起用情報のページ (渡せば取得しない)
 
     Returns:
         dict: ポジション名をキー、選手名を値とする辞書。投手は含まない。
               例: {'捕': '選手A', '一': '選手B', ...}
     """
-    url = f'https://nf3.sakura.ne.jp/{year}/{league}/{team_abbr}/t/kiyou.htm'
+    url = default_lineup_url(year, league, team_abbr)
     try:
+        if html is None:
+            if fetcher is None:
+                with Fetcher() as fetcher:
+                    html = fetcher.fetch(url)
+            else:
+                html = fetcher.fetch(url)
         # header=[0, 1] で2行をヘッダーとして読み込む
-        tables = pd.read_html(url, header=[0, 1])
+        tables = pd.read_html(io.BytesIO(html), header=[0, 1])
         df = tables[1] # 2番目のテーブルが起用情報
     except Exception as e:
         print(f"Error reading HTML from {url}: {e}")
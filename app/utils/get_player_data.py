@@ -1,3 +1,4 @@
+import io
 import os
 #import requests
 #import urllib  #HTMLにアクセス＆取得
@@ -5,13 +6,34 @@ import os
 import pandas as pd
 import numpy as np
 
-def get_data(team:str, year:str):
+from app.utils.fetch import Fetcher
 
-    # URLを指定
-    url = f'https://npb.jp/bis/{year}/stats/idb1_{team}.html'
+def player_data_url(team: str, year: str):
+    return f'https://npb.jp/bis/{year}/stats/idb1_{team}.html'
+
+def get_data(team:str, year:str, fetcher=None, html=None, raw_dir="./data/raw"):
+    """
+    選手成績のページを取得し、rawデータとして data/raw/{year}_{team}.csv に保存する
+
+    Args:
+        team (str): チーム略称
+        year (str): 年度
+        fetcher (Fetcher, optional): ページの取得に使う Fetcher (省略時はキャッシュ付きの既定の設定)
+        html (bytes, optional): 取得済みのページ (fetch_player_data でまとめて取得した場合)
+        raw_dir (str): rawデータの保存先
+
+    Returns:
+        pd.DataFrame: rawデータ
+    """
+    if html is None:
+        if fetcher is None:
+            with Fetcher() as fetcher:
+                html = fetcher.fetch(player_data_url(team, year))
+        else:
+            html = fetcher.fetch(player_data_url(team, year))
 
     # HTMLからテーブルを読み込む
-    tables = pd.read_html(url)
+    tables = pd.read_html(io.BytesIO(html))
 
     # 最初のテーブルを取得
     df = tables[0]
@@ -41,7 +63,34 @@ def get_data(team:str, year:str):
 
     df['選手'] = df['選手'].str.replace(r'\s+', '', regex=True)
 
-    csv_path = f"./data/raw/{year}_{team}.csv"
+    os.makedirs(raw_dir, exist_ok=True)
+    csv_path = os.path.join(raw_dir, f"{year}_{team}.csv")
     df.to_csv(csv_path,index=False)
 
     return df
+
+def fetch_player_data(teams, years, raw_dir="./data/raw", fetcher=None):
+    """
+    複数のチーム・年度の選手成績のページを並列に取得し、rawデータとして保存する
+
+    Returns:
+        list: 保存できた (年度, チーム略称) のリスト
+    """
+    combinations = [(str(year), team) for year in years for team in teams]
+    own_fetcher = fetcher is None
+    fetcher = fetcher or Fetcher()
+    try:
+        pages = fetcher.fetch_many([player_data_url(team, year) for year, team in combinations],
+                                   return_exceptions=True)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    saved = []
+    for (year, team), html in zip(combinations, pages):
+        if isinstance(html, Exception):
+            print(f"Error fetching {year} {team}: {html}")
+            continue
+        get_data(team, year, html=html, raw_dir=raw_dir)
+        saved.append((year, team))
+    return saved
@@ -1,8 +1,19 @@
+import hashlib
+import io
+import json
 import os
 
 import pandas as pd
 import numpy as np
 
+from app.services.parallel import default_workers, map_chunks
+from app.utils.stats_store import build_stats_store
+
+# 加工処理の版 (確率や走力スコアの計算を変えたら上げる。上げると全チームを加工し直す)
+PROCESSING_VERSION = 1
+# rawデータのハッシュと加工処理の版を記録するファイル (data/processed に置く)
+MANIFEST_FILENAME = "manifest.json"
+
 
 def process_batting_stats(df):
     """
@@ -74,7 +85,7 @@ def process_batting_stats(df):
 
     return df_res
 
-def add_speed_score(year: str, team: str, raw_dir="./data/raw"):
+def add_speed_score(year: str, team: str, raw_dir="./data/raw", raw_df=None):
     """
     選手データに走力ポイントを追加する
 
@@ -82,17 +93,21 @@ def add_speed_score(year: str, team: str, raw_dir="./data/raw"):
         year (str): 年度
         team (str): チーム名
         raw_dir (str): rawデータが格納されているディレクトリ
+        raw_df (pd.DataFrame): 読み込み済みのrawデータ (渡せばCSVを読み直さない)
 
     Returns:
         pd.DataFrame: 走力ポイントを追加した選手データ
     """
-    # data/rawから元データを読み込む
-    raw_path = os.path.join(raw_dir, f"{year}_{team}.csv")
-    try:
-        df = pd.read_csv(raw_path)
-    except FileNotFoundError:
-        print(f"Error: {raw_path} not found.")
-        return None
+    if raw_df is not None:
+        df = raw_df.copy()
+    else:
+        # data/rawから元データを読み込む
+        raw_path = os.path.join(raw_dir, f"{year}_{team}.csv")
+        try:
+            df = pd.read_csv(raw_path)
+        except FileNotFoundError:
+            print(f"Error: {raw_path} not found.")
+            return None
 
     # process_dataと同様にカラム名を英語に変換
     eng_columns = [
@@ -124,8 +139,8 @@ def process_data(df, team, year, output_dir="./data/processed"):
     # process_batting_stats関数を呼び出してデータを加工
     df_processed = process_batting_stats(df.copy())
 
-    # 走力スコアデータを取得 (rawデータの場所を指定)
-    df_speed = add_speed_score(year, team)
+    # 走力スコアデータを取得 (読み込み済みのrawデータを使う)
+    df_speed = add_speed_score(year, team, raw_df=df)
     if df_speed is None:
         return
     # 必要なカラムのみに絞る
@@ -146,28 +161,100 @@ def process_data(df, team, year, output_dir="./data/processed"):
 
 
 
-def main(teams, year, raw_dir="./data/raw", processed_dir="./data/processed"):
-    """指定されたチームと年度のデータを取得・加工するメイン関数"""
-    for team in teams:
-        print(f"Processing: {year} {team}")
-        # get_dataはWebから取ってくるので、テストでは使いにくい。ここではrawデータは既にある前提とする。
-        # raw_df = get_data(team, year)
-        raw_path = os.path.join(raw_dir, f"{year}_{team}.csv")
-        try:
-            raw_df = pd.read_csv(raw_path)
-        except FileNotFoundError:
-            print(f"Raw data not found at {raw_path}, skipping.")
+def file_hash(path):
+    """ファイルの内容の SHA-256"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_manifest(processed_dir="./data/processed"):
+    """
+    加工済みデータのマニフェスト (data/processed/manifest.json) を読み込む
+
+    Returns:
+        dict: "{year}_{team}" -> {"raw_sha256": rawデータの内容のハッシュ, "version": 加工処理の版}
+    """
+    path = os.path.join(processed_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, processed_dir="./data/processed"):
+    os.makedirs(processed_dir, exist_ok=True)
+    with open(os.path.join(processed_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def manifest_entry(raw_sha256):
+    return {"raw_sha256": raw_sha256, "version": PROCESSING_VERSION}
+
+def process_team(year, team, raw_dir="./data/raw", processed_dir="./data/processed"):
+    """
+    1チーム・1年度のrawデータを1回だけ読み込み、打撃の確率と走力スコアを計算して保存する
+    (プロセスプールのワーカーから呼び出す)
+
+    Returns:
+        str | None: 読み込んだrawデータの内容のハッシュ。データが空なら None
+    """
+    with open(os.path.join(raw_dir, f"{year}_{team}.csv"), "rb") as f:
+        content = f.read()
+    raw_df = pd.read_csv(io.BytesIO(content))
+    if raw_df.empty:
+        return None
+    process_data(raw_df, team, year, processed_dir)
+    return hashlib.sha256(content).hexdigest()
+
+def main(teams, year, raw_dir="./data/raw", processed_dir="./data/processed", force=False, n_workers=None):
+    """
+    指定されたチームと年度のデータを加工するメイン関数
+
+    rawデータの内容のハッシュと加工処理の版をマニフェストに記録し、
+    前回から変わったチーム・年度だけを加工し直す。加工するチーム・年度は並列に処理する。
+
+    Args:
+        teams (list): チーム略称のリスト
+        year (str | list): 年度 (複数の年度をまとめて指定できる)
+        raw_dir (str): rawデータのディレクトリ
+        processed_dir (str): 加工済みデータの保存先
+        force (bool): True なら変更の有無に関係なく全て加工し直す
+        n_workers (int, optional): 並列に使うプロセス数 (省略時はCPUコア数)
+
+    Returns:
+        list: 加工し直した (年度, チーム略称) のリスト
+    """
+    years = list(year) if isinstance(year, (list, tuple)) else [year]
+    manifest = load_manifest(processed_dir)
+    tasks = []
+    for y in years:
+        for team in teams:
+            # get_dataはWebから取ってくるので、ここではrawデータは既にある前提とする。
+            raw_path = os.path.join(raw_dir, f"{y}_{team}.csv")
+            if not os.path.exists(raw_path):
+                print(f"Raw data not found at {raw_path}, skipping.")
+                continue
+            processed_path = os.path.join(processed_dir, f"{y}_{team}.csv")
+            if (not force and os.path.exists(processed_path)
+                    and manifest.get(f"{y}_{team}") == manifest_entry(file_hash(raw_path))):
+                print(f"Up to date: {y} {team}")
+                continue
+            tasks.append((y, team, raw_dir, processed_dir))
+
+    updated = []
+    for task_id, raw_sha256 in map_chunks(process_team, tasks, n_workers=n_workers or default_workers()):
+        y, team = tasks[task_id][:2]
+        if raw_sha256 is None:
+            print(f"No data found for {team} in {y}.")
             continue
+        manifest[f"{y}_{team}"] = manifest_entry(raw_sha256)
+        updated.append((y, team))
+        print(f"Saved processed data to {processed_dir}/{y}_{team}.csv")
 
-        if not raw_df.empty:
-            # process_data内で保存先を指定できるようにする
-            df = process_data(raw_df, team, year, processed_dir)
-            print(f"Saved processed data to {processed_dir}/{year}_{team}.csv")
-            #print(df)
-        else:
-            print(f"No data found for {team} in {year}.")
+    if updated:
+        save_manifest(manifest, processed_dir)
+        # 全チーム・全年度の加工済みデータを1つのファイルにまとめ直す
+        build_stats_store(processed_dir)
+        print(f"Saved stats store to {processed_dir}")
+    return updated
 
 if __name__ == "__main__":
     team_list = ["g","t","c","db","s","d","f","e","m","l","b","h"]
     main(team_list, "2024")
-    
\ No newline at end of file
@@ -0,0 +1,113 @@
+import glob
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+# 全チーム・全年度の加工済みデータをまとめたファイル (data/processed に置く)
+STORE_FILENAME = "player_stats.npz"
+# 保存する確率の列 (process_batting_stats の出力と同じ並び)
+RATIO_COLUMNS = [
+    "1B_ratio", "2B_ratio", "3B_ratio", "HR_ratio", "BB+HBP_ratio", "SO_ratio", "Ground_Out_ratio", "Fly_Out_ratio",
+    "Out_ratio",
+]
+# 加工済みCSVのファイル名 ({year}_{team}.csv)
+_PROCESSED_CSV = re.compile(r"^(\d{4})_([a-z]+)\.csv$")
+
+_loaded = {}
+_lock = threading.Lock()
+
+def store_path(processed_dir="./data/processed"):
+    return os.path.join(processed_dir, STORE_FILENAME)
+
+def team_key(year, team):
+    return f"{year}_{team}"
+
+def build_stats_store(processed_dir="./data/processed", output_path=None):
+    """
+    data/processed の {year}_{team}.csv を全て読み込み、1つの列指向ファイルにまとめる
+
+    ファイルの中身 (npz):
+        keys: チーム・年度のキー ("2024_h" など) shape=(チーム数,)
+        offsets: 各チーム・年度の行の範囲 shape=(チーム数+1,)。keys[i] の選手は offsets[i]:offsets[i+1] 行目
+        players: 選手名 shape=(選手数,)
+        ratios: RATIO_COLUMNS の値 shape=(選手数, len(RATIO_COLUMNS))
+        speed: Speedスコア shape=(選手数,)
+        source_mtimes: 元のCSVの更新時刻 (ナノ秒)。CSVの方が新しければ読み込み時にCSVを使う
+
+    Returns:
+        str: 書き出したファイルのパス
+    """
+    output_path = output_path or store_path(processed_dir)
+    keys, frames, mtimes = [], [], []
+    for path in sorted(glob.glob(os.path.join(processed_dir, "*.csv"))):
+        match = _PROCESSED_CSV.match(os.path.basename(path))
+        if match is None:
+            continue
+        keys.append(team_key(*match.groups()))
+        frames.append(pd.read_csv(path))
+        mtimes.append(os.stat(path).st_mtime_ns)
+
+    offsets = np.cumsum([0] + [len(df) for df in frames])
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["Player", *RATIO_COLUMNS, "Speed"])
+    np.savez(
+        output_path,
+        keys=np.array(keys, dtype=str),
+        offsets=offsets.astype(np.int64),
+        players=combined["Player"].to_numpy(dtype=str),
+        ratios=np.ascontiguousarray(combined[RATIO_COLUMNS].to_numpy(dtype="float64")),
+        speed=combined["Speed"].to_numpy(),
+        source_mtimes=np.array(mtimes, dtype=np.int64),
+    )
+    # 同じプロセスで読み込み済みの古い内容を捨てる
+    with _lock:
+        _loaded.pop(os.path.abspath(output_path), None)
+    return output_path
+
+def _load_store(path):
+    """まとめたファイルを読み込む (プロセスごとに1回だけ読み、以降はメモリ上の配列を使う)"""
+    path = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            arrays["index"] = {key: i for i, key in enumerate(arrays["keys"].tolist())}
+            cached = (mtime, arrays)
+            _loaded[path] = cached
+    return cached[1]
+
+def load_team_stats(year, team, processed_dir="./data/processed"):
+    """
+    まとめたファイルから1チーム・1年度の加工済みデータを取り出す
+
+    配列は読み込み済みのものをスライスするだけで、CSVの解析はしない。
+    ファイルがない、チーム・年度が含まれていない、または元のCSVの方が新しい場合は None を返す。
+
+    Returns:
+        pd.DataFrame | None: 加工済みCSVと同じ列の選手データ
+    """
+    store = _load_store(store_path(processed_dir))
+    if store is None:
+        return None
+    i = store["index"].get(team_key(year, team))
+    if i is None:
+        return None
+    csv_path = os.path.join(processed_dir, f"{year}_{team}.csv")
+    if os.path.exists(csv_path) and os.stat(csv_path).st_mtime_ns > store["source_mtimes"][i]:
+        return None
+
+    rows = slice(store["offsets"][i], store["offsets"][i + 1])
+    df = pd.DataFrame(store["ratios"][rows], columns=RATIO_COLUMNS, copy=False)
+    df.insert(0, "Player", store["players"][rows])
+    df["Speed"] = store["speed"][rows]
+    return df
+
+if __name__ == "__main__":
+    print(f"Saved stats store to {build_stats_store()}")
@@ -0,0 +1,91 @@
+import os
+import random
+
+import pandas as pd
+
+from app.utils.stats_store import load_team_stats
+
+# チーム名 -> ファイル名に使うチーム略称
+TEAM_ABBREVIATIONS = {
+    "ヤクルト": "s", "DeNA": "db", "阪神": "t", "巨人": "g", "広島": "c", "中日": "d",
+    "オリックス": "b", "ソフトバンク": "h", "西武": "l", "楽天": "e", "ロッテ": "m", "日本ハム": "f",
+}
+# リーグ -> 所属チーム名
+LEAGUES = {
+    "セントラル・リーグ": ["ヤクルト", "DeNA", "阪神", "巨人", "広島", "中日"],
+    "パシフィック・リーグ": ["オリックス", "ソフトバンク", "西武", "楽天", "ロッテ", "日本ハム"],
+}
+# デフォルトスタメンを並べる守備位置の順
+POSITION_ORDER = ['捕', '一', '二', '三', '遊', '左', '中', '右', '指']
+
+def load_team_players(year, team_abbr, processed_dir="./data/processed"):
+    """
+    処理済みの選手データ (data/processed/{year}_{team}.csv) を読み込む
+
+    全チーム・全年度をまとめたファイル (stats_store) があればそこから取り出し、なければCSVを読む。
+
+    Args:
+        year (int | str): 年度
+        team_abbr (str): チーム略称 (例: "h")
+        processed_dir (str): 処理済みデータのディレクトリ
+
+    Returns:
+        pd.DataFrame: 選手データ
+
+    Raises:
+        FileNotFoundError: データがない場合
+    """
+    df = load_team_stats(year, team_abbr, processed_dir)
+    if df is not None:
+        return df
+    return pd.read_csv(os.path.join(processed_dir, f"{year}_{team_abbr}.csv"))
+
+def load_default_lineups(year, processed_dir="./data/processed"):
+    """デフォルトスタメン (data/processed/default_lineups_{year}.csv) を読み込む (なければ空の DataFrame)"""
+    file_path = os.path.join(processed_dir, f"default_lineups_{year}.csv")
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+    return pd.read_csv(file_path)
+
+def initial_lineup(players_df, default_lineups_df, year, team_abbr, rng=random):
+    """
+    初期の打順 (9人の選手名) を決める
+
+    デフォルトスタメンを守備位置順に並べ、足りない分は残りの選手からランダムに補う。
+
+    Args:
+        players_df (pd.DataFrame): チームの選手データ
+        default_lineups_df (pd.DataFrame): デフォルトスタメン
+        year (int | str): 年度
+        team_abbr (str): チーム略称
+        rng: 補う選手を選ぶ乱数 (shuffle を持つもの。random.Random(seed) を渡すと再現できる)
+
+    Returns:
+        list: 9人の選手名
+    """
+    player_names = players_df['Player'].tolist()
+    team_default_df = pd.DataFrame()
+    if not default_lineups_df.empty:
+        team_default_df = default_lineups_df[
+            (default_lineups_df['Year'] == int(year)) &
+            (default_lineups_df['Team_Abbr'] == team_abbr.upper())
+        ].copy()
+
+    if not team_default_df.empty:
+        team_default_df['Position_Order'] = pd.Categorical(
+            team_default_df['Position'], categories=POSITION_ORDER, ordered=True
+        )
+        initial_players = team_default_df.sort_values('Position_Order')['Player'].tolist()
+    else:
+        initial_players = player_names[:9]
+
+    if len(initial_players) < 9:
+        remaining_players = [p for p in player_names if p not in initial_players]
+        rng.shuffle(remaining_players)
+        initial_players.extend(remaining_players[:9 - len(initial_players)])
+
+    return initial_players[:9]
+
+def lineup_frame(players_df, player_names):
+    """選手名の並びの順に選手データを取り出す (打順データ)"""
+    return players_df.set_index('Player').loc[player_names].reset_index()
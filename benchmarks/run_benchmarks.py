@@ -0,0 +1,249 @@
+"""
+シミュレーションエンジンと最良打順推定のベンチマーク
+
+data/processed/2024_*.csv の各チームの打順で、1秒あたりの打席数・試合数・評価した打順数を測る。
+結果は JSON で出力し、保存済みのベースラインより threshold 以上遅くなった指標があれば終了コード1で終わる。
+ベースラインと実行環境 (Python・numpy・pandas のバージョン、CPU、測定したチーム) が違う場合は
+速さを比べられないため、比較せずに終了コード2で終わる。
+エンジンを変えたときや環境を変えたときは、その環境で --update-baseline を実行してベースラインを作り直す。
+
+使い方:
+    python -m benchmarks.run_benchmarks                       # 測定してベースラインと比較
+    python -m benchmarks.run_benchmarks --output result.json  # 結果を保存
+    python -m benchmarks.run_benchmarks --update-baseline     # 測定結果をベースラインにする
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from app.services.lineup import compile_lineup
+from app.services.simulation import (
+    LOG_COLUMNS, estimate_best_batting_order, new_game_log, simulate_at_bat, simulate_game, simulate_games,
+    simulate_inning,
+)
+
+DATA_PATTERN = os.path.join(ROOT_DIR, "data", "processed", "2024_*.csv")
+DEFAULT_LINEUPS_PATH = os.path.join(ROOT_DIR, "data", "processed", "default_lineups_2024.csv")
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_TRIALS = [10, 100, 1000]
+# 遅くなったとみなす割合 (0.2 ならベースラインの80%未満で失敗)
+DEFAULT_THRESHOLD = 0.2
+# ベースラインと一致しなければ比較しない実行環境の項目
+ENVIRONMENT_KEYS = ["python", "numpy", "pandas", "machine", "cpu_count", "teams"]
+
+# チームごとの測定回数
+AT_BATS_PER_TEAM = 20000
+INNINGS_PER_TEAM = 500
+GAMES_PER_TEAM = 50
+BATCH_GAMES_PER_TEAM = 1430
+
+# 打席数に数える成績の列 (犠打の試行と打点以外)
+PLATE_APPEARANCE_COLUMNS = [k for key, k in LOG_COLUMNS.items() if key not in ('Sacrifice_Attempts', 'RBI')]
+
+class _NullProgressBar:
+    def progress(self, value, text=None):
+        pass
+
+def plate_appearances(game_log):
+    """成績配列から打席数を数える"""
+    return int(np.asarray(game_log)[..., PLATE_APPEARANCE_COLUMNS].sum())
+
+def load_lineups(pattern=DATA_PATTERN, default_lineups_path=DEFAULT_LINEUPS_PATH):
+    """
+    各チームの9人の打順を読み込む
+
+    開幕スタメン (default_lineups_2024.csv) の選手を優先し、足りなければCSVの上から順に補う。
+
+    Returns:
+        dict: チーム略称 -> 9人の選手データ
+    """
+    default_lineups = pd.read_csv(default_lineups_path) if os.path.exists(default_lineups_path) else pd.DataFrame()
+    lineups = {}
+    for path in sorted(glob.glob(pattern)):
+        team = os.path.basename(path)[len("2024_"):-len(".csv")]
+        players = pd.read_csv(path)
+        names = []
+        if not default_lineups.empty:
+            names = default_lineups.loc[default_lineups['Team_Abbr'] == team.upper(), 'Player'].tolist()
+        starters = players[players['Player'].isin(names)]
+        rest = players[~players['Player'].isin(names)]
+        lineups[team] = pd.concat([starters, rest]).head(9).reset_index(drop=True)
+    return lineups
+
+def _best_time(fn, repeat):
+    """fn を repeat 回実行し、最短の実行時間と最後の戻り値を返す"""
+    best, value = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+def bench_at_bat(lineups, repeat):
+    def run():
+        for lineup in compiled:
+            for i in range(AT_BATS_PER_TEAM):
+                simulate_at_bat(lineup.batters[i % 9])
+        return AT_BATS_PER_TEAM * len(compiled)
+    compiled = [compile_lineup(df) for df in lineups.values()]
+    seconds, at_bats = _best_time(run, repeat)
+    return {"seconds": seconds, "pa_per_sec": at_bats / seconds}
+
+def bench_inning(lineups, repeat):
+    def run():
+        batters = 0
+        for lineup in compiled:
+            batter = 0
+            game_log = new_game_log()
+            for _ in range(INNINGS_PER_TEAM):
+                _, batter, _ = simulate_inning(lineup, batter, game_log, enable_log=False)
+            batters += batter
+        return batters
+    compiled = [compile_lineup(df) for df in lineups.values()]
+    seconds, at_bats = _best_time(run, repeat)
+    return {"seconds": seconds, "pa_per_sec": at_bats / seconds,
+            "innings_per_sec": INNINGS_PER_TEAM * len(compiled) / seconds}
+
+def bench_game(lineups, repeat):
+    def run():
+        season_log = new_game_log()
+        for lineup in compiled:
+            for _ in range(GAMES_PER_TEAM):
+                simulate_game(lineup, enable_inning_log=False, season_log=season_log)
+        return plate_appearances(season_log)
+    compiled = [compile_lineup(df) for df in lineups.values()]
+    seconds, at_bats = _best_time(run, repeat)
+    return {"seconds": seconds, "pa_per_sec": at_bats / seconds,
+            "games_per_sec": GAMES_PER_TEAM * len(compiled) / seconds}
+
+def bench_batch_games(lineups, repeat):
+    def run():
+        return sum(plate_appearances(simulate_games(df, BATCH_GAMES_PER_TEAM, rng=rng)['game_log'])
+                   for df in lineups.values())
+    rng = np.random.default_rng(0)
+    seconds, at_bats = _best_time(run, repeat)
+    return {"seconds": seconds, "pa_per_sec": at_bats / seconds,
+            "games_per_sec": BATCH_GAMES_PER_TEAM * len(lineups) / seconds}
+
+def bench_estimate(lineups, num_trials, repeat):
+    def run():
+        for df in lineups.values():
+            estimate_best_batting_order(df, num_trials, _NullProgressBar(), seed=0)
+    seconds, _ = _best_time(run, repeat)
+    orders = num_trials * len(lineups)
+    return {"seconds": seconds, "orders_per_sec": orders / seconds, "games_per_sec": orders * 143 / seconds}
+
+def run_benchmarks(lineups, trials=DEFAULT_TRIALS, repeat=3):
+    """
+    全てのベンチマークを実行する
+
+    Returns:
+        dict: environment (実行環境) と results (ベンチマーク名 -> 指標名 -> 値)
+    """
+    results = {
+        "simulate_at_bat": bench_at_bat(lineups, repeat),
+        "simulate_inning": bench_inning(lineups, repeat),
+        "simulate_game": bench_game(lineups, repeat),
+        "simulate_games": bench_batch_games(lineups, repeat),
+    }
+    for num_trials in trials:
+        # 試行回数の多い推定は1回だけ測る
+        results[f"estimate_best_batting_order[trials={num_trials}]"] = bench_estimate(
+            lineups, num_trials, repeat if num_trials <= 100 else 1)
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "teams": sorted(lineups),
+        },
+        "results": results,
+    }
+
+def environment_differences(report, baseline):
+    """
+    ベースラインと今回の測定で実行環境の違う項目を探す
+
+    Returns:
+        list: (項目名, 今回の値, ベースラインの値) のリスト
+    """
+    current, expected = report.get("environment", {}), baseline.get("environment", {})
+    return [(key, current.get(key), expected.get(key)) for key in ENVIRONMENT_KEYS
+            if current.get(key) != expected.get(key)]
+
+def compare_with_baseline(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    ベースラインと比べて、threshold 以上遅くなった指標を探す
+
+    比べるのは1秒あたりの指標 (*_per_sec) のみ。ベースラインにないベンチマークは比べない。
+    実行環境が同じかは確かめないため、先に environment_differences で確かめる。
+
+    Returns:
+        list: (ベンチマーク名, 指標名, 今回の値, ベースラインの値) のリスト
+    """
+    regressions = []
+    for name, metrics in report["results"].items():
+        for metric, value in metrics.items():
+            expected = baseline.get("results", {}).get(name, {}).get(metric)
+            if metric.endswith("_per_sec") and expected and value < expected * (1 - threshold):
+                regressions.append((name, metric, value, expected))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シミュレーションエンジンと最良打順推定のベンチマーク")
+    parser.add_argument("--trials", type=int, nargs="+", default=DEFAULT_TRIALS, help="最良打順推定の試行回数")
+    parser.add_argument("--teams", nargs="+", help="測定するチーム略称 (省略時は全チーム)")
+    parser.add_argument("--repeat", type=int, default=3, help="各ベンチマークの測定回数 (最短時間を使う)")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="比較するベースラインの JSON ファイル")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="遅くなったとみなす割合")
+    parser.add_argument("--update-baseline", action="store_true", help="測定結果をベースラインとして保存する")
+    args = parser.parse_args(argv)
+
+    lineups = load_lineups()
+    if args.teams:
+        lineups = {team: df for team, df in lineups.items() if team in args.teams}
+    report = run_benchmarks(lineups, trials=args.trials, repeat=args.repeat)
+
+    for name, metrics in report["results"].items():
+        print(f"{name:45s} " + "  ".join(f"{metric}={value:,.1f}" for metric, value in metrics.items() if metric != "seconds"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"ベースラインを更新しました: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ベースラインがないため比較しません: {args.baseline}")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    differences = environment_differences(report, baseline)
+    if differences:
+        for key, value, expected in differences:
+            print(f"実行環境が違います: {key} {value} (ベースライン {expected})")
+        print("ベースラインと比較できません。この環境で --update-baseline を実行してベースラインを作り直してください")
+        return 2
+    regressions = compare_with_baseline(report, baseline, args.threshold)
+    for name, metric, value, expected in regressions:
+        print(f"遅くなりました: {name} {metric} {value:,.1f} (ベースライン {expected:,.1f})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
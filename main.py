@@ -1,13 +1,30 @@
 import streamlit as st
 import pandas as pd
-import random
 # app/services/simulation.py は同じ階層にあると仮定
-from app.services.simulation import simulate_game, estimate_best_batting_order
+from app.services.simulation import simulate_game, stream_best_batting_order, game_log_frame
+from app.services.exhaustive_search import exhaustive_batting_order_search
+from app.services.genetic_search import genetic_batting_order_search
+from app.services.successive_halving import successive_halving_search
+from app.services.local_search import local_search_batting_order
+from app.services.roster_search import DEFAULT_POOL_SIZE, roster_batting_order_search
+from app.services.parallel import default_workers
+from app.services.jobs import JobManager
+from app.services.instrumentation import instrumented
+from app.services.cache import EvaluationCache
+from app.services.markov import run_distribution
+from app.utils.team_data import TEAM_ABBREVIATIONS, LEAGUES, initial_lineup, lineup_frame, load_team_players
 
 # 定数
-TEAM_ABBREVIATIONS = {
-    "ヤクルト": "s", "DeNA": "db", "阪神": "t", "巨人": "g", "広島": "c", "中日": "d",
-    "オリックス": "b", "ソフトバンク": "h", "西武": "l", "楽天": "e", "ロッテ": "m", "日本ハム": "f",
+# 最良打順推定の探索方法
+SEARCH_METHODS = ["ランダム探索", "遺伝的アルゴリズム", "全探索 (9!通り・厳密な期待得点)", "逐次半減 (レース)", "局所探索 (現在の打順から改善)", "全選手から選択 (9人と打順を同時に最適化)"]
+
+# バックグラウンドのジョブの進捗を確認する間隔 (秒)
+JOB_POLL_INTERVAL = 1.0
+
+# 最良打順推定の評価方法
+SCORERS = {
+    "シミュレーション (143試合の平均得点)": "simulation",
+    "マルコフ連鎖 (厳密な期待得点)": "markov",
 }
 
 # --- データ読み込み関数 ---
@@ -15,11 +32,10 @@ TEAM_ABBREVIATIONS = {
 def load_data(year, team):
     """指定された年とチームの選手成績データを読み込む"""
     team_abbr = TEAM_ABBREVIATIONS[team]
-    file_path = f"./data/processed/{year}_{team_abbr}.csv"
     file_path2 = f"./data/raw/{year}_{team_abbr}.csv"
     
     try:
-        df1 = pd.read_csv(file_path)
+        df1 = load_team_players(year, team_abbr)
         df2 = pd.read_csv(file_path2)
         return df1,df2
     except FileNotFoundError:
@@ -36,32 +52,81 @@ def load_default_lineups(year):
         st.warning(f"警告: {year}年のデフォルトスタメンデータが見つかりません。")
         return pd.DataFrame()
 
+@st.cache_resource
+def load_evaluation_cache():
+    """打順の評価結果のキャッシュを開く (アプリ全体で1つを共有する)"""
+    return EvaluationCache()
+
+@st.cache_resource
+def load_job_manager():
+    """バックグラウンドで探索を実行するジョブ管理を作る (アプリ全体で1つを共有し、再実行後も動き続ける)"""
+    return JobManager()
+
 # --- ヘルパー関数 ---
+def random_search_job(selected_players_df, num_trials, progress_bar, cancel_token, **kwargs):
+    """
+    ランダム探索のジョブ。その時点の最良・最悪打順を進捗の表示文に含める
+
+    中止された場合は、それまでに評価した打順から選んだ結果を返す。
+    """
+    snapshot = None
+    for snapshot in stream_best_batting_order(selected_players_df, num_trials, cancel_token=cancel_token, **kwargs):
+        text = f"{snapshot['evaluated']}/{num_trials}打順 ({snapshot['throughput']:.0f}打順/秒, {snapshot['elapsed']:.1f}秒)"
+        if snapshot['best_order'] is not None:
+            text += (f" 暫定Best: {snapshot['best_order']['avg_runs']:.2f}点"
+                     f" ({' → '.join(snapshot['best_order']['order_df']['Player'])})"
+                     f" 暫定Worst: {snapshot['worst_order']['avg_runs']:.2f}点")
+        progress_bar.progress(snapshot['evaluated'] / num_trials, text=text)
+    if snapshot is None or snapshot['best_order'] is None:
+        return None
+    return snapshot
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_job_progress(job_id):
+    """実行中のジョブの進捗を一定間隔で表示し、終了したら画面全体を再実行して結果を表示する"""
+    job = load_job_manager().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    status = "順番待ち..." if job.status == "queued" else (job.progress.text or "処理開始...")
+    st.progress(job.progress.value, text=f"{job.description}: {status}")
+    st.button("中止", key="stop_best_order_sim", on_click=load_job_manager().cancel, args=(job_id,))
+
+def show_order_table(order_info):
+    """打順と打者別成績の表を表示する (成績がなければ打順のみ)"""
+    order_df = pd.DataFrame({'Order': range(1, 10), 'Player': order_info['order_df']['Player'].tolist()})
+    if order_info['stats'] is None:
+        st.dataframe(order_df, use_container_width=True, hide_index=True)
+        return
+    stats_df = calculate_player_stats(game_log_frame(order_info['stats']))
+    order_df = pd.concat([order_df, stats_df], axis=1)
+    st.dataframe(order_df[["Order","Player",'PA', 'AB', 'H', '2B','3B','HR','BB+HBP','SO','Out','Sacrifice_Success', 'RBI', 'AVG', 'OBP', 'SLG', 'OPS']].fillna(0).round(3),use_container_width=True, hide_index=True)
+
+def ranked_orders_frame(ranked_orders):
+    """上位・下位の打順の順位表 (ランダム探索では標準誤差と試合数も表示する)"""
+    ranked_df = pd.DataFrame([order['order'] for order in ranked_orders], columns=[f"{i}番" for i in range(1, 10)])
+    ranked_df.insert(0, '期待得点', [round(order['avg_runs'], 3) for order in ranked_orders])
+    if ranked_orders and 'std_error' in ranked_orders[0]:
+        ranked_df.insert(1, '標準誤差', [round(order['std_error'], 3) for order in ranked_orders])
+        ranked_df.insert(2, '試合数', [order['games'] for order in ranked_orders])
+    ranked_df.index = range(1, len(ranked_df) + 1)
+    return ranked_df
+
+def show_run_distribution(order_info):
+    """打順の1試合の得点分布 (マルコフ連鎖による厳密な値) を表示する"""
+    result = run_distribution(order_info['order_df'])
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("期待得点", f"{result['mean']:.2f}点")
+    col2.metric("標準偏差", f"{result['std']:.2f}点")
+    col3.metric("無得点の確率", f"{result['p_shutout']:.1%}")
+    col4.metric("5点以上の確率", f"{result['p_5_or_more']:.1%}")
+    # 確率がほぼ0の大量得点は表示しない
+    distribution = pd.Series(result['distribution'], name='確率').rename_axis('得点')
+    shown = max(distribution[distribution > 1e-4].index.max() + 1, 10)
+    st.bar_chart(distribution.iloc[:shown])
+
 def get_initial_players(df, default_lineups_df, year, team):
     """multiselectの初期選択選手リストを取得する"""
-    player_names = df['Player'].tolist()
-    team_abbr_upper = TEAM_ABBREVIATIONS[team].upper()
-    
-    team_default_df = default_lineups_df[
-        (default_lineups_df['Year'] == int(year)) & 
-        (default_lineups_df['Team_Abbr'] == team_abbr_upper)
-    ]
-
-    if not team_default_df.empty:
-        position_order = ['捕', '一', '二', '三', '遊', '左', '中', '右', '指']
-        team_default_df['Position_Order'] = pd.Categorical(
-            team_default_df['Position'], categories=position_order, ordered=True
-        )
-        initial_players = team_default_df.sort_values('Position_Order')['Player'].tolist()
-    else:
-        initial_players = player_names[:9]
-        
-    if len(initial_players) < 9:
-        remaining_players = [p for p in player_names if p not in initial_players]
-        random.shuffle(remaining_players)
-        initial_players.extend(remaining_players[:9 - len(initial_players)])
-        
-    return initial_players[:9]
+    return initial_lineup(df, default_lineups_df, year, TEAM_ABBREVIATIONS[team])
 
 def calculate_player_stats(stats_df):
     """シミュレーション結果から各種成績を計算する"""
@@ -93,12 +158,8 @@ def main():
     st.sidebar.title("📊 シミュレーション設定")
     year = st.sidebar.selectbox("年度を選択", list(range(2022, 2026)), index=2)
     
-    teams = {
-        "セントラル・リーグ": ["ヤクルト", "DeNA", "阪神", "巨人", "広島", "中日"],
-        "パシフィック・リーグ": ["オリックス", "ソフトバンク", "西武", "楽天", "ロッテ", "日本ハム"]
-    }
-    league = st.sidebar.selectbox("リーグを選択", list(teams.keys()))
-    team = st.sidebar.selectbox("チームを選択", teams[league])
+    league = st.sidebar.selectbox("リーグを選択", list(LEAGUES.keys()))
+    team = st.sidebar.selectbox("チームを選択", LEAGUES[league])
 
     # チーム/年度が変更された場合、選択中の選手をリセットして再実行
     if 'last_config' not in st.session_state or st.session_state.last_config != (year, team):
@@ -144,7 +205,7 @@ def main():
 
     # 選択された選手データを準備
     try:
-        selected_players_df = df[df['Player'].isin(selected_players)].set_index('Player').loc[selected_players].reset_index()
+        selected_players_df = lineup_frame(df, selected_players)
     except KeyError:
         st.error("選手データの読み込みに失敗しました。ページを再読み込みするか、選手を再選択してください。")
         return
@@ -164,7 +225,7 @@ def main():
         st.dataframe(inning_log_df)
 
         st.write("打者別成績")
-        game_log_df = pd.DataFrame(result['game_log']).T
+        game_log_df = game_log_frame(result['game_log'])
         game_log_df = calculate_player_stats(game_log_df)
         game_log_df['Player'] = selected_players
         game_log_df['Order'] = range(1, 10)
@@ -172,40 +233,104 @@ def main():
         st.dataframe(game_log_df[['PA', 'AB', 'H', '2B','3B','HR','BB+HBP','SO','Out','Sacrifice_Success', 'RBI', 'AVG', 'OBP', 'SLG', 'OPS']].fillna(0).round(3),use_container_width=True)
 
     st.subheader("🏆 最良打順の推定")
-    num_trials = st.number_input("試行回数", min_value=10, max_value=10000, value=100, step=10, help="試行回数が多いほど精度が向上しますが、計算に時間がかかります。")
+    search_method = st.radio("探索方法", SEARCH_METHODS, horizontal=True, help="全探索では362,880通りの打順すべてから、マルコフ連鎖の期待得点が最大の打順を求めます。逐次半減では多くの打順を少ない試合数で比べ、成績の良い打順に試合を追加していきます。局所探索では現在の打順から2人の入れ替えや1人の移動を試し、有意に得点が増える打順へ移っていきます。全選手から選択では、チームの全選手からスタメンの9人と打順をマルコフ連鎖の期待得点で同時に選びます (選択中の9人を初期打線として比べます)。")
+    if search_method not in (SEARCH_METHODS[2], SEARCH_METHODS[5]):
+        num_trials = st.number_input("試行回数", min_value=10, max_value=10000, value=100, step=10, help="試行回数が多いほど精度が向上しますが、計算に時間がかかります。")
+    if search_method in SEARCH_METHODS[:2]:
+        scorer_label = st.radio("評価方法", list(SCORERS.keys()), horizontal=True, help="マルコフ連鎖では乱数を使わずに各打順の1試合あたり期待得点を厳密に計算します。")
+    if search_method == SEARCH_METHODS[0]:
+        use_common_random_numbers = st.checkbox("共通乱数で比較する", value=False, help="全ての打順を同じ乱数の143試合で評価し、偶然の好成績による打順の選び間違いを減らします。")
+        with st.expander("並列実行の設定"):
+            n_workers = st.number_input("並列ワーカー数", min_value=1, max_value=default_workers(), value=default_workers(), step=1, help="シミュレーションを複数のプロセスで並列に実行します。")
+            chunk_size = st.number_input("チャンクサイズ", min_value=1, max_value=1000, value=16, step=1, help="1つのワーカーにまとめて渡す打順の数です。")
+    if search_method == SEARCH_METHODS[5]:
+        pool_size = st.number_input("候補の選手数", min_value=9, max_value=len(df), value=min(DEFAULT_POOL_SIZE, len(df)), step=1, help="1人だけで打線を組んだときの期待得点が高い順に、この人数まで候補に残します (選択中の9人は必ず残します)。多いほど探索が広がりますが、時間がかかります。")
+    with st.expander("計測の設定"):
+        use_instrumentation = st.checkbox("処理段階ごとの時間を計測する", value=False, help="乱数生成・進塁処理・成績ログの記録などにかかった時間と、打席数・犠打・併殺・乱数の生成数を集計します。並列ワーカーでの処理は集計されないため、ワーカー数1で実行してください。")
+        use_profile = st.checkbox("cProfile でプロファイルを取得する", value=False, disabled=not use_instrumentation)
+    use_cache = False
+    if search_method in (SEARCH_METHODS[0], SEARCH_METHODS[3]):
+        use_cache = st.checkbox("評価結果のキャッシュを使う", value=True, help="以前にシミュレーションした打順は結果を再利用し、足りない試合数だけ追加でシミュレーションします。共通乱数で比較する場合は使われません。")
     
+    # 探索はバックグラウンドのジョブで実行し、ジョブIDを session_state に保存して再実行後も追跡する
+    job_manager = load_job_manager()
     if st.button("このメンバーで推定", key="run_best_order_sim", use_container_width=True):
-        with st.spinner('シミュレーションを実行中...'):
-            progress_bar = st.progress(0, text="処理開始...")
-            estimation_result = estimate_best_batting_order(selected_players_df, num_trials, progress_bar)
-        
-        if estimation_result:
-            st.write("##### ✨ 最も得点効率の良い打順 (Best)")
-            st.metric("平均得点 (Best)", f"{estimation_result['best_order']['avg_runs']:.2f}点")
-            best_order_players = estimation_result['best_order']['order_df']['Player'].tolist()
-            best_df = pd.DataFrame({'Order': range(1, 10), 'Player': best_order_players})
-            #st.dataframe(best_df, use_container_width=True, hide_index=True)
-            best_stats_df = pd.DataFrame(estimation_result['best_order']['stats']).T
-            best_stats_df = calculate_player_stats(best_stats_df)
-            #st.dataframe(best_stats_df)#[[]].fillna(0).round(3))
-            best_df = pd.concat([best_df,best_stats_df],axis=1)
-            st.dataframe(best_df[["Order","Player",'PA', 'AB', 'H', '2B','3B','HR','BB+HBP','SO','Out','Sacrifice_Success', 'RBI', 'AVG', 'OBP', 'SLG', 'OPS']].fillna(0).round(3),use_container_width=True, hide_index=True)
-
-            st.write("##### 💔 最も得点効率の悪い打順 (Worst)")
-            st.metric("平均得点 (Worst)", f"{estimation_result['worst_order']['avg_runs']:.2f}点")
-            worst_order_players = estimation_result['worst_order']['order_df']['Player'].tolist()
-            worst_df = pd.DataFrame({'Order': range(1, 10), 'Player': worst_order_players})
-            #st.dataframe(worst_df, use_container_width=True, hide_index=True)
-            worst_stats_df = pd.DataFrame(estimation_result['worst_order']['stats']).T
-            worst_stats_df = calculate_player_stats(worst_stats_df)
-            worst_df = pd.concat([worst_df,worst_stats_df],axis=1)
-            st.dataframe(worst_df[["Order","Player",'PA', 'AB', 'H', '2B','3B','HR','BB+HBP','SO','Out','Sacrifice_Success', 'RBI', 'AVG', 'OBP', 'SLG', 'OPS']].fillna(0).round(3),use_container_width=True, hide_index=True)
-
-            
+        cache = load_evaluation_cache() if use_cache else None
+
+        def search(fn):
+            # 計測する場合は探索関数を計測付きにする
+            return instrumented(fn, profile=use_profile) if use_instrumentation else fn
 
+        if search_method == SEARCH_METHODS[0]:
+            job_id = job_manager.submit(search(random_search_job), selected_players_df, num_trials, description=search_method, scorer=SCORERS[scorer_label], n_workers=n_workers, chunk_size=chunk_size, common_random_numbers=use_common_random_numbers, cache=cache)
+        elif search_method == SEARCH_METHODS[1]:
+            job_id = job_manager.submit(search(genetic_batting_order_search), selected_players_df, description=search_method, max_evaluations=num_trials, scorer=SCORERS[scorer_label])
+        elif search_method == SEARCH_METHODS[2]:
+            job_id = job_manager.submit(search(exhaustive_batting_order_search), selected_players_df, description=search_method)
+        elif search_method == SEARCH_METHODS[3]:
+            job_id = job_manager.submit(search(successive_halving_search), selected_players_df, num_trials, description=search_method, cache=cache)
+        elif search_method == SEARCH_METHODS[4]:
+            job_id = job_manager.submit(search(local_search_batting_order), selected_players_df, description=search_method, max_games=num_trials * 143)
         else:
+            job_id = job_manager.submit(search(roster_batting_order_search), df, description=search_method, initial_players=selected_players, pool_size=pool_size)
+        st.session_state['search_job_id'] = job_id
+
+    estimation_result = None
+    job = job_manager.get(st.session_state.get('search_job_id'))
+    if job is not None and not job.finished:
+        show_job_progress(job.id)
+    elif job is not None:
+        result_method = job.description
+        estimation_result = job.result
+        if job.status == "failed":
+            st.error(f"シミュレーション中にエラーが発生しました: {job.error}")
+        elif job.status == "cancelled" and estimation_result:
+            st.info(f"探索を中止しました。{estimation_result['evaluated']}/{estimation_result['num_trials']}打順を評価した時点の結果です。")
+        elif job.status == "cancelled":
+            st.info("探索を中止しました。")
+        elif not estimation_result:
             st.error("シミュレーション結果の取得に失敗しました。")
 
+    if estimation_result:
+        st.write("##### ✨ 最も得点効率の良い打順 (Best)")
+        st.metric("平均得点 (Best)", f"{estimation_result['best_order']['avg_runs']:.2f}点")
+        show_order_table(estimation_result['best_order'])
+        with st.expander("📊 1試合の得点分布 (Best)"):
+            show_run_distribution(estimation_result['best_order'])
+
+        if 'trace' in estimation_result and result_method == SEARCH_METHODS[1]:
+            st.write("##### 📈 世代ごとの最良得点")
+            st.line_chart(pd.DataFrame({'最良得点': estimation_result['trace']}, index=pd.RangeIndex(1, len(estimation_result['trace']) + 1, name='世代')))
+        elif 'trace' in estimation_result:
+            st.write("##### 📈 初期打順からの改善幅 (推定)")
+            st.line_chart(pd.DataFrame({'改善幅': estimation_result['trace']}, index=pd.RangeIndex(0, len(estimation_result['trace']), name='ステップ')))
+
+        if 'top_orders' in estimation_result:
+            st.write("##### 🥇 上位の打順")
+            st.dataframe(ranked_orders_frame(estimation_result['top_orders']), use_container_width=True)
+        if 'bottom_orders' in estimation_result:
+            with st.expander("🔻 下位の打順"):
+                st.dataframe(ranked_orders_frame(estimation_result['bottom_orders']), use_container_width=True)
+
+        # 局所探索では最悪打順の代わりに初期打順と比べる
+        if 'worst_order' in estimation_result:
+            compared_key, compared_title, compared_label = 'worst_order', "##### 💔 最も得点効率の悪い打順 (Worst)", "平均得点 (Worst)"
+        else:
+            compared_key, compared_title, compared_label = 'initial_order', "##### 📋 初期打順 (Start)", "平均得点 (Start)"
+        st.write(compared_title)
+        st.metric(compared_label, f"{estimation_result[compared_key]['avg_runs']:.2f}点")
+        show_order_table(estimation_result[compared_key])
+        with st.expander(f"📊 1試合の得点分布 ({'Worst' if compared_key == 'worst_order' else 'Start'})"):
+            show_run_distribution(estimation_result[compared_key])
+
+        if 'metrics' in estimation_result:
+            with st.expander("⏱ 計測結果", expanded=True):
+                metrics = estimation_result['metrics']
+                st.dataframe(metrics.timer_frame().round(3), use_container_width=True, hide_index=True)
+                st.dataframe(metrics.counter_frame(), use_container_width=True, hide_index=True)
+                if metrics.profile:
+                    st.code(metrics.profile)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
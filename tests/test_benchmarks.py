@@ -0,0 +1,39 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.run_benchmarks import load_lineups, run_benchmarks, compare_with_baseline, environment_differences
+
+def test_load_lineups():
+    print("\n--- Load Benchmark Lineups Test ---")
+    lineups = load_lineups()
+    assert len(lineups) == 12
+    for team, lineup in lineups.items():
+        assert len(lineup) == 9, team
+    print("Load Benchmark Lineups Test Passed!")
+
+def test_run_benchmarks_and_compare():
+    print("\n--- Run Benchmarks Test ---")
+    lineups = {'h': load_lineups()['h']}
+    report = run_benchmarks(lineups, trials=[10], repeat=1)
+    results = report['results']
+    assert set(results) == {"simulate_at_bat", "simulate_inning", "simulate_game", "simulate_games",
+                            "estimate_best_batting_order[trials=10]"}
+    assert all(value > 0 for metrics in results.values() for value in metrics.values())
+
+    # 自分自身とは差がなく、2倍速いベースラインとは差がある
+    assert compare_with_baseline(report, report) == []
+    faster = {"results": {name: {metric: value * 2 for metric, value in metrics.items()}
+                          for name, metrics in results.items()}}
+    regressions = compare_with_baseline(report, faster, threshold=0.2)
+    assert {(name, metric) for name, metric, _, _ in regressions} == {
+        (name, metric) for name, metrics in results.items() for metric in metrics if metric.endswith("_per_sec")}
+    assert compare_with_baseline(report, faster, threshold=0.6) == []
+
+    # 実行環境の違うベースラインとは比べない
+    assert environment_differences(report, report) == []
+    other = {**report, "environment": {**report['environment'], "numpy": "0.0.0", "teams": ["h", "g"]}}
+    assert [key for key, _, _ in environment_differences(report, other)] == ["numpy", "teams"]
+    print("Run Benchmarks Test Passed!")
@@ -0,0 +1,137 @@
+import sys
+import os
+import sqlite3
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.services.cache import EvaluationCache, order_keys, group_by_games
+from app.services.simulation import estimate_best_batting_order, stream_best_batting_order, GAMES_PER_SEASON
+from app.services.successive_halving import successive_halving_search
+from tests.test_simulation import df
+
+class DummyProgressBar:
+    def progress(self, value, text=None):
+        pass
+
+def test_order_keys():
+    print("\n--- Order Keys Test ---")
+    orders = np.array([np.arange(9), np.arange(9)[::-1]])
+    keys = order_keys(df, orders)
+    assert keys[0] != keys[1]
+    # 行の並びが違っても、同じ選手の並びなら同じキーになる
+    shuffled = df.iloc[::-1].reset_index(drop=True)
+    assert order_keys(shuffled, np.arange(9)[::-1])[0] == keys[0]
+    # 確率が変わればキーも変わる
+    changed = df.copy()
+    changed.loc[0, 'HR_ratio'] += 0.01
+    assert order_keys(changed, orders)[0] != keys[0]
+
+    groups = group_by_games(np.array([0, 143, 100, 143]))
+    assert [(games, ids.tolist()) for games, ids in groups] == [(100, [2]), (143, [1, 3])]
+    print("Order Keys Test Passed!")
+
+def test_cache_accumulates_and_persists(tmp_path):
+    print("\n--- Evaluation Cache Test ---")
+    path = str(tmp_path / "evaluations.sqlite")
+    cache = EvaluationCache(path)
+    log = np.ones((9, 12), dtype=np.int64)
+    cache.add(["a", "b"], np.array([10, 0]), np.array([40.0, 0.0]), np.array([200.0, 0.0]), np.array([log, log]))
+    cache.add(["a"], np.array([5]), np.array([20.0]), np.array([100.0]), np.array([log]))
+    run_totals, run_squares, game_counts, logs = cache.lookup(["a", "b"], (9, 12))
+    assert game_counts.tolist() == [15, 0] and run_totals.tolist() == [60.0, 0.0]
+    assert run_squares.tolist() == [300.0, 0.0]
+    assert np.all(logs[0] == 2) and np.all(logs[1] == 0)
+    cache.close()
+
+    # ディスクから読み直しても同じ値になる
+    reopened = EvaluationCache(path)
+    run_totals, run_squares, game_counts, logs = reopened.lookup(["a"], (9, 12))
+    assert game_counts[0] == 15 and run_totals[0] == 60.0 and run_squares[0] == 300.0 and np.all(logs[0] == 2)
+    reopened.close()
+    print("Evaluation Cache Test Passed!")
+
+def test_cache_upgrades_old_file(tmp_path):
+    """得点の2乗和の列がない以前の版のファイルに列を加えて使えるかをテストする"""
+    path = str(tmp_path / "evaluations.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE evaluations (key TEXT PRIMARY KEY, games INTEGER, run_total REAL, log BLOB, last_used REAL)")
+    connection.commit()
+    connection.close()
+
+    cache = EvaluationCache(path)
+    cache.add(["a"], np.array([2]), np.array([6.0]), np.array([20.0]), np.zeros((1, 9, 12), dtype=np.int64))
+    cache.close()
+    run_totals, run_squares, game_counts, _ = EvaluationCache(path).lookup(["a"], (9, 12))
+    assert game_counts[0] == 2 and run_totals[0] == 6.0 and run_squares[0] == 20.0
+
+def test_cache_eviction(tmp_path):
+    print("\n--- Cache Eviction Test ---")
+    cache = EvaluationCache(str(tmp_path / "evaluations.sqlite"), max_memory_entries=2, max_disk_entries=3)
+    log = np.zeros((1, 9, 12), dtype=np.int64)
+    for key in "abcd":
+        cache.add([key], np.array([1]), np.array([1.0]), np.array([1.0]), log)
+    assert len(cache._memory) == 2 and len(cache) == 3
+    # 最後に使われたのが最も古い "a" が消える
+    assert cache.lookup(["a"], (9, 12))[2][0] == 0
+    assert cache.lookup(["b"], (9, 12))[2][0] == 1
+
+    memory_only = EvaluationCache(None, max_memory_entries=2)
+    for key in "abc":
+        memory_only.add([key], np.array([1]), np.array([1.0]), np.array([1.0]), log)
+    assert len(memory_only) == 2
+    print("Cache Eviction Test Passed!")
+
+def test_cache_counts_rows_only_near_limit(tmp_path):
+    """書き込みのたびに全件を数えず、行数の上限に近づいたときだけ数え直すかをテストする"""
+    cache = EvaluationCache(str(tmp_path / "evaluations.sqlite"), max_disk_entries=5)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+    log = np.zeros((1, 9, 12), dtype=np.int64)
+    for key in "abcd":
+        cache.add([key], np.array([1]), np.array([1.0]), np.array([1.0]), log)
+    assert not any("COUNT" in statement for statement in statements)
+    # 同じキーの積み増しでも見積もりは増えるため、上限を超えたら数え直す (実際には4行なので消さない)
+    for _ in range(3):
+        cache.add(["a"], np.array([1]), np.array([1.0]), np.array([1.0]), log)
+    assert any("COUNT" in statement for statement in statements)
+    cache._connection.set_trace_callback(None)
+    assert len(cache) == 4 and cache.lookup(["a"], (9, 12))[2][0] == 4
+    cache.close()
+
+def test_estimate_reuses_cache():
+    print("\n--- Cached Estimate Test ---")
+    cache = EvaluationCache(None)
+    first = estimate_best_batting_order(df, 10, DummyProgressBar(), seed=0, cache=cache)
+    assert 0 < len(cache) <= 10
+    _, _, game_counts, _ = cache.lookup(list(cache._memory), (9, 12))
+    assert np.all(game_counts >= GAMES_PER_SEASON)
+
+    # 同じ打順を再び評価しても、1シーズン分がキャッシュ済みなら追加のシミュレーションはしない
+    second = estimate_best_batting_order(df, 10, DummyProgressBar(), seed=0, cache=cache)
+    for key in ("best_order", "worst_order"):
+        assert first[key]['avg_runs'] == second[key]['avg_runs']
+        assert np.array_equal(first[key]['stats'], second[key]['stats'])
+    # キャッシュだけで評価した打順も、保存した得点の2乗和から標準誤差を求める
+    for a, b in zip(first['top_orders'], second['top_orders']):
+        assert a['avg_runs'] == b['avg_runs'] and np.isclose(a['std_error'], b['std_error']) and b['std_error'] > 0
+    _, _, game_counts_after, _ = cache.lookup(list(cache._memory), (9, 12))
+    assert np.array_equal(game_counts, game_counts_after)
+
+    result = successive_halving_search(df, 20, DummyProgressBar(), seed=0, cache=cache)
+    assert result['best_order']['stats'].shape == (9, 12)
+    print(f"Best: {second['best_order']['avg_runs']:.2f}, cached orders: {len(cache)}")
+    print("Cached Estimate Test Passed!")
+
+def test_cache_kept_when_stream_closed():
+    """途中経過を受け取った時点でジェネレータを閉じても、評価し終えた打順はキャッシュに残るかをテストする"""
+    print("\n--- Cache On Early Close Test ---")
+    cache = EvaluationCache(None)
+    stream = stream_best_batting_order(df, 40, chunk_size=4, seed=0, cache=cache, snapshot_interval=0)
+    snapshot = next(stream)
+    stream.close()
+    assert not snapshot['done'] and len(cache) >= snapshot['evaluated'] > 0
+    _, _, game_counts, _ = cache.lookup(list(cache._memory), (9, 12))
+    assert np.all(game_counts == GAMES_PER_SEASON)
+    print("Cache On Early Close Test Passed!")
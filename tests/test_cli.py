@@ -0,0 +1,46 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pandas as pd
+import pytest
+from app.cli import parse_years, select_teams, main
+from app.services.leaderboard import read_evaluation_log
+
+PROCESSED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'processed'))
+
+def test_parse_years_and_select_teams():
+    print("\n--- CLI Arguments Test ---")
+    assert parse_years(["2022-2024", "2024", "2021"]) == [2021, 2022, 2023, 2024]
+    assert select_teams(["h", "阪神"]) == ["h", "t"]
+    assert select_teams(league="セントラル・リーグ") == ["s", "db", "t", "g", "c", "d"]
+    assert len(select_teams()) == 12
+    with pytest.raises(ValueError):
+        select_teams(["zz"])
+    print("CLI Arguments Test Passed!")
+
+def test_cli_writes_results(tmp_path):
+    print("\n--- CLI Run Test ---")
+    output_dir = str(tmp_path / "results")
+    args = ["--years", "2023-2024", "--teams", "h", "s", "--trials", "10", "--seed", "0", "--workers", "1",
+            "--processed-dir", PROCESSED_DIR, "--output-dir", output_dir]
+    assert main(args[:-2] + ["--log-evaluations"] + args[-2:]) == 0
+
+    # データのない2023年は飛ばす
+    summary = pd.read_csv(os.path.join(output_dir, "summary.csv"))
+    assert sorted(summary['team_abbr']) == ["h", "s"] and set(summary['year']) == {2024}
+    with open(os.path.join(output_dir, "2024_h_random.json"), encoding="utf-8") as f:
+        record = json.load(f)
+    assert len(record['best_order']['players']) == 9 and len(record['best_order']['stats']) == 9
+    assert abs(record['improvement'] - (record['best_order']['expected_runs'] - record['initial_lineup']['expected_runs'])) < 1e-12
+    assert record['top_orders'][0]['order'] == record['best_order']['players']
+    assert len(read_evaluation_log(record['evaluation_log'])) == 10
+
+    # 同じシードなら同じ結果になる
+    assert main(args[:-1] + [output_dir + "_again"]) == 0
+    again = pd.read_csv(os.path.join(output_dir + "_again", "summary.csv"))
+    assert summary['best_avg_runs'].tolist() == again['best_avg_runs'].tolist()
+    print("CLI Run Test Passed!")
@@ -0,0 +1,71 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.services.exhaustive_search import NUM_ORDERS, all_orders, order_ranks, exhaustive_batting_order_search
+from app.services.markov import build_transition_matrices, evaluate_orders, inning_outcomes
+from tests.test_simulation import df
+
+class DummyProgressBar:
+    def progress(self, value):
+        pass
+
+def test_order_ranks():
+    """辞書順の番号が all_orders の並びと一致するかをテストする"""
+    orders = all_orders()
+    assert len(orders) == NUM_ORDERS
+    sample = np.random.choice(NUM_ORDERS, 1000, replace=False)
+    assert np.array_equal(order_ranks(orders[sample]), sample)
+
+def all_order_scores(transitions, batch_size=4096):
+    """
+    9! 通りの全打順の期待得点を総当たりで求める (all_orders の並び)
+
+    打順を回転させても各イニングの結果 (inning_outcomes) は変わらないため、
+    1番が選手0の 8! 通りだけを計算し、9通りの先頭打者から始めた1試合の期待得点を回転した打順に割り当てる。
+    """
+    orders = all_orders()
+    representatives = orders[orders[:, 0] == 0]
+    scores = np.empty(NUM_ORDERS)
+    for start in range(0, len(representatives), batch_size):
+        batch = representatives[start:start + batch_size]
+        inning_runs, next_leadoff = inning_outcomes(transitions, batch)
+        # leadoff[b, u, s]: u番から始めた試合で、s番がイニングの先頭になる確率
+        leadoff = np.broadcast_to(np.eye(9), (len(batch), 9, 9)).copy()
+        totals = np.zeros((len(batch), 9))
+        for _ in range(9):
+            totals += np.einsum('bus,bs->bu', leadoff, inning_runs)
+            leadoff = np.einsum('bus,bst->but', leadoff, next_leadoff)
+        for r in range(9):
+            scores[order_ranks(np.roll(batch, -r, axis=1))] = totals[:, r]
+    return scores
+
+def test_exhaustive_batting_order_search():
+    """全探索の最良・最悪・上位打順が、9! 通りの総当たりの結果と一致するかをテストする"""
+    print("\n--- Running Exhaustive Search Test ---")
+    top_k = 5
+    result = exhaustive_batting_order_search(df, DummyProgressBar(), top_k=top_k)
+
+    transitions = build_transition_matrices(df)
+    orders = all_orders()
+    scores = all_order_scores(transitions)
+    # 総当たりの期待得点は evaluate_orders と一致する
+    sample = np.random.default_rng(0).choice(NUM_ORDERS, 500, replace=False)
+    assert np.allclose(evaluate_orders(transitions, orders[sample]), scores[sample], rtol=0, atol=1e-12)
+
+    players = df['Player'].to_numpy()
+    ranking = np.argsort(-scores, kind='stable')
+    expected_top = [players[orders[i]].tolist() for i in ranking[:top_k]]
+    assert result['best_order']['order_df']['Player'].tolist() == expected_top[0]
+    assert result['worst_order']['order_df']['Player'].tolist() == players[orders[scores.argmin()]].tolist()
+    assert [order['order'] for order in result['top_orders']] == expected_top
+    assert np.allclose([order['avg_runs'] for order in result['top_orders']], scores[ranking[:top_k]], rtol=0, atol=1e-12)
+    assert abs(result['best_order']['avg_runs'] - scores.max()) < 1e-12
+    assert abs(result['worst_order']['avg_runs'] - scores.min()) < 1e-12
+
+    best = result['best_order']['avg_runs']
+    worst = result['worst_order']['avg_runs']
+    print(f"Best: {best:.3f}, Worst: {worst:.3f}, Evaluated: {result['evaluated_orders']}")
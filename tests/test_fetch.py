@@ -0,0 +1,124 @@
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.fetch import FetchError, Fetcher
+
+DUMMY_HTML_FILE = os.path.join(os.path.dirname(__file__), "dummy_html", "kiyou_m.html")
+ETAG = '"kiyou-m-v1"'
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """テスト用のHTTPサーバー (dummy_html のページを ETag 付きで返す)"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("If-None-Match")))
+            server.client_ports.add(self.client_address[1])
+            failures = server.failures.get(self.path, 0)
+            if failures:
+                server.failures[self.path] = failures - 1
+        if failures:
+            self._send(503, b"")
+        elif self.path == "/kiyou_m.html":
+            if self.headers.get("If-None-Match") == ETAG:
+                self._send(304, b"", {"ETag": ETAG})
+            else:
+                with open(DUMMY_HTML_FILE, "rb") as f:
+                    self._send(200, f.read(), {"ETag": ETAG, "Content-Type": "text/html; charset=utf-8"})
+        elif self.path == "/old":
+            self._send(301, b"", {"Location": "/kiyou_m.html"})
+        elif self.path.startswith("/page/"):
+            self._send(200, self.path.encode("utf-8"))
+        else:
+            self._send(404, b"not found")
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests, httpd.client_ports, httpd.failures = [], set(), {}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_conditional_request_uses_cache(server, tmp_path):
+    """2回目の取得は If-None-Match を送り、304 ならキャッシュの本文を返すことをテストする"""
+    with open(DUMMY_HTML_FILE, "rb") as f:
+        expected = f.read()
+    url = server.base_url + "/kiyou_m.html"
+
+    with Fetcher(cache_dir=str(tmp_path)) as fetcher:
+        assert fetcher.fetch(url) == expected
+        assert fetcher.fetch(url) == expected
+    assert server.requests == [("/kiyou_m.html", None), ("/kiyou_m.html", ETAG)]
+
+    # 新しい Fetcher でもディスクのキャッシュを使う
+    with Fetcher(cache_dir=str(tmp_path)) as fetcher:
+        assert fetcher.fetch(url) == expected
+    assert server.requests[-1] == ("/kiyou_m.html", ETAG)
+
+    # max_age 以内ならリクエストを送らない
+    with Fetcher(cache_dir=str(tmp_path), max_age=3600) as fetcher:
+        assert fetcher.fetch(url) == expected
+    assert len(server.requests) == 3
+    print("\n✅ test_conditional_request_uses_cache passed.")
+
+def test_retry_and_errors(server, tmp_path):
+    """5xx は再試行し、404 は再試行せずに FetchError になることをテストする"""
+    server.failures["/page/flaky"] = 2
+    with Fetcher(cache_dir=None, retries=3, backoff=0.01) as fetcher:
+        assert fetcher.fetch(server.base_url + "/page/flaky") == b"/page/flaky"
+        assert [path for path, _ in server.requests].count("/page/flaky") == 3
+
+        with pytest.raises(FetchError):
+            fetcher.fetch(server.base_url + "/missing")
+        assert [path for path, _ in server.requests].count("/missing") == 1
+
+        server.failures["/page/down"] = 10
+        with pytest.raises(FetchError):
+            fetcher.fetch(server.base_url + "/page/down")
+
+        # リダイレクトを辿る
+        assert fetcher.fetch(server.base_url + "/old").startswith(b"<tbody>")
+
+    # 取得できなくても、キャッシュがあれば古いキャッシュを返す
+    with Fetcher(cache_dir=str(tmp_path), retries=0) as fetcher:
+        assert fetcher.fetch(server.base_url + "/page/cached") == b"/page/cached"
+        server.failures["/page/cached"] = 1
+        assert fetcher.fetch(server.base_url + "/page/cached") == b"/page/cached"
+    print("\n✅ test_retry_and_errors passed.")
+
+def test_fetch_many_reuses_connections(server):
+    """並列取得が URL と同じ順で結果を返し、接続を使い回すことをテストする"""
+    urls = [f"{server.base_url}/page/{i}" for i in range(40)] + [server.base_url + "/missing"]
+    with Fetcher(cache_dir=None, max_workers=4, retries=0) as fetcher:
+        pages = fetcher.fetch_many(urls, return_exceptions=True)
+        assert pages[:-1] == [f"/page/{i}".encode("utf-8") for i in range(40)]
+        assert isinstance(pages[-1], FetchError)
+        fetcher.fetch_many(urls[:8])
+    # 同時接続数 (スレッド数) 以下の接続しか張らない
+    assert len(server.client_ports) <= 4
+    print("\n✅ test_fetch_many_reuses_connections passed.")
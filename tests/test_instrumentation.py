@@ -0,0 +1,56 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import inspect
+import numpy as np
+from app.services import instrumentation
+from app.services.simulation import simulate_game, simulate_games, estimate_best_batting_order, LOG_COLUMNS
+from tests.test_simulation import df
+
+def test_collect_scalar_engine():
+    print("\n--- Scalar Engine Instrumentation Test ---")
+    assert instrumentation.current() is None
+    with instrumentation.collect() as metrics:
+        results = [simulate_game(df, enable_inning_log=False) for _ in range(20)]
+    assert instrumentation.current() is None
+
+    attempts = sum(int(r['game_log'][:, LOG_COLUMNS['Sacrifice_Attempts']].sum()) for r in results)
+    assert metrics.counters['innings'] == 20 * 9
+    assert metrics.counters['plate_appearances'] >= 20 * 27
+    assert metrics.counters['bunt_attempts'] == attempts
+    assert metrics.counters['rng_draws'] >= 2 * metrics.counters['plate_appearances']
+    assert set(metrics.timers) == {'compile', 'rng', 'advancement', 'logging'}
+    print(metrics.format())
+    print("Scalar Engine Instrumentation Test Passed!")
+
+def test_collect_batch_engine():
+    print("\n--- Batch Engine Instrumentation Test ---")
+    with instrumentation.collect() as metrics:
+        result = simulate_games(df, 50, rng=np.random.default_rng(0))
+    log = result['game_log']
+    assert metrics.counters['innings'] == 50 * 9
+    assert metrics.counters['bunt_attempts'] == log[:, LOG_COLUMNS['Sacrifice_Attempts']].sum()
+    assert metrics.counters['rng_draws'] == 3 * metrics.counters['plate_appearances']
+    assert 0 < metrics.counters['double_plays'] < metrics.counters['plate_appearances']
+    summary = metrics.summary()
+    assert abs(sum(t['share'] for t in summary['timers'].values()) - 1.0) < 1e-9
+    print("Batch Engine Instrumentation Test Passed!")
+
+def test_instrumented_search():
+    print("\n--- Instrumented Search Test ---")
+    search = instrumentation.instrumented(estimate_best_batting_order, profile=True)
+    # JobManager が cancel_token を渡せるよう、元の関数の引数を引き継ぐ
+    assert 'cancel_token' in inspect.signature(search).parameters
+
+    class DummyProgressBar:
+        def progress(self, value, text=None):
+            pass
+
+    result = search(df, 10, DummyProgressBar(), seed=0)
+    metrics = result['metrics']
+    assert metrics.counters['innings'] == 10 * 143 * 9
+    assert 'estimate_best_batting_order' in metrics.profile
+    print("Instrumented Search Test Passed!")
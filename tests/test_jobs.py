@@ -0,0 +1,106 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import warnings
+
+import pytest
+from app.services.jobs import JobManager, DONE, CANCELLED, FAILED
+from app.services.simulation import estimate_best_batting_order
+from app.services.exhaustive_search import exhaustive_batting_order_search
+from tests.test_simulation import df
+
+def _blocking_search(progress_bar, started, release):
+    """release がセットされるまで進捗を報告し続けるダミーの探索"""
+    started.set()
+    while not release.wait(0.01):
+        progress_bar.progress(0.5, text="running")
+    return "finished"
+
+def _failing_search(progress_bar):
+    raise ValueError("boom")
+
+def test_job_result():
+    print("\n--- Job Result Test ---")
+    manager = JobManager(max_workers=2)
+    job_id = manager.submit(estimate_best_batting_order, df, 20, description="random", seed=0)
+    result = manager.result(job_id, timeout=60)
+    job = manager.get(job_id)
+    assert job.status == DONE and job.progress.value == 1.0
+    # 同じシードならジョブで実行しても結果は同じ
+    direct = estimate_best_batting_order(df, 20, job.progress, seed=0)
+    assert result['best_order']['avg_runs'] == direct['best_order']['avg_runs']
+
+    failed_id = manager.submit(_failing_search)
+    manager.result(failed_id, timeout=10)
+    assert manager.get(failed_id).status == FAILED
+    assert isinstance(manager.get(failed_id).error, ValueError)
+    manager.shutdown()
+    print("Job Result Test Passed!")
+
+def test_job_with_worker_processes():
+    """ジョブのスレッドからプロセスプール (n_workers>1) を使っても、fork せずに直接実行と同じ結果になるかをテストする"""
+    print("\n--- Job With Worker Processes Test ---")
+    manager = JobManager(max_workers=2)
+    with warnings.catch_warnings(record=True) as records:
+        warnings.simplefilter("always")
+        job_ids = [manager.submit(estimate_best_batting_order, df, 32, description="random", seed=seed,
+                                  n_workers=2, chunk_size=4)
+                   for seed in (0, 1)]
+        results = [manager.result(job_id, timeout=120) for job_id in job_ids]
+    assert all(manager.get(job_id).status == DONE for job_id in job_ids)
+    assert not [record for record in records if "fork()" in str(record.message)]
+    for seed, result in zip((0, 1), results):
+        direct = estimate_best_batting_order(df, 32, manager.get(job_ids[0]).progress, seed=seed, chunk_size=4)
+        assert result['best_order']['avg_runs'] == direct['best_order']['avg_runs']
+        assert result['worst_order']['avg_runs'] == direct['worst_order']['avg_runs']
+    manager.shutdown()
+    print("Job With Worker Processes Test Passed!")
+
+def test_job_cancellation():
+    print("\n--- Job Cancellation Test ---")
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    running_id = manager.submit(_blocking_search, started=started, release=release)
+    # ワーカーが1つなので、2つ目のジョブは順番待ちになる
+    queued_id = manager.submit(exhaustive_batting_order_search, df)
+    started.wait(10)
+
+    manager.cancel(queued_id)
+    assert manager.get(queued_id).status == CANCELLED
+    # cancel_token を受け取らない関数は、次の進捗報告で止まる
+    manager.cancel(running_id)
+    assert manager.result(running_id, timeout=10) is None
+    assert manager.get(running_id).status == CANCELLED
+    release.set()
+
+    # cancel_token を受け取る関数は、それまでの結果を返して止まる
+    job_id = manager.submit(estimate_best_batting_order, df, 2000, chunk_size=4, seed=0)
+    manager.cancel(job_id)
+    result = manager.result(job_id, timeout=60)
+    assert manager.get(job_id).status == CANCELLED
+    assert result is None or result['best_order'] is None or result['best_order']['stats'].shape == (9, 12)
+    manager.shutdown()
+    print("Job Cancellation Test Passed!")
+
+def test_finished_jobs_are_pruned():
+    print("\n--- Job Pruning Test ---")
+    manager = JobManager(max_workers=1, max_finished_jobs=2)
+    job_ids = []
+    for _ in range(4):
+        job_ids.append(manager.submit(_failing_search))
+        manager.result(job_ids[-1], timeout=10)
+    manager.submit(_failing_search)
+    assert sum(manager.get(job_id) is not None for job_id in job_ids) == 2
+
+    # 消えたジョブや存在しないジョブIDは、取り消しでは無視し、結果の取り出しでは KeyError にする
+    removed = next(job_id for job_id in job_ids if manager.get(job_id) is None)
+    for job_id in (removed, "unknown"):
+        manager.cancel(job_id)
+        with pytest.raises(KeyError):
+            manager.result(job_id)
+    manager.shutdown()
+    print("Job Pruning Test Passed!")
@@ -0,0 +1,127 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+from app.services.leaderboard import EvaluationLog, Leaderboard, read_evaluation_log
+from app.services.simulation import estimate_best_batting_order
+from tests.test_simulation import df
+
+class DummyProgressBar:
+    def progress(self, value, text=None):
+        pass
+
+def test_leaderboard_matches_sort():
+    """順位表の上位・下位が全評価を並べ替えた結果と一致するかをテストする (同点は試行順)"""
+    print("\n--- Leaderboard Test ---")
+    rng = np.random.default_rng(0)
+    num_orders = 2000
+    orders = np.array([rng.permutation(9) for _ in range(num_orders)], dtype=np.uint8)
+    # 同点を多く含む平均得点
+    avg_runs = rng.integers(0, 50, num_orders) / 10
+
+    leaderboard = Leaderboard(top_k=5)
+    for start in range(0, num_orders, 300):
+        ids = np.arange(start, min(start + 300, num_orders))
+        leaderboard.push_many(ids, orders[ids], avg_runs[ids], games=np.full(len(ids), 143))
+    one_by_one = Leaderboard(top_k=5)
+    for i in range(num_orders):
+        one_by_one.push(i, orders[i], avg_runs[i], games=143)
+
+    expected_top = sorted(range(num_orders), key=lambda i: (-avg_runs[i], i))[:5]
+    expected_bottom = sorted(range(num_orders), key=lambda i: (avg_runs[i], i))[:5]
+    for board in (leaderboard, one_by_one):
+        assert board.count == num_orders
+        assert [entry.trial for entry in board.top()] == expected_top
+        assert [entry.trial for entry in board.bottom()] == expected_bottom
+        assert board.best().trial == expected_top[0] and board.worst().trial == expected_bottom[0]
+    assert np.array_equal(leaderboard.best().permutation(), orders[expected_top[0]])
+
+    players = df['Player'].tolist()
+    ranked = leaderboard.ranked_orders(players)
+    assert ranked[0]['order'] == [players[i] for i in orders[expected_top[0]]]
+    assert ranked[0]['games'] == 143
+    print("Leaderboard Test Passed!")
+
+def test_leaderboard_replaces_repeated_order():
+    """同じ打順を2回加えると、2件にならず新しい評価で置き換わるかをテストする"""
+    orders = np.array([np.roll(np.arange(9), i) for i in range(6)], dtype=np.uint8)
+    board = Leaderboard(top_k=3)
+    board.push_many(np.arange(6), orders, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    # 上位にある打順の再評価 (順位の境界の内側なので配列の比較では除かれない)
+    board.push_many(np.array([6]), orders[5:], [3.5])
+    assert [entry.trial for entry in board.top()] == [4, 3, 6]
+    assert [entry.avg_runs for entry in board.top()] == [5.0, 4.0, 3.5]
+    # 1つずつ加えても同じ (下位にあった打順は下位から除かれる)
+    board.push(7, orders[0], 0.5)
+    assert [entry.trial for entry in board.bottom()] == [7, 1, 2]
+    assert board.count == 8
+    for entries in (board.top(), board.bottom()):
+        assert len({entry.order for entry in entries}) == len(entries)
+
+def test_evaluation_log_roundtrip(tmp_path):
+    """評価ログに追記した内容を読み込めるか、書き込み途中の行を除くかをテストする"""
+    print("\n--- Evaluation Log Test ---")
+    path = str(tmp_path / "evaluations")
+    orders = np.array([np.roll(np.arange(9), i) for i in range(6)], dtype=np.uint8)
+    with EvaluationLog(path, df['Player'], seed=0) as log:
+        log.append(np.arange(3), orders[:3], [4.0, 5.0, 6.0], [0.1, 0.2, 0.3], [143, 143, 143])
+        log.append(np.arange(3, 6), orders[3:], [1.0, 2.0, 3.0], [np.nan] * 3, [286, 286, 286])
+
+    result = read_evaluation_log(path)
+    assert result['trial'].tolist() == list(range(6))
+    assert result['avg_runs'].tolist() == [4.0, 5.0, 6.0, 1.0, 2.0, 3.0]
+    assert result.loc[3, 'order_1'] == df['Player'][orders[3][0]]
+    assert result['games'].tolist() == [143] * 3 + [286] * 3
+
+    # 1列だけ書き込まれた行は読まない
+    with open(os.path.join(path, "avg_runs.bin"), "ab") as f:
+        f.write(np.array([9.0]).tobytes())
+    assert len(read_evaluation_log(path)) == 6
+    print("Evaluation Log Test Passed!")
+
+def test_evaluation_log_closes_files_on_error(tmp_path, monkeypatch):
+    """途中の列のファイルを開けなかったとき、開いたファイルを閉じるかをテストする"""
+    opened = []
+    real_open = open
+
+    def failing_open(path, *args, **kwargs):
+        if str(path).endswith("std_error.bin"):
+            raise OSError("disk full")
+        f = real_open(path, *args, **kwargs)
+        opened.append(f)
+        return f
+
+    monkeypatch.setattr("builtins.open", failing_open)
+    with pytest.raises(OSError):
+        EvaluationLog(str(tmp_path / "evaluations"), df['Player'])
+    monkeypatch.undo()
+    assert len(opened) > 1 and all(f.closed for f in opened)
+
+def test_estimate_top_orders_and_log(tmp_path):
+    """ランダム探索の上位・下位の打順と評価ログが、最良・最悪打順と一致するかをテストする"""
+    print("\n--- Top Orders Test ---")
+    path = str(tmp_path / "evaluations")
+    result = estimate_best_batting_order(df, 40, DummyProgressBar(), seed=0, top_k=5, evaluation_log=path)
+    assert len(result['top_orders']) == 5 and len(result['bottom_orders']) == 5
+    top_runs = [order['avg_runs'] for order in result['top_orders']]
+    assert top_runs == sorted(top_runs, reverse=True)
+    assert result['top_orders'][0]['order'] == result['best_order']['order_df']['Player'].tolist()
+    assert result['bottom_orders'][0]['order'] == result['worst_order']['order_df']['Player'].tolist()
+    assert all(order['games'] == 143 and order['std_error'] > 0 for order in result['top_orders'])
+    # 平均得点は丸めずに、順位表と同じ値を返す
+    assert result['best_order']['avg_runs'] == top_runs[0]
+
+    evaluations = read_evaluation_log(path)
+    assert len(evaluations) == 40
+    assert evaluations['avg_runs'].max() == top_runs[0]
+    # 標準誤差は143試合の得点のばらつきから求める (1試合の標準偏差は数点)
+    assert (evaluations['std_error'] * np.sqrt(143)).between(1, 6).all()
+
+    markov = estimate_best_batting_order(df, 40, DummyProgressBar(), seed=0, scorer="markov", top_k=3)
+    assert len(markov['top_orders']) == 3 and markov['top_orders'][0]['std_error'] == 0.0
+    assert markov['top_orders'][0]['avg_runs'] == markov['best_order']['avg_runs']
+    print("Top Orders Test Passed!")
@@ -0,0 +1,54 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.services.local_search import neighbourhood, paired_improvement, local_search_batting_order
+from app.services.markov import build_transition_matrices, evaluate_orders
+from tests.test_simulation import df
+
+class DummyProgressBar:
+    def __init__(self):
+        self.texts = []
+
+    def progress(self, value, text=None):
+        self.texts.append(text)
+
+def test_neighbourhood():
+    """近傍が重複のない9人の順列になっているかをテストする"""
+    order = np.random.default_rng(0).permutation(9)
+    neighbours = neighbourhood(order)
+    assert len(neighbours) == 36 + 56
+    assert len({tuple(n) for n in neighbours}) == len(neighbours)
+    assert all(sorted(n.tolist()) == list(range(9)) for n in neighbours)
+    assert not any(np.array_equal(n, order) for n in neighbours)
+
+def test_paired_improvement():
+    """対応のある差の平均と z 値をテストする"""
+    total_runs = np.array([[1, 2, 3, 4], [2, 3, 4, 5], [1, 2, 3, 4], [0, 1, 2, 3], [2, 1, 4, 3]])
+    mean, z = paired_improvement(total_runs)
+    assert mean.tolist() == [1.0, 0.0, -1.0, 0.0]
+    # 差のばらつきが0なら、差があれば z 値は ±inf (確実な改善・悪化)、差がなければ0とする
+    assert z[:3].tolist() == [np.inf, 0.0, -np.inf]
+    assert z[3] == 0.0 and np.isfinite(z[3])
+
+def test_local_search_improves_bad_order():
+    """最悪に近い打順から始めて、期待得点が下がらないかをテストする"""
+    print("\n--- Running Local Search Test ---")
+    transitions = build_transition_matrices(df)
+    rng = np.random.default_rng(0)
+    candidates = np.array([rng.permutation(9) for _ in range(200)])
+    start = candidates[np.argmin(evaluate_orders(transitions, candidates))]
+
+    progress_bar = DummyProgressBar()
+    result = local_search_batting_order(df, progress_bar, max_games=60 * 143, initial_order=start, seed=0)
+
+    names = df['Player'].tolist()
+    best = [names.index(p) for p in result['best_order']['order_df']['Player']]
+    assert result['initial_order']['order_df']['Player'].tolist() == [names[i] for i in start]
+    assert result['best_order']['stats'].shape == (9, 12)
+    assert len(result['trace']) >= 2 and np.all(np.diff(result['trace']) >= 0)
+    assert evaluate_orders(transitions, np.array([best]))[0] >= evaluate_orders(transitions, start[None])[0]
+    print(f"Trace: {[round(gain, 3) for gain in result['trace']]}")
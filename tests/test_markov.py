@@ -0,0 +1,82 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.services.markov import (
+    build_transition_matrices, evaluate_orders, expected_runs_per_game, game_run_distributions, run_distribution,
+)
+from app.services.simulation import simulate_games, estimate_best_batting_order
+from tests.test_simulation import df, prob_cols
+
+def test_transition_probabilities_sum_to_one():
+    """各状態からの遷移確率とイニング終了確率の合計が1になるかをテストする"""
+    transitions = build_transition_matrices(df)
+    totals = transitions['transition'].sum(axis=2) + transitions['inning_end']
+    assert np.allclose(totals, 1.0)
+    assert np.allclose(transitions['runs_transition'].sum(axis=1), transitions['transition'])
+
+def test_expected_runs_matches_simulation():
+    """マルコフ連鎖の期待得点が一括シミュレーションの平均と一致するかをテストする"""
+    expected = expected_runs_per_game(df)
+    runs = simulate_games(df, 20000, rng=np.random.default_rng(0))['total_runs']
+    standard_error = runs.std() / np.sqrt(len(runs))
+    print(f"\nMarkov: {expected:.3f}, Simulation: {runs.mean():.3f} (±{standard_error:.3f})")
+    assert abs(expected - runs.mean()) < 5 * standard_error
+
+def test_expected_runs_all_strikeouts():
+    """全員が三振する打順の期待得点は0になる"""
+    strikeout_df = df.copy()
+    strikeout_df[prob_cols] = 0.0
+    strikeout_df['SO_ratio'] = 1.0
+    assert expected_runs_per_game(strikeout_df) == 0.0
+
+def test_evaluate_orders_batch():
+    """複数打順の一括評価が1打順ずつの評価と一致するかをテストする"""
+    transitions = build_transition_matrices(df)
+    orders = np.array([np.random.permutation(9) for _ in range(100)])
+    batch = evaluate_orders(transitions, orders)
+    single = [evaluate_orders(transitions, order)[0] for order in orders[:5]]
+    assert np.allclose(batch[:5], single)
+
+def test_estimate_best_batting_order_markov():
+    """マルコフ連鎖による評価で最良打順を推定できるかをテストする"""
+    class DummyProgressBar:
+        def progress(self, value):
+            pass
+
+    result = estimate_best_batting_order(df, 50, DummyProgressBar(), scorer="markov")
+    assert result['best_order']['avg_runs'] >= result['worst_order']['avg_runs']
+    assert len(result['best_order']['order_df']) == 9
+    assert result['best_order']['stats'].shape == (9, 12)
+
+def test_run_distribution_matches_simulation():
+    """得点分布が確率の和1で、期待得点と一致し、一括シミュレーションの分布とも一致するかをテストする"""
+    result = run_distribution(df)
+    distribution = result['distribution']
+    assert abs(distribution.sum() - 1.0) < 1e-9
+    assert abs(result['mean'] - expected_runs_per_game(df)) < 1e-4
+
+    runs = simulate_games(df, 20000, rng=np.random.default_rng(1))['total_runs']
+    print(f"\nDP: P(0)={result['p_shutout']:.4f}, P(>=5)={result['p_5_or_more']:.4f}, Var={result['variance']:.3f}")
+    print(f"Simulation: P(0)={(runs == 0).mean():.4f}, P(>=5)={(runs >= 5).mean():.4f}, Var={runs.var():.3f}")
+    observed = np.bincount(np.minimum(runs, len(distribution) - 1), minlength=len(distribution)) / len(runs)
+    standard_error = np.sqrt(distribution * (1 - distribution) / len(runs))
+    assert np.all(np.abs(observed - distribution) < 5 * standard_error + 1e-3)
+    assert abs(result['variance'] - runs.var()) < 0.05 * result['variance']
+
+def test_run_distribution_batch():
+    """複数打順の得点分布の一括計算が期待得点の一括評価と一致するかをテストする"""
+    transitions = build_transition_matrices(df)
+    orders = np.array([np.random.permutation(9) for _ in range(5)])
+    distributions = game_run_distributions(transitions, orders)
+    assert np.allclose(distributions @ np.arange(distributions.shape[1]), evaluate_orders(transitions, orders), atol=1e-4)
+
+    # 全員が三振する打順は必ず無得点
+    strikeout_df = df.copy()
+    strikeout_df[prob_cols] = 0.0
+    strikeout_df['SO_ratio'] = 1.0
+    result = run_distribution(strikeout_df)
+    assert result['p_shutout'] == 1.0 and result['p_5_or_more'] == 0.0
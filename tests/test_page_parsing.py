@@ -0,0 +1,63 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from app.utils.get_default_lineup import get_default_lineup
+from app.utils.get_player_data import fetch_player_data, get_data, player_data_url
+
+DUMMY_HTML_DIR = os.path.join(os.path.dirname(__file__), "dummy_html")
+
+def _read_fixture(name):
+    with open(os.path.join(DUMMY_HTML_DIR, name), "rb") as f:
+        return f.read()
+
+def _lineup_page():
+    """kiyou_m.html (起用情報の表の中身) を、2番目の表として置いたページにする"""
+    header_table = b"<table><tr><th>a</th></tr><tr><th>b</th></tr><tr><td>1</td></tr></table>"
+    return (b'<html><head><meta charset="utf-8"></head><body>' + header_table
+            + b"<table>" + _read_fixture("kiyou_m.html") + b"</table></body></html>")
+
+class DummyFetcher:
+    """取得済みのページを返す Fetcher の代わり (ネットワークに接続しない)"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def fetch_many(self, urls, return_exceptions=False):
+        return [self.pages.get(url, KeyError(url)) for url in urls]
+
+def test_default_lineup_from_bytes():
+    """取得済みのページのバイト列から、各ポジションの最多先発出場選手を読み取れるかをテストする"""
+    print("\n--- Default Lineup Parsing Test ---")
+    lineup = get_default_lineup("2023", "Pacific", "M", html=_lineup_page())
+    assert lineup == {'捕': '田村龍弘', '一': '山口航輝', '二': '中村奨吾', '三': '安田尚憲', '遊': '藤岡裕大',
+                      '左': '角中勝也', '中': '藤原恭大', '右': '荻野貴司', '指': 'ポランコ'}
+    # セ・リーグでは DH を除く
+    central = get_default_lineup("2023", "Central", "M", html=_lineup_page())
+    assert '指' not in central and len(central) == 8
+    print("Default Lineup Parsing Test Passed!")
+
+def test_player_data_from_bytes(tmp_path):
+    """取得済みの選手成績のページから、列名の空白を除いた rawデータを作れるかをテストする"""
+    print("\n--- Player Data Parsing Test ---")
+    df = get_data("m", "2024", html=_read_fixture("idb1_m.html"), raw_dir=str(tmp_path))
+    assert df.columns.tolist() == ['選手', '試合', '打席', '打数', '得点', '安打', '二塁打', '三塁打', '本塁打', '塁打',
+                                   '打点', '盗塁', '盗塁刺', '犠打', '犠飛', '四球', '故意四', '死球', '三振', '併殺打',
+                                   '打率', '長打率', '出塁率']
+    assert df['選手'].tolist() == ['愛斗', '池田来翔', '東妻勇輔']
+    assert df['打席'].tolist() == [76, 46, 0] and str(df['打席'].dtype) == 'Int64'
+    assert df['打率'].iloc[0] == 0.188 and pd.isna(df['打率'].iloc[2])
+
+    saved = pd.read_csv(tmp_path / "2024_m.csv")
+    assert saved['選手'].tolist() == df['選手'].tolist()
+    print("Player Data Parsing Test Passed!")
+
+def test_fetch_player_data_saves_pages(tmp_path):
+    """まとめて取得したページを rawデータとして保存し、取得できなかったページは飛ばすかをテストする"""
+    fetcher = DummyFetcher({player_data_url("m", "2024"): _read_fixture("idb1_m.html")})
+    saved = fetch_player_data(["m", "h"], ["2024"], raw_dir=str(tmp_path), fetcher=fetcher)
+    assert saved == [("2024", "m")]
+    assert os.listdir(tmp_path) == ["2024_m.csv"]
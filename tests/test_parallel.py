@@ -0,0 +1,144 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import warnings
+
+import numpy as np
+from app.services.parallel import (
+    START_METHOD, CancellationToken, SharedArrays, attach_shared_arrays, map_chunks, spawn_seeds, split_into_chunks,
+)
+from app.services.simulation import estimate_best_batting_order, stream_best_batting_order
+from tests.test_simulation import df
+
+class DummyProgressBar:
+    def __init__(self):
+        self.values = []
+
+    def progress(self, value, text=None):
+        self.values.append(value)
+
+def _square(x):
+    return x * x
+
+def _read_shared(tables, i):
+    """ワーカーで共有メモリの配列を読み、書き込めないことを確かめる"""
+    arrays = attach_shared_arrays(tables)
+    return float(arrays["values"][i].sum()), arrays["values"].flags.writeable, arrays["flags"].tolist()
+
+def test_split_into_chunks():
+    print("\n--- Split Into Chunks Test ---")
+    assert split_into_chunks(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert split_into_chunks(0, 4) == []
+    print("Split Into Chunks Test Passed!")
+
+def test_map_chunks():
+    print("\n--- Map Chunks Test ---")
+    tasks = [(i,) for i in range(5)]
+    for n_workers in (1, 2):
+        results = dict(map_chunks(_square, tasks, n_workers=n_workers))
+        assert results == {i: i * i for i in range(5)}
+
+    # 同じシードからは同じ乱数ストリームができる
+    a = [np.random.default_rng(s).random() for s in spawn_seeds(0, 3)]
+    b = [np.random.default_rng(s).random() for s in spawn_seeds(0, 3)]
+    assert a == b and len(set(a)) == 3
+    print("Map Chunks Test Passed!")
+
+def test_map_chunks_from_thread():
+    """スレッドから呼び出しても fork せずにワーカーを起動できるかをテストする"""
+    print("\n--- Map Chunks From Thread Test ---")
+    assert START_METHOD != "fork"
+    results = {}
+    caught = []
+
+    def run():
+        # マルチスレッドのプロセスから fork すると DeprecationWarning が出る
+        with warnings.catch_warnings(record=True) as records:
+            warnings.simplefilter("always")
+            results.update(map_chunks(_square, [(i,) for i in range(4)], n_workers=2))
+        caught.extend(str(record.message) for record in records)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert results == {i: i * i for i in range(4)}
+    assert not [message for message in caught if "fork()" in message]
+    print("Map Chunks From Thread Test Passed!")
+
+def test_shared_arrays():
+    print("\n--- Shared Arrays Test ---")
+    values = np.arange(30, dtype=np.float64).reshape(3, 10)
+    flags = np.array([1, 2, 3], dtype=np.int8)
+    with SharedArrays({"values": values, "flags": flags}) as shared:
+        # タスクに渡すのは共有メモリの名前と配置だけ
+        tasks = [(shared.handle, i) for i in range(3)]
+        results = dict(map_chunks(_read_shared, tasks, n_workers=2))
+    assert results == {i: (float(values[i].sum()), False, [1, 2, 3]) for i in range(3)}
+    # 配列の辞書はそのまま使う
+    assert attach_shared_arrays({"values": values})["values"] is values
+    print("Shared Arrays Test Passed!")
+
+def test_parallel_estimate_matches_serial():
+    print("\n--- Parallel Estimate Test ---")
+    serial_bar, parallel_bar = DummyProgressBar(), DummyProgressBar()
+    serial = estimate_best_batting_order(df, 20, serial_bar, n_workers=1, chunk_size=4, seed=42)
+    parallel = estimate_best_batting_order(df, 20, parallel_bar, n_workers=2, chunk_size=4, seed=42)
+
+    for key in ("best_order", "worst_order"):
+        assert serial[key]['avg_runs'] == parallel[key]['avg_runs']
+        assert serial[key]['order_df']['Player'].tolist() == parallel[key]['order_df']['Player'].tolist()
+        assert np.array_equal(serial[key]['stats'], parallel[key]['stats'])
+    assert parallel_bar.values[-1] == 1.0
+
+    # 共通乱数も共有メモリでワーカーに渡す
+    serial = estimate_best_batting_order(df, 20, DummyProgressBar(), n_workers=1, chunk_size=4, seed=42,
+                                         common_random_numbers=True)
+    parallel = estimate_best_batting_order(df, 20, DummyProgressBar(), n_workers=2, chunk_size=4, seed=42,
+                                           common_random_numbers=True)
+    assert serial['best_order']['avg_runs'] == parallel['best_order']['avg_runs']
+    assert np.array_equal(serial['best_order']['stats'], parallel['best_order']['stats'])
+    print(f"Best: {serial['best_order']['avg_runs']:.2f}, Worst: {serial['worst_order']['avg_runs']:.2f}")
+    print("Parallel Estimate Test Passed!")
+
+def test_map_chunks_cancellation():
+    print("\n--- Map Chunks Cancellation Test ---")
+    tasks = [(i,) for i in range(20)]
+    for n_workers in (1, 2):
+        token = CancellationToken()
+        results = []
+        for task_id, result in map_chunks(_square, tasks, n_workers=n_workers, cancel_token=token):
+            results.append(task_id)
+            token.cancel()
+        # 取り消し後は新しいタスクを始めない
+        assert 1 <= len(results) < len(tasks)
+    print("Map Chunks Cancellation Test Passed!")
+
+def test_stream_best_batting_order():
+    print("\n--- Stream Best Batting Order Test ---")
+    for scorer in ("simulation", "markov"):
+        snapshots = list(stream_best_batting_order(df, 20, scorer=scorer, chunk_size=4, seed=42, snapshot_interval=0))
+        final = snapshots[-1]
+        assert final['done'] and not final['cancelled'] and final['evaluated'] == 20
+        assert all(not s['done'] for s in snapshots[:-1])
+        # 途中経過の最良得点は評価が進むほど下がらない
+        bests = [s['best_order']['avg_runs'] for s in snapshots]
+        assert bests == sorted(bests)
+        # 最終結果は estimate_best_batting_order と同じ
+        estimated = estimate_best_batting_order(df, 20, DummyProgressBar(), scorer=scorer, chunk_size=4, seed=42)
+        assert estimated['best_order']['avg_runs'] == final['best_order']['avg_runs']
+        assert np.array_equal(estimated['best_order']['stats'], final['best_order']['stats'])
+
+    # 取り消すと、それまでに評価した打順だけで最終結果を返す
+    token = CancellationToken()
+    snapshots = []
+    for snapshot in stream_best_batting_order(df, 40, chunk_size=4, seed=0, cancel_token=token, snapshot_interval=0):
+        snapshots.append(snapshot)
+        token.cancel()
+    final = snapshots[-1]
+    assert final['done'] and final['cancelled']
+    assert final['evaluated'] == 4 and final['best_order']['stats'].shape == (9, 12)
+    print("Stream Best Batting Order Test Passed!")
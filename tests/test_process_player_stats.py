@@ -0,0 +1,61 @@
+import sys
+import os
+
+import pandas as pd
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.process_player_stats as pps
+from app.utils.stats_store import load_team_stats
+
+HEADER = "選手,試合,打席,打数,得点,安打,二塁打,三塁打,本塁打,塁打,打点,盗塁,盗塁刺,犠打,犠飛,四球,故意四,死球,三振,併殺打,打率,長打率,出塁率"
+PLAYER_A = "PlayerA,10,50,40,5,12,2,1,1,18,5,3,1,0,1,8,0,1,10,1,.300,.450,.420"
+PLAYER_B = "PlayerB,10,50,45,8,11,3,0,2,20,8,0,0,1,0,4,0,0,15,2,.250,.444,.311"
+
+def _write_raw(raw_dir, year, team, rows):
+    with open(os.path.join(raw_dir, f"{year}_{team}.csv"), "w") as f:
+        f.write("\n".join([HEADER, *rows]))
+
+def test_incremental_processing(tmp_path):
+    """rawデータが変わったチーム・年度だけを加工し直すことをテストする"""
+    raw_dir, processed_dir = tmp_path / "raw", tmp_path / "processed"
+    raw_dir.mkdir()
+    for year in ["2023", "2024"]:
+        for team in ["x", "y"]:
+            _write_raw(raw_dir, year, team, [PLAYER_A, PLAYER_B])
+
+    updated = pps.main(["x", "y"], ["2023", "2024"], str(raw_dir), str(processed_dir), n_workers=1)
+    assert sorted(updated) == [("2023", "x"), ("2023", "y"), ("2024", "x"), ("2024", "y")]
+
+    # 打撃の確率と走力スコアが1回の加工で計算されている
+    df = pd.read_csv(processed_dir / "2024_x.csv")
+    assert 'Ground_Out_ratio' in df.columns
+    assert df.loc[df['Player'] == 'PlayerA', 'Speed'].iloc[0] == 1*3 + 3*1 - 1*2
+    pd.testing.assert_frame_equal(load_team_stats("2024", "x", str(processed_dir)), df)
+
+    # 何も変わっていなければ加工しない
+    assert pps.main(["x", "y"], ["2023", "2024"], str(raw_dir), str(processed_dir), n_workers=1) == []
+
+    # rawデータが変わったチーム・年度だけを加工し直す
+    _write_raw(raw_dir, "2024", "y", [PLAYER_A])
+    assert pps.main(["x", "y"], ["2023", "2024"], str(raw_dir), str(processed_dir), n_workers=1) == [("2024", "y")]
+    assert len(pd.read_csv(processed_dir / "2024_y.csv")) == 1
+
+    # 加工済みのファイルがなくなったチーム・年度も加工し直す
+    os.remove(processed_dir / "2023_x.csv")
+    assert pps.main(["x"], "2023", str(raw_dir), str(processed_dir), n_workers=1) == [("2023", "x")]
+    print("\n✅ test_incremental_processing passed.")
+
+def test_version_change_reprocesses(tmp_path, monkeypatch):
+    """加工処理の版が変わったら全て加工し直すことをテストする"""
+    raw_dir, processed_dir = tmp_path / "raw", tmp_path / "processed"
+    raw_dir.mkdir()
+    _write_raw(raw_dir, "2024", "x", [PLAYER_A, PLAYER_B])
+    assert pps.main(["x"], "2024", str(raw_dir), str(processed_dir), n_workers=1) == [("2024", "x")]
+
+    monkeypatch.setattr(pps, "PROCESSING_VERSION", pps.PROCESSING_VERSION + 1)
+    assert pps.main(["x"], "2024", str(raw_dir), str(processed_dir), n_workers=1) == [("2024", "x")]
+    assert pps.load_manifest(str(processed_dir))["2024_x"]["version"] == pps.PROCESSING_VERSION
+    assert pps.main(["x"], "2024", str(raw_dir), str(processed_dir), force=True, n_workers=1) == [("2024", "x")]
+    print("\n✅ test_version_change_reprocesses passed.")
@@ -0,0 +1,60 @@
+import sys
+import os
+import threading
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.services import random_pool
+from app.services.lineup import compile_lineup
+from app.services.random_pool import RandomPool
+from app.services.simulation import simulate_game
+from tests.test_simulation import df
+
+def test_random_pool_matches_generator():
+    """まとめて生成した乱数が、同じシードの Generator の乱数列と一致するかをテストする"""
+    pool = RandomPool(42, block_size=7)
+    draws = [pool.random() for _ in range(50)]
+    expected = np.random.default_rng(42).random(50)
+    assert np.array_equal(draws, expected)
+    # ブロックの大きさは乱数列に影響しない
+    other = RandomPool(42, block_size=1000)
+    assert [other.random() for _ in range(50)] == draws
+    print("Random Pool Generator Test Passed!")
+
+def test_random_pool_substreams():
+    """部分ストリームが再現でき、互いに異なる乱数列になるかをテストする"""
+    first = [[s.random() for _ in range(10)] for s in RandomPool(0).spawn(3)]
+    second = [[s.random() for _ in range(10)] for s in RandomPool(0).spawn(3)]
+    assert first == second
+    assert first[0] != first[1] != first[2]
+    print("Random Pool Substream Test Passed!")
+
+def test_simulate_game_reproducible():
+    """同じシードから同じ試合結果になり、スレッドごとの乱数源が独立しているかをテストする"""
+    lineup = compile_lineup(df)
+    a = [simulate_game(lineup, enable_inning_log=False, rng=pool)['total_runs'] for pool in RandomPool(7).spawn(5)]
+    b = [simulate_game(lineup, enable_inning_log=False, rng=pool)['total_runs'] for pool in RandomPool(7).spawn(5)]
+    assert a == b
+
+    with random_pool.using(3):
+        from_context = [simulate_game(lineup)['total_runs'] for _ in range(5)]
+    rng = RandomPool(3)
+    assert from_context == [simulate_game(lineup, rng=rng)['total_runs'] for _ in range(5)]
+
+    pools = {}
+    def worker(i):
+        pools[i] = random_pool.current()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pools[0] is not pools[1]
+    print("Simulate Game Reproducibility Test Passed!")
+
+if __name__ == "__main__":
+    test_random_pool_matches_generator()
+    test_random_pool_substreams()
+    test_simulate_game_reproducible()
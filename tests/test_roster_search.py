@@ -0,0 +1,73 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.markov import build_transition_matrices, evaluate_orders, expected_runs_per_game
+from app.services.roster_search import roster_batting_order_search, roster_neighbourhood
+from tests.test_simulation import df
+
+PROCESSED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'processed'))
+
+class DummyProgressBar:
+    def progress(self, value, text=None):
+        pass
+
+class RecordingProgressBar:
+    def __init__(self):
+        self.values = []
+
+    def progress(self, value, text=None):
+        self.values.append(value)
+
+def test_roster_neighbourhood():
+    """近傍の打線が9人の重複のない選手で、控えとの入れ替えを含むかをテストする"""
+    lineup, bench = np.arange(9), np.array([9, 10, 11])
+    neighbours = roster_neighbourhood(lineup, bench)
+    assert neighbours.shape[1] == 9
+    assert all(len(set(row)) == 9 for row in neighbours.tolist())
+    assert sum(bool(set(row) & {9, 10, 11}) for row in neighbours.tolist()) == 9 * len(bench)
+
+def test_roster_search_finds_local_optimum():
+    """全選手からの探索が、初期打線以上で近傍に改善のない打線を返すかをテストする"""
+    print("\n--- Roster Search Test ---")
+    players_df = pd.read_csv(os.path.join(PROCESSED_DIR, "2024_h.csv")).head(13)
+    initial_players = players_df['Player'].tolist()[4:13]
+    result = roster_batting_order_search(players_df, DummyProgressBar(), initial_players=initial_players,
+                                         pool_size=11, restarts=2, exact_order=False, seed=0)
+
+    best_names = result['best_order']['order_df']['Player'].tolist()
+    print(f"Best: {best_names} ({result['best_order']['avg_runs']:.3f}), Start: {result['initial_order']['avg_runs']:.3f}")
+    assert len(set(best_names)) == 9 and set(best_names) <= set(result['pool'])
+    assert set(initial_players) <= set(result['pool'])
+    assert result['initial_order']['order_df']['Player'].tolist() == initial_players
+    assert result['best_order']['avg_runs'] >= result['initial_order']['avg_runs']
+    assert abs(result['best_order']['avg_runs'] - expected_runs_per_game(result['best_order']['order_df'])) < 1e-9
+    assert result['top_orders'][0]['avg_runs'] == result['best_order']['avg_runs']
+
+    # 候補の中の近傍に、より良い打線はない
+    players = players_df['Player'].tolist()
+    transitions = build_transition_matrices(players_df)
+    best = np.array([players.index(name) for name in best_names])
+    pool = np.array([players.index(name) for name in result['pool']])
+    neighbours = roster_neighbourhood(best, np.setdiff1d(pool, best))
+    assert evaluate_orders(transitions, neighbours).max() <= result['best_order']['avg_runs'] + 1e-12
+    print("Roster Search Test Passed!")
+
+def test_roster_search_progress_is_monotonic():
+    """打順の全探索に移っても、進捗が0に戻らずに1.0で終わるかをテストする"""
+    players_df = pd.read_csv(os.path.join(PROCESSED_DIR, "2024_h.csv")).head(11)
+    progress_bar = RecordingProgressBar()
+    roster_batting_order_search(players_df, progress_bar, pool_size=10, restarts=1, seed=0)
+    values = progress_bar.values
+    assert values[-1] == 1.0
+    assert all(a <= b + 1e-12 for a, b in zip(values, values[1:]))
+    assert any(0.9 < value < 1.0 for value in values)
+
+def test_roster_search_requires_nine_players():
+    with pytest.raises(ValueError):
+        roster_batting_order_search(df.head(8), DummyProgressBar())
@@ -6,7 +6,13 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import pandas as pd
 import numpy as np
-from app.services.simulation import simulate_game, estimate_best_batting_order
+from app.services import random_pool
+from app.services.lineup import compile_lineup
+from app.services.random_pool import RandomPool
+from app.services.simulation import (
+    simulate_game, simulate_games, simulate_orders, generate_common_draws, estimate_best_batting_order,
+    new_game_log, game_log_frame, GAME_LOG_KEYS, LOG_COLUMNS,
+)
 
 # テスト用のダミーデータを作成
 data = {
@@ -32,7 +38,8 @@ def test_single_game_simulation():
     game_result = simulate_game(df, enable_inning_log=True)
     
     assert isinstance(game_result['total_runs'], int)
-    assert isinstance(game_result['game_log'], dict)
+    assert game_result['game_log'].shape == (9, len(GAME_LOG_KEYS))
+    assert game_result['game_log'][:, LOG_COLUMNS['RBI']].sum() == game_result['total_runs']
     print(f"Total Runs: {game_result['total_runs']}")
 
     # イニングログの表示
@@ -88,8 +95,8 @@ def test_new_events_simulation():
     # 100試合シミュレーションして、BuntManの犠打試行が多いことを確認
     game_logs = [simulate_game(full_order, enable_inning_log=False)['game_log'] for _ in range(100)]
     
-    buntman_sac_attempts = sum(log[0]['Sacrifice_Attempts'] for log in game_logs)
-    hitterman_sac_attempts = sum(log[1]['Sacrifice_Attempts'] for log in game_logs)
+    buntman_sac_attempts = sum(log[0, LOG_COLUMNS['Sacrifice_Attempts']] for log in game_logs)
+    hitterman_sac_attempts = sum(log[1, LOG_COLUMNS['Sacrifice_Attempts']] for log in game_logs)
 
     print(f"BuntMan Sacrifice Attempts: {buntman_sac_attempts}")
     print(f"HitterMan Sacrifice Attempts: {hitterman_sac_attempts}")
@@ -97,8 +104,110 @@ def test_new_events_simulation():
     assert buntman_sac_attempts > hitterman_sac_attempts
     print("New Events Simulation Test Passed!")
 
+def test_simulate_games_batch():
+    """複数試合の一括シミュレーションが simulate_game と同じ形式の結果を返すかをテストする"""
+    print("\n--- Running Batch Games Simulation Test ---")
+    result = simulate_games(df, 200, rng=np.random.default_rng(0))
+
+    assert result['total_runs'].shape == (200,)
+    assert result['game_log'].shape == (9, len(GAME_LOG_KEYS))
+    # このモデルでは全ての得点が打点になる
+    total_rbi = result['game_log'][:, LOG_COLUMNS['RBI']].sum()
+    assert total_rbi == result['total_runs'].sum()
+
+    # 同じシードなら同じ結果になる
+    again = simulate_games(df, 200, rng=np.random.default_rng(0))
+    assert np.array_equal(result['total_runs'], again['total_runs'])
+    print(f"Average Runs: {result['total_runs'].mean():.2f}")
+    print("Batch Games Simulation Test Passed!")
+
+def test_simulate_games_all_strikeouts():
+    """全員が三振する打順では1試合27打席・0得点になることをテストする"""
+    strikeout_df = df.copy()
+    strikeout_df[prob_cols] = 0.0
+    strikeout_df['SO_ratio'] = 1.0
+
+    result = simulate_games(strikeout_df, 10)
+
+    assert result['total_runs'].sum() == 0
+    # 27打席 x 10試合を9人で均等に打つ
+    assert all(result['game_log'][:, LOG_COLUMNS['SO']] == 30)
+
+def test_season_log_accumulation():
+    """試合ごとの成績がシーズンの成績配列に加算され、表示用の DataFrame が配列を共有するかをテストする"""
+    season_log = new_game_log()
+    total_runs = 0
+    for _ in range(10):
+        result = simulate_game(df, enable_inning_log=False, season_log=season_log)
+        total_runs += result['total_runs']
+    assert season_log[:, LOG_COLUMNS['RBI']].sum() == total_runs
+
+    frame = game_log_frame(season_log)
+    assert list(frame.columns) == GAME_LOG_KEYS
+    assert np.shares_memory(frame.values, season_log)
+    assert frame.loc[0, 'SO'] == season_log[0, LOG_COLUMNS['SO']]
+
+def test_common_random_numbers():
+    """共通乱数では同じ打順が同じ結果になり、打順を入れ替えても選手ごとの乱数が共有されるかをテストする"""
+    rng = np.random.default_rng(0)
+    common_draws = generate_common_draws(50, 9, rng)
+    orders = np.array([np.arange(9), np.arange(9), np.arange(9)[::-1]])
+    result = simulate_orders(df, orders, 50, rng=rng, common_draws=common_draws)
+
+    # 同じ打順には同じ乱数が使われる
+    assert np.array_equal(result['total_runs'][0], result['total_runs'][1])
+    assert np.array_equal(result['game_log'][0], result['game_log'][1])
+    # 打順が違えば同じ乱数でも試合展開は変わるが、得点と打点の合計は一致する
+    rbi = GAME_LOG_KEYS.index('RBI')
+    assert result['total_runs'][2].sum() == result['game_log'][2][:, rbi].sum()
+
+    class DummyProgressBar:
+        def progress(self, value):
+            pass
+
+    estimated = estimate_best_batting_order(df, 10, DummyProgressBar(), seed=0, common_random_numbers=True)
+    assert estimated['best_order']['avg_runs'] >= estimated['worst_order']['avg_runs']
+    print("Common Random Numbers Test Passed!")
+
+def test_common_random_numbers_reduce_variance():
+    """共通乱数で2つの打順を比べると、試合ごとの得点差の分散が独立な乱数の場合より小さくなるかをテストする"""
+    orders = np.array([np.arange(9), np.arange(9)[::-1]])
+    num_games = 500
+    for seed in range(3):
+        rng = np.random.default_rng(seed)
+        common_draws = generate_common_draws(num_games, 9, rng)
+        paired = simulate_orders(df, orders, num_games, rng=rng, common_draws=common_draws)['total_runs']
+        independent = simulate_orders(df, orders, num_games, rng=rng)['total_runs']
+        paired_variance = np.var(paired[0] - paired[1], ddof=1)
+        independent_variance = np.var(independent[0] - independent[1], ddof=1)
+        print(f"seed {seed}: 共通乱数 {paired_variance:.2f}, 独立 {independent_variance:.2f}")
+        # 独立な乱数ではおよそ1試合の得点の分散の2倍になるが、共通乱数では打順の差による分だけが残る
+        assert paired_variance < 0.5 * independent_variance
+
+def test_compiled_lineup_matches_dataframe():
+    """変換済みの打順と DataFrame で、同じ乱数列から同じ試合結果になるかをテストする"""
+    lineup = compile_lineup(df)
+    assert lineup.cumulative.shape == (9, len(prob_cols))
+    assert np.allclose(lineup.cumulative[:, -1], 1.0)
+    assert compile_lineup(lineup) is lineup
+
+    rng = RandomPool(0)
+    from_dataframe = [simulate_game(df, rng=rng) for _ in range(20)]
+    random_pool.seed(0)
+    from_lineup = [simulate_game(lineup) for _ in range(20)]
+    for a, b in zip(from_dataframe, from_lineup):
+        assert a['total_runs'] == b['total_runs']
+        assert np.array_equal(a['game_log'], b['game_log'])
+        assert a['inning_log'] == b['inning_log']
+
 
 if __name__ == "__main__":
     test_single_game_simulation()
     test_estimate_best_batting_order()
     test_new_events_simulation()
+    test_simulate_games_batch()
+    test_simulate_games_all_strikeouts()
+    test_season_log_accumulation()
+    test_common_random_numbers()
+    test_common_random_numbers_reduce_variance()
+    test_compiled_lineup_matches_dataframe()
@@ -0,0 +1,53 @@
+import sys
+import os
+import time
+
+import pandas as pd
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.stats_store import build_stats_store, load_team_stats, store_path
+from app.utils.team_data import load_team_players
+
+PROCESSED_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed')
+
+def _copy_processed(tmp_path, teams):
+    for team in teams:
+        df = pd.read_csv(os.path.join(PROCESSED_DIR, f"2024_{team}.csv"))
+        df.to_csv(tmp_path / f"2024_{team}.csv", index=False)
+
+def test_store_matches_csv(tmp_path):
+    """まとめたファイルから取り出したデータが元のCSVと一致することをテストする"""
+    _copy_processed(tmp_path, ["h", "t", "g"])
+    # CSV以外のファイル (デフォルトスタメン) は含めない
+    pd.DataFrame({"Year": [2024]}).to_csv(tmp_path / "default_lineups_2024.csv", index=False)
+    build_stats_store(str(tmp_path))
+    assert os.path.exists(store_path(str(tmp_path)))
+
+    for team in ["h", "t", "g"]:
+        expected = pd.read_csv(tmp_path / f"2024_{team}.csv")
+        df = load_team_stats(2024, team, str(tmp_path))
+        pd.testing.assert_frame_equal(df, expected)
+        pd.testing.assert_frame_equal(load_team_players("2024", team, str(tmp_path)), expected)
+    assert load_team_stats(2024, "s", str(tmp_path)) is None
+    print("\n✅ test_store_matches_csv passed.")
+
+def test_store_falls_back_when_stale(tmp_path):
+    """元のCSVが更新されたら、まとめたファイルではなくCSVから読み込むことをテストする"""
+    _copy_processed(tmp_path, ["h"])
+    build_stats_store(str(tmp_path))
+    assert load_team_stats(2024, "h", str(tmp_path)) is not None
+
+    csv_path = tmp_path / "2024_h.csv"
+    df = pd.read_csv(csv_path).head(3)
+    time.sleep(0.01)
+    df.to_csv(csv_path, index=False)
+    os.utime(csv_path, ns=(time.time_ns() + 10**9,) * 2)
+    assert load_team_stats(2024, "h", str(tmp_path)) is None
+    assert len(load_team_players(2024, "h", str(tmp_path))) == 3
+
+    # まとめ直せば再びファイルから取り出せる
+    build_stats_store(str(tmp_path))
+    assert len(load_team_stats(2024, "h", str(tmp_path))) == 3
+    print("\n✅ test_store_falls_back_when_stale passed.")
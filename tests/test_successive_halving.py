@@ -0,0 +1,42 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.simulation import GAMES_PER_SEASON
+from app.services.successive_halving import game_schedule, initial_candidates, racing_cost, successive_halving_search
+from tests.test_simulation import df
+
+class DummyProgressBar:
+    def __init__(self):
+        self.texts = []
+
+    def progress(self, value, text=None):
+        self.texts.append(text)
+
+def test_schedule_and_budget():
+    """試合数の計画と初期打順数が予算内に収まるかをテストする"""
+    schedule = game_schedule(36, 2, 4 * GAMES_PER_SEASON)
+    assert schedule == [36, 72, 144, 288, 572]
+
+    budget = 100 * GAMES_PER_SEASON
+    num_candidates = initial_candidates(budget, schedule)
+    assert racing_cost(num_candidates, schedule) <= budget < racing_cost(num_candidates + 1, schedule)
+    # 同じ総試合数でランダム探索より多くの打順を比べられる
+    assert num_candidates > 100
+
+def test_successive_halving_search():
+    """逐次半減法の結果形式と総試合数をテストする"""
+    print("\n--- Running Successive Halving Test ---")
+    progress_bar = DummyProgressBar()
+    result = successive_halving_search(df, 20, progress_bar, seed=0)
+
+    assert result['simulated_games'] <= 20 * GAMES_PER_SEASON
+    assert result['evaluated_orders'] > 20
+    assert len(result['best_order']['order_df']) == 9
+    assert result['best_order']['stats'].shape == (9, 12)
+    assert result['worst_order']['stats'].shape == (9, 12)
+    assert any(text.startswith("第1段階") for text in progress_bar.texts)
+    print(f"Best: {result['best_order']['avg_runs']:.2f} ({result['evaluated_orders']}打順から選択)")
+    print(f"Worst: {result['worst_order']['avg_runs']:.2f}")
@@ -0,0 +1,48 @@
+import sys
+import os
+
+# プロジェクトのルートディレクトリをPythonのパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.services.transitions import (
+    TRANSITION_TABLE, INNING_OVER, EVENT_WALK, EVENT_GROUND_OUT, EVENT_SINGLE, EVENT_HOME_RUN,
+    EVENT_SACRIFICE_SUCCESS, apply_event, apply_events, decode_state, encode_state, speed_class,
+)
+
+def test_state_encoding():
+    """状態番号の変換と走者区分をテストする"""
+    for state in range(INNING_OVER):
+        assert encode_state(*decode_state(state)) == state
+    assert speed_class(0) == 0 and speed_class(-1) == 0
+    assert speed_class(5) == 1 and speed_class(6) == 2
+    assert speed_class(np.array([0, 3, 8])).tolist() == [0, 1, 2]
+
+def test_table_probabilities_sum_to_one():
+    """全ての (状態, イベント, 打者) で結果の確率の合計が1になるかをテストする"""
+    assert np.allclose(TRANSITION_TABLE.probability.sum(axis=-1), 1.0)
+    assert np.all(TRANSITION_TABLE.cumulative[..., -1] == 1.0)
+
+def test_rules():
+    """代表的な場面で simulate_inning と同じルールになっているかをテストする"""
+    loaded = encode_state(1, 1, 1, 1)
+    # 満塁の四死球は押し出しで1点
+    assert apply_event(loaded, EVENT_WALK, 1, 0.0) == (encode_state(1, 1, 1, 1), 1)
+    # 満塁本塁打は4点
+    assert apply_event(loaded, EVENT_HOME_RUN, 1, 0.0) == (encode_state(1, 0, 0, 0), 4)
+    # 2アウトからのゴロは3アウト目で得点なし
+    assert apply_event(encode_state(2, 0, 0, 1), EVENT_GROUND_OUT, 1, 0.0) == (INNING_OVER, 0)
+    # 0アウト1塁のゴロは50%で併殺
+    first = encode_state(0, 1, 0, 0)
+    assert apply_event(first, EVENT_GROUND_OUT, 1, 0.1) == (encode_state(2, 0, 0, 0), 0)
+    assert apply_event(first, EVENT_GROUND_OUT, 1, 0.9) == (encode_state(1, 0, 1, 0), 0)
+    # 犠打成功で3塁ランナーは生還
+    assert apply_event(encode_state(0, 0, 1, 1), EVENT_SACRIFICE_SUCCESS, 1, 0.0) == (encode_state(1, 0, 0, 1), 1)
+
+def test_single_extra_base_probability():
+    """単打で俊足の2塁ランナーが生還する確率が 0.3 + 0.3 になるかをテストする"""
+    rng = np.random.default_rng(0)
+    n = 20000
+    states = np.full(n, encode_state(0, 0, 2, 0))
+    _, runs = apply_events(states, np.full(n, EVENT_SINGLE), np.ones(n, dtype=int), rng.random(n))
+    assert abs(runs.mean() - 0.6) < 0.02